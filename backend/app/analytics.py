@@ -0,0 +1,183 @@
+# backend/app/analytics.py
+"""
+Series del estado de resultados por mes, trimestre o año (/analytics/series).
+
+Todo el rango sale de dos consultas: el rollup mensual (monthly_rollups)
+y stock_snapshots. El agrupado por granularidad, el CMV y las variaciones
+contra el período anterior y el mismo período del año anterior se calculan
+con NumPy sobre arrays por mes, en una sola pasada.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+from .db import MonthlyRollup, StockSnapshot
+from .periods import (
+    from_month_index,
+    month_index,
+    month_start,
+    parse_period,
+    period_key,
+)
+
+
+GRANULARITY_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+# Rango máximo pedido en /analytics/series (meses)
+MAX_SERIES_MONTHS = 240
+
+PURCHASE_RUBROS = ("mercaderías", "mercaderias")
+
+
+def bucket_label(year: int, month: int, granularity: str) -> str:
+    if granularity == "year":
+        return f"{year:04d}"
+    if granularity == "quarter":
+        return f"{year:04d}-Q{(month - 1) // 3 + 1}"
+    return period_key(year, month)
+
+
+def _ratio_pct(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """num / den * 100; NaN donde den es 0 o falta."""
+    out = np.full(num.shape, np.nan)
+    np.divide(num * 100.0, den, out=out, where=(den != 0) & ~np.isnan(den))
+    return out
+
+
+def _change_pct(cur: np.ndarray, base: np.ndarray) -> np.ndarray:
+    """Variación % contra base (sobre |base|, para márgenes negativos)."""
+    return _ratio_pct(cur - base, np.abs(base))
+
+
+def _value(x) -> float | None:
+    x = float(x)
+    return None if np.isnan(x) else x
+
+
+def build_series(db, user_id: str, start: tuple[int, int], end: tuple[int, int], granularity: str) -> dict:
+    """
+    Totales por período entre start y end (meses inclusive). Para trimestre
+    y año el rango se extiende a períodos completos. Se lee un año extra
+    hacia atrás para que el primer período tenga variación interanual.
+    """
+    step = GRANULARITY_MONTHS[granularity]
+    per_year = 12 // step
+
+    first = month_index(*start)
+    first -= first % step
+    last = month_index(*end)
+    last += step - 1 - last % step
+    q_first = first - 12
+    n_months = last - q_first + 1
+
+    income = np.zeros(n_months)
+    expense = np.zeros(n_months)
+    purchases = np.zeros(n_months)
+    by_rubro: dict[int, dict] = defaultdict(lambda: defaultdict(lambda: [0.0, 0.0, 0.0]))
+
+    rows = (
+        db.query(
+            MonthlyRollup.period,
+            MonthlyRollup.rubro,
+            MonthlyRollup.kind,
+            MonthlyRollup.neto,
+            MonthlyRollup.iva,
+            MonthlyRollup.total,
+        )
+        .filter(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.period >= period_key(*from_month_index(q_first)),
+            MonthlyRollup.period <= period_key(*from_month_index(last)),
+        )
+        .all()
+    )
+    for period, rubro, kind, neto, iva, total in rows:
+        i = month_index(*parse_period(period)) - q_first
+        total = float(total or 0)
+        if kind == "income":
+            income[i] += total
+        else:
+            expense[i] += total
+            if rubro.lower() in PURCHASE_RUBROS:
+                purchases[i] += total
+        if i >= 12:
+            acc = by_rubro[(i - 12) // step][(rubro, kind)]
+            acc[0] += float(neto or 0)
+            acc[1] += float(iva or 0)
+            acc[2] += total
+
+    initial_stock = np.full(n_months, np.nan)
+    final_stock = np.full(n_months, np.nan)
+    y_first, _ = from_month_index(q_first)
+    y_last, _ = from_month_index(last)
+    snaps = (
+        db.query(StockSnapshot.year, StockSnapshot.month, StockSnapshot.initial_stock, StockSnapshot.final_stock)
+        .filter(
+            StockSnapshot.user_id == user_id,
+            StockSnapshot.year >= f"{y_first:04d}",
+            StockSnapshot.year <= f"{y_last:04d}",
+        )
+        .all()
+    )
+    for year, month, ei, ef in snaps:
+        i = month_index(int(year), int(month)) - q_first
+        if 0 <= i < n_months:
+            initial_stock[i] = float(ei or 0)
+            final_stock[i] = float(ef or 0)
+
+    # (períodos, meses por período): los índices están alineados a `step`
+    income_b = income.reshape(-1, step).sum(axis=1)
+    expense_b = expense.reshape(-1, step).sum(axis=1)
+    purchases_b = purchases.reshape(-1, step).sum(axis=1)
+    ei_b = initial_stock.reshape(-1, step)[:, 0]
+    ef_b = final_stock.reshape(-1, step)[:, -1]
+    margin_b = income_b - expense_b
+
+    cur = slice(per_year, None)
+    prev = slice(per_year - 1, -1)
+    yoy = slice(None, -per_year)
+
+    income_c, expense_c, margin_c = income_b[cur], expense_b[cur], margin_b[cur]
+    cogs = ei_b[cur] + purchases_b[cur] - ef_b[cur]
+    gross_margin = income_c - cogs
+
+    cols = {
+        "income": income_c,
+        "expense": expense_c,
+        "margin": margin_c,
+        "margin_pct": _ratio_pct(margin_c, income_c),
+        "purchases": purchases_b[cur],
+        "initial_stock": ei_b[cur],
+        "final_stock": ef_b[cur],
+        "cogs": cogs,
+        "gross_margin": gross_margin,
+        "gross_margin_pct": _ratio_pct(gross_margin, income_c),
+        "pop_income_pct": _change_pct(income_c, income_b[prev]),
+        "pop_expense_pct": _change_pct(expense_c, expense_b[prev]),
+        "pop_margin_pct": _change_pct(margin_c, margin_b[prev]),
+        "yoy_income_pct": _change_pct(income_c, income_b[yoy]),
+        "yoy_expense_pct": _change_pct(expense_c, expense_b[yoy]),
+        "yoy_margin_pct": _change_pct(margin_c, margin_b[yoy]),
+    }
+
+    periods = []
+    for b in range(len(income_c)):
+        y, m = from_month_index(first + b * step)
+        item = {
+            "period": bucket_label(y, m, granularity),
+            "from": month_start(y, m).isoformat(),
+            "to_exclusive": month_start(y, m, step).isoformat(),
+        }
+        item.update({name: _value(col[b]) for name, col in cols.items()})
+        item["by_rubro"] = [
+            {"rubro": rubro, "kind": kind, "neto": v[0], "iva": v[1], "total": v[2]}
+            for (rubro, kind), v in sorted(by_rubro.get(b, {}).items())
+        ]
+        periods.append(item)
+
+    return {
+        "from": period_key(*from_month_index(first)),
+        "to": period_key(*from_month_index(last)),
+        "granularity": granularity,
+        "periods": periods,
+    }
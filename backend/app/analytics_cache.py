@@ -0,0 +1,98 @@
+# backend/app/analytics_cache.py
+"""
+Cache de respuestas de analytics por usuario, con ETag.
+
+Cada escritura que afecta los números de un usuario (transacciones, stock)
+llama a bump() en su misma transacción: sube user_data_versions.version.
+La versión está en la base, así que también la ven los workers de OCR y
+los demás procesos web.
+
+Una consulta de analytics lee la versión (una fila por PK) y arma la clave
+(usuario, endpoint, parámetros, versión):
+- si el navegador manda If-None-Match con ese ETag -> 304 sin calcular nada;
+- si la clave está en el LRU del proceso -> se devuelve el cuerpo ya serializado;
+- si no, se calcula, se serializa una vez y se guarda.
+Las versiones viejas nunca se vuelven a pedir y salen por LRU/TTL.
+"""
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+
+from .db import UserDataVersion
+from .cache import LRUCache
+
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "1024"))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+
+# Subir si cambia la forma de alguna respuesta (invalida los ETag ya emitidos)
+ANALYTICS_RESPONSE_REV = 3
+
+_responses = LRUCache(ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL)
+
+
+def bump(db, user_id: str) -> None:
+    """Invalida los analytics del usuario. No hace commit."""
+    q = db.query(UserDataVersion).filter(UserDataVersion.user_id == user_id)
+    values = {UserDataVersion.version: UserDataVersion.version + 1}
+    if q.update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(UserDataVersion(user_id=user_id, version=1))
+    except IntegrityError:
+        # otro proceso creó la fila en paralelo
+        q.update(values, synchronize_session=False)
+
+
+def current_version(db, user_id: str) -> int:
+    row = (
+        db.query(UserDataVersion.version)
+        .filter(UserDataVersion.user_id == user_id)
+        .first()
+    )
+    return row[0] if row else 0
+
+
+class CacheKey:
+    def __init__(self, db, user_id: str, endpoint: str, *params):
+        self.key = (user_id, endpoint, params, current_version(db, user_id))
+        digest = hashlib.sha256(repr((ANALYTICS_RESPONSE_REV, self.key)).encode()).hexdigest()
+        self.etag = f'"{digest[:32]}"'
+
+    def headers(self) -> dict:
+        # private: por usuario; no-cache: el navegador revalida con If-None-Match
+        return {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def lookup(request: Request, key: CacheKey) -> Optional[Response]:
+    """Respuesta lista (304 o cuerpo cacheado) o None si hay que calcular."""
+    if _etag_matches(request, key.etag):
+        return Response(status_code=304, headers=key.headers())
+    body = _responses.get(key.key)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json", headers=key.headers())
+
+
+def store(key: CacheKey, payload) -> Response:
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _responses.put(key.key, body)
+    return Response(content=body, media_type="application/json", headers=key.headers())
@@ -5,12 +5,20 @@ from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from typing import Optional
 import hashlib
+import logging
 import os
+import threading
+import time
 
-from .db import SessionLocal, User
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, get_db, User
+from .cache import LRUCache
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY no configurada")
@@ -31,6 +39,11 @@ class UserLogin(BaseModel):
     password: str
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+
 def get_password_hash(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
@@ -41,44 +54,142 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (
+    now = datetime.utcnow()
+    expire = now + (
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    to_encode.update({"exp": expire})
+    # iat con microsegundos (NumericDate admite fracción): se compara contra
+    # credentials_changed_at sin perder los cambios del mismo segundo
+    to_encode.update({"exp": expire, "iat": _epoch(now)})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    """
-    Extrae el usuario actual a partir del JWT enviado en Authorization: Bearer <token>.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="No se pudo validar las credenciales",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# ==========================
+# Cache de principales
+# ==========================
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+# Tokens ya verificados por proceso: sha256(token) -> (User desacoplado, cacheado en)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+# Tope de vida en cache; además nunca pasa del exp del token. Es también la
+# demora máxima con la que se ve un usuario desactivado a mano en la base.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "300"))
+# Cada cuánto un proceso busca cambios de clave hechos en otros procesos
+# (una consulta indexada cada tantos segundos, no una por request): es la
+# demora máxima con la que otro worker deja de aceptar los tokens viejos.
+PRINCIPAL_REVOCATION_POLL = float(os.getenv("PRINCIPAL_REVOCATION_POLL", "5"))
+# Solapamiento entre consultas: commits demorados y relojes de otros hosts
+_POLL_OVERLAP = timedelta(seconds=30)
+
+_principals = LRUCache(PRINCIPAL_CACHE_SIZE)
+# user_id -> momento (monotonic) desde el que sus entradas cacheadas no valen
+_revoked: dict[str, float] = {}
+_revoked_lock = threading.Lock()
+
+_poll_lock = threading.Lock()
+_next_poll = 0.0  # monotonic
+# los cambios anteriores al arranque ya los ve _load_principal (camino lento)
+_polled_since = datetime.utcnow()
+# user_id -> credentials_changed_at ya aplicado (no se invalida dos veces)
+_applied: dict[str, datetime] = {}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
-    db = SessionLocal()
+
+def _epoch(value: datetime) -> float:
+    """Segundos desde epoch de un datetime UTC naive, con microsegundos."""
+    return (value - _EPOCH).total_seconds()
+
+
+def invalidate_user(user_id: str):
+    """Descarta los tokens cacheados del usuario en este proceso."""
+    now = time.monotonic()
+    with _revoked_lock:
+        # pasado el TTL ya no queda ninguna entrada cacheada de antes de la baja
+        for uid in [uid for uid, at in _revoked.items() if now - at > PRINCIPAL_CACHE_TTL]:
+            del _revoked[uid]
+        _revoked[user_id] = now
+
+
+def _poll_revocations():
+    """
+    Invalida en este proceso a los usuarios que cambiaron credenciales en
+    otro (credentials_changed_at desde la consulta anterior). Corre como
+    mucho cada PRINCIPAL_REVOCATION_POLL segundos, en un solo thread.
+    """
+    global _next_poll, _polled_since
+    if time.monotonic() < _next_poll or not _poll_lock.acquire(blocking=False):
+        return
     try:
-        user = db.query(User).filter(User.email == email).first()
-        if user is None or not user.is_active:
-            raise credentials_exception
-        return user
+        started = datetime.utcnow()
+        since = _polled_since - _POLL_OVERLAP
+        with SessionLocal() as db:
+            changed = (
+                db.query(User.id, User.credentials_changed_at)
+                .filter(User.credentials_changed_at > since)
+                .all()
+            )
+        for user_id, changed_at in changed:
+            if _applied.get(user_id) != changed_at:
+                _applied[user_id] = changed_at
+                invalidate_user(user_id)
+        for user_id in [u for u, at in _applied.items() if at <= since]:
+            del _applied[user_id]
+        _polled_since = started
+    except Exception:
+        logger.exception("No se pudieron consultar los cambios de credenciales")
     finally:
-        db.close()
+        _next_poll = time.monotonic() + PRINCIPAL_REVOCATION_POLL
+        _poll_lock.release()
+
+
+def _credentials_changed(user: User):
+    """Marca la fecha de cambio (los tokens anteriores dejan de valer). No hace commit."""
+    user.credentials_changed_at = datetime.utcnow()
+    invalidate_user(user.id)
+
+
+def set_password(user: User, new_password: str):
+    user.password_hash = get_password_hash(new_password)
+    _credentials_changed(user)
+
+
+def _load_principal(db: Session, payload: dict) -> Optional[User]:
+    """Camino lento: busca el usuario (por uid, o por email en tokens viejos)."""
+    uid = payload.get("uid")
+    if uid:
+        user = db.get(User, uid)
+    else:
+        user = db.query(User).filter(User.email == payload.get("sub")).first()
+    if user is None or not user.is_active:
+        return None
+    changed = user.credentials_changed_at
+    # tokens viejos traen iat entero (truncado): del mismo segundo del cambio
+    # quedan antes y se rechazan
+    if changed is not None and float(payload.get("iat") or 0) < _epoch(changed):
+        return None
+    # se comparte entre requests: fuera de la sesión
+    db.expunge(user)
+    return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    """
+    Extrae el usuario actual a partir del JWT enviado en Authorization: Bearer <token>.
+    """
+    return jwt_user_from_token(token, db)
 
 
 def get_current_user_flexible(
     token: str = Depends(oauth2_scheme),
     access_token: Optional[str] = Query(default=None),
+    db: Session = Depends(get_db),
 ) -> User:
     """
     Permite autenticar por header (Authorization: Bearer) o por query (?access_token=...).
@@ -87,12 +198,14 @@ def get_current_user_flexible(
     if access_token:
         token = access_token
     # llamamos a la validación normal
-    return jwt_user_from_token(token)
+    return jwt_user_from_token(token, db)
 
 
-def jwt_user_from_token(token: str) -> User:
+def jwt_user_from_token(token: str, db: Optional[Session] = None) -> User:
     """
-    Helper para reutilizar la lógica de get_current_user sin Depends.
+    Valida el JWT y devuelve el usuario. Un token ya verificado se resuelve
+    desde el cache de principales, sin decodificar ni ir a la base. Sin
+    `db` (uso fuera de un request) se abre una sesión propia en el camino lento.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -100,53 +213,84 @@ def jwt_user_from_token(token: str) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    _poll_revocations()
+    digest = _token_digest(token)
+    hit = _principals.get(digest)
+    if hit is not None:
+        user, cached_at = hit
+        revoked_at = _revoked.get(user.id)
+        if revoked_at is None or revoked_at < cached_at:
+            return user
+        _principals.pop(digest)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None and payload.get("uid") is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.email == email).first()
-        if user is None or not user.is_active:
-            raise credentials_exception
-        return user
-    finally:
-        db.close()
-
+    cached_at = time.monotonic()
+    if db is None:
+        with SessionLocal() as own:
+            user = _load_principal(own, payload)
+    else:
+        user = _load_principal(db, payload)
+    if user is None:
+        raise credentials_exception
 
-@router.post("/register")
-def register(user: UserCreate):
-    db = SessionLocal()
-    try:
-        existing = db.query(User).filter(User.email == user.email).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="El usuario ya existe")
-
-        db_user = User(email=user.email, password_hash=get_password_hash(user.password))
-        db.add(db_user)
-        db.commit()
-        return {"message": "Usuario registrado correctamente"}
-    finally:
-        db.close()
+    ttl = PRINCIPAL_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _principals.put(digest, (user, cached_at), ttl=ttl)
+    return user
 
 
-@router.post("/login")
-def login(user: UserLogin):
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.email == user.email).first()
-        if not db_user or not verify_password(user.password, db_user.password_hash):
-            raise HTTPException(status_code=400, detail="Credenciales inválidas")
+@router.post("/register")
+def register(
+    user: UserCreate,
+    db: Session = Depends(get_db),
+):
+    existing = db.query(User).filter(User.email == user.email).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="El usuario ya existe")
 
-        if not db_user.is_active:
-            raise HTTPException(status_code=400, detail="Usuario inactivo")
+    db_user = User(email=user.email, password_hash=get_password_hash(user.password))
+    db.add(db_user)
+    db.commit()
+    return {"message": "Usuario registrado correctamente"}
 
-        access_token = create_access_token({"sub": db_user.email})
-        return {"access_token": access_token, "token_type": "bearer"}
-    finally:
-        db.close()
 
+@router.post("/login")
+def login(
+    user: UserLogin,
+    db: Session = Depends(get_db),
+):
+    db_user = db.query(User).filter(User.email == user.email).first()
+    if not db_user or not verify_password(user.password, db_user.password_hash):
+        raise HTTPException(status_code=400, detail="Credenciales inválidas")
+
+    if not db_user.is_active:
+        raise HTTPException(status_code=400, detail="Usuario inactivo")
+
+    access_token = create_access_token({"sub": db_user.email, "uid": db_user.id})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/change-password")
+def change_password(
+    payload: PasswordChange,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Cambia la clave; los tokens emitidos antes dejan de valer. Devuelve uno nuevo."""
+    db_user = db.get(User, current_user.id)
+    if not db_user or not verify_password(payload.current_password, db_user.password_hash):
+        raise HTTPException(status_code=400, detail="Credenciales inválidas")
+
+    set_password(db_user, payload.new_password)
+    db.commit()
+
+    access_token = create_access_token({"sub": db_user.email, "uid": db_user.id})
+    return {"access_token": access_token, "token_type": "bearer"}
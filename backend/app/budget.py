@@ -0,0 +1,220 @@
+# backend/app/budget.py
+"""
+Presupuesto sugerido por rubro para los 12 meses siguientes (/budget/suggest).
+
+La historia sale de una sola consulta al rollup mensual (monthly_rollups)
+y se arma una matriz (rubro/kind x mes). Sobre ella, con NumPy y sin
+recorrer filas en Python:
+
+- estacionalidad: desvío medio de cada mes del año contra la media móvil
+  de 12 meses (con al menos SEASONAL_MIN_MONTHS meses de historia), así un
+  pago anual cae en su mes y no se reparte como costo mensual;
+- nivel: media recortada (y mediana) de la ventana reciente ya sin
+  estacionalidad, robusta a meses atípicos;
+- tendencia: pendiente por mínimos cuadrados de los últimos TREND_MONTHS
+  meses, amortiguada hacia adelante.
+
+Sugerencia del mes h: nivel + tendencia + estacionalidad del mes (>= 0).
+Un mes sin movimiento en un rubro es cero (un gasto único no se toma como
+gasto mensual); solo los meses anteriores al primer movimiento del usuario
+son "sin dato". Si esa historia no cubre la ventana, la sugerencia es el
+promedio simple de la ventana (total / window_months), como antes.
+"""
+
+import os
+
+import numpy as np
+
+from .db import MonthlyRollup
+from .periods import from_month_index, month_index, month_start, parse_period, period_key
+
+
+# Meses de historia que se leen hacia atrás
+BUDGET_HISTORY_MONTHS = int(os.getenv("BUDGET_HISTORY_MONTHS", "60"))
+HORIZON_MONTHS = 12
+# Fracción que se descarta en cada extremo para la media recortada
+TRIM_FRACTION = 0.2
+TREND_MONTHS = 12
+MIN_TREND_MONTHS = 6
+# Factor por mes de la tendencia proyectada (1 = lineal)
+TREND_DAMPING = 0.9
+SEASONAL_MIN_MONTHS = 24
+
+
+def load_matrix(db, user_id: str, first: int, n_months: int) -> tuple[list[tuple[str, str]], np.ndarray]:
+    """(rubro, kind) por fila y totales por mes desde el índice de mes `first`."""
+    rows = (
+        db.query(MonthlyRollup.period, MonthlyRollup.rubro, MonthlyRollup.kind, MonthlyRollup.total)
+        .filter(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.period >= period_key(*from_month_index(first)),
+            MonthlyRollup.period < period_key(*from_month_index(first + n_months)),
+        )
+        .all()
+    )
+    keys = sorted({(rubro, kind) for _, rubro, kind, _ in rows})
+    pos = {k: i for i, k in enumerate(keys)}
+    matrix = np.zeros((len(keys), n_months))
+    if rows:
+        r = np.fromiter((pos[(rubro, kind)] for _, rubro, kind, _ in rows), dtype=np.intp, count=len(rows))
+        c = np.fromiter(
+            (month_index(*parse_period(p)) - first for p, _, _, _ in rows), dtype=np.intp, count=len(rows)
+        )
+        v = np.fromiter((float(t or 0) for _, _, _, t in rows), dtype=float, count=len(rows))
+        np.add.at(matrix, (r, c), v)
+    return keys, matrix
+
+
+def _trimmed_mean(x: np.ndarray, fraction: float) -> np.ndarray:
+    """Media por fila descartando `fraction` de cada extremo; ignora NaN."""
+    s = np.sort(x, axis=1)  # NaN quedan al final
+    valid = (~np.isnan(x)).sum(axis=1, keepdims=True)
+    k = np.floor(valid * fraction)
+    pos = np.arange(x.shape[1])
+    keep = (pos >= k) & (pos < valid - k)
+    n = keep.sum(axis=1)
+    total = np.where(keep, np.nan_to_num(s), 0.0).sum(axis=1)
+    out = np.full(x.shape[0], np.nan)
+    np.divide(total, n, out=out, where=n > 0)
+    return out
+
+
+def _nanmedian(x: np.ndarray) -> np.ndarray:
+    out = np.full(x.shape[0], np.nan)
+    has = ~np.isnan(x).all(axis=1)
+    if has.any():
+        out[has] = np.nanmedian(x[has], axis=1)
+    return out
+
+
+def _seasonal(x: np.ndarray, moy: np.ndarray) -> np.ndarray:
+    """
+    Componente estacional (filas x 12 meses del año), de media cero.
+    Desvío de cada mes contra la media de los 12 meses que terminan en él
+    (una tendencia lineal solo corre todos los desvíos igual y se cancela
+    al centrar). Cero para filas con menos de SEASONAL_MIN_MONTHS meses.
+    """
+    n_rows, n = x.shape
+    out = np.zeros((n_rows, 12))
+    if n < 12:
+        return out
+    valid = ~np.isnan(x)
+    zero = np.zeros((n_rows, 1))
+    cs = np.concatenate([zero, np.cumsum(np.nan_to_num(x), axis=1)], axis=1)
+    cv = np.concatenate([zero, np.cumsum(valid, axis=1)], axis=1)
+    moving = (cs[:, 12:] - cs[:, :-12]) / 12.0
+    full = (cv[:, 12:] - cv[:, :-12]) == 12
+    dev = np.where(full, x[:, 11:] - moving, 0.0)
+
+    # suma y cantidad de desvíos por mes del año: (filas, meses) @ (meses, 12)
+    onehot = np.eye(12)[moy[11:]]
+    sums = dev @ onehot
+    counts = full.astype(float) @ onehot
+    seasonal = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    seasonal -= seasonal.mean(axis=1, keepdims=True)
+
+    enough = (valid.sum(axis=1) >= SEASONAL_MIN_MONTHS) & (counts > 0).all(axis=1)
+    out[enough] = seasonal[enough]
+    return out
+
+
+def _slope(y: np.ndarray) -> np.ndarray:
+    """Pendiente por fila (mínimos cuadrados sobre los meses con dato)."""
+    w = ~np.isnan(y)
+    n = w.sum(axis=1)
+    t = np.arange(y.shape[1], dtype=float)
+    yv = np.where(w, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = (w * t).sum(axis=1) / n
+        y_mean = yv.sum(axis=1) / n
+        dt_ = np.where(w, t - t_mean[:, None], 0.0)
+        num = (dt_ * (yv - y_mean[:, None])).sum(axis=1)
+        den = (dt_ * dt_).sum(axis=1)
+        slope = num / den
+    return np.where((n >= MIN_TREND_MONTHS) & (den > 0), slope, 0.0)
+
+
+def suggest(db, user_id: str, year: int, month: int, window_months: int = 6,
+            history_months: int = BUDGET_HISTORY_MONTHS) -> dict:
+    """
+    Sugerencias para `year-month` y los 11 meses siguientes, a partir de
+    los `history_months` meses anteriores. `window_months` es la ventana
+    reciente para el nivel (media recortada y mediana).
+    """
+    target = month_index(year, month)
+    history_months = max(1, history_months)
+    first = target - history_months
+    keys, matrix = load_matrix(db, user_id, first, history_months)
+    window = max(1, min(window_months, history_months))
+
+    # antes del primer mes con movimiento del usuario: sin dato (NaN)
+    active = matrix.any(axis=0)
+    start = int(active.argmax()) if active.any() else history_months
+    x = matrix.copy()
+    x[:, :start] = np.nan
+
+    if history_months - start >= window:
+        moy = (first + np.arange(history_months)) % 12
+        seasonal = _seasonal(x, moy)
+        deseasoned = x - seasonal[:, moy]
+
+        recent = deseasoned[:, -window:]
+        level = _trimmed_mean(recent, TRIM_FRACTION)
+        median = _nanmedian(recent)
+        slope = _slope(deseasoned[:, -TREND_MONTHS:])
+
+        # el nivel es el del centro de la ventana: se lleva al último mes
+        anchor = level + slope * (window - 1) / 2.0
+        damping = np.cumsum(TREND_DAMPING ** np.arange(1, HORIZON_MONTHS + 1))
+        target_moy = (target + np.arange(HORIZON_MONTHS)) % 12
+        forecast = anchor[:, None] + slope[:, None] * damping[None, :] + seasonal[:, target_moy]
+        forecast = np.clip(np.nan_to_num(forecast), 0.0, None)
+    else:
+        # historia corta: promedio de la ventana, sin tendencia ni estacionalidad
+        level = median = matrix[:, -window:].sum(axis=1) / window
+        slope = np.zeros(len(keys))
+        seasonal = np.zeros((len(keys), 12))
+        forecast = np.repeat(level[:, None], HORIZON_MONTHS, axis=1)
+
+    # mismo mes del año anterior (cae dentro de la historia)
+    last_year = np.full((len(keys), HORIZON_MONTHS), np.nan)
+    back = history_months - 12 + np.arange(HORIZON_MONTHS)
+    ok = back >= 0
+    last_year[:, ok] = x[:, back[ok]]
+
+    def value(v) -> float | None:
+        v = float(v)
+        return None if np.isnan(v) else round(v, 2)
+
+    lines = []
+    for i, (rubro, kind) in enumerate(keys):
+        months = forecast[i]
+        if not months.any():
+            continue
+        lines.append(
+            {
+                "rubro": rubro,
+                "kind": kind,
+                # mes pedido (compatibles con la respuesta anterior)
+                "suggested": round(float(months[0]), 2),
+                "monthly": round(float(months[0]), 2),
+                "annual": round(float(months.sum()), 2),
+                "months": [round(float(m), 2) for m in months],
+                "last_year": [value(v) for v in last_year[i]],
+                "trimmed_mean": value(level[i]),
+                "median": value(median[i]),
+                "trend": round(float(slope[i]), 2),
+                "seasonal": bool(seasonal[i].any()),
+            }
+        )
+
+    return {
+        "period": period_key(year, month),
+        "window_months": window,
+        "history_months": history_months,
+        "from": month_start(year, month, -window).isoformat(),
+        "history_from": month_start(year, month, -history_months).isoformat(),
+        "to_exclusive": month_start(year, month).isoformat(),
+        "months": [period_key(*from_month_index(target + h)) for h in range(HORIZON_MONTHS)],
+        "lines": lines,
+    }
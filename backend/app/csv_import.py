@@ -0,0 +1,331 @@
+# backend/app/csv_import.py
+"""
+Importación de transacciones desde CSV, por streaming y en bloques.
+
+El archivo se lee línea a línea (nunca entero en memoria), las filas se
+validan y se acumulan en bloques de CSV_IMPORT_CHUNK_ROWS transacciones, y
+cada bloque se escribe con un INSERT de Core en lote (executemany, sin
+objetos ORM) junto con su rollup mensual y la versión de datos del usuario, en su
+propio commit. Un bloque que falla se revierte solo; los anteriores quedan.
+
+Formatos (los mismos de siempre):
+- detallado: columnas date, kind, rubro, total (+ description opcional);
+- mensual: columna mes (+ año/anio opcional) y una columna por rubro.
+"""
+
+import csv
+import datetime as dt
+import os
+import uuid
+from decimal import Decimal
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .db import Transaction
+from . import analytics_cache
+from . import rollup
+
+
+# Transacciones por INSERT/commit
+CSV_IMPORT_CHUNK_ROWS = int(os.getenv("CSV_IMPORT_CHUNK_ROWS", "2000"))
+# Números de fila con error que se devuelven en la respuesta
+CSV_IMPORT_MAX_ERROR_ROWS = 1000
+
+_SNIFF_LINES = 5
+
+MONTHS = {
+    "enero": 1,
+    "febrero": 2,
+    "marzo": 3,
+    "abril": 4,
+    "mayo": 5,
+    "junio": 6,
+    "julio": 7,
+    "agosto": 8,
+    "setiembre": 9,
+    "septiembre": 9,
+    "octubre": 10,
+    "noviembre": 11,
+    "diciembre": 12,
+}
+INCOME_COLUMNS = ("ventas", "ingresos", "ventas totales")
+_IGNORE_COLUMNS = {"mes", "año", "anio", ""}
+
+_CENT = Decimal("0.01")
+_IVA_RATE = Decimal("0.22")
+
+
+class CsvFormatError(ValueError):
+    pass
+
+
+# ==========================
+# Lectura
+# ==========================
+
+def _decode(line: bytes) -> str:
+    # UTF-8 y, si no decodifica, latin-1 (exportaciones de Excel viejas)
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode("latin-1")
+
+
+def iter_text_lines(src: BinaryIO) -> Iterator[str]:
+    first = True
+    for line in src:
+        if first:
+            line = line.removeprefix(b"\xef\xbb\xbf")
+            first = False
+        yield _decode(line)
+
+
+def open_reader(src: BinaryIO) -> csv.DictReader:
+    """DictReader en streaming; el dialecto se detecta con las primeras líneas."""
+    lines = iter_text_lines(src)
+    head = []
+    for line in lines:
+        head.append(line)
+        if len(head) >= _SNIFF_LINES:
+            break
+    try:
+        dialect = csv.Sniffer().sniff("".join(head))
+    except csv.Error:
+        dialect = csv.excel
+
+    def all_lines():
+        yield from head
+        yield from lines
+
+    return csv.DictReader(all_lines(), dialect=dialect)
+
+
+# ==========================
+# Validación de filas
+# ==========================
+
+def _amounts(total: Decimal) -> tuple[Decimal, Decimal, Decimal]:
+    total = total.quantize(_CENT)
+    iva = (total * _IVA_RATE).quantize(_CENT)
+    return (total - iva).quantize(_CENT), iva, total
+
+
+def _parse_amount(raw: str) -> Decimal:
+    return Decimal(raw.replace(".", "").replace(",", "."))
+
+
+def _parse_date(raw: str) -> dt.date:
+    if "-" in raw:
+        return dt.datetime.strptime(raw, "%Y-%m-%d").date()
+    if "/" in raw:
+        return dt.datetime.strptime(raw, "%d/%m/%Y").date()
+    return dt.datetime.fromisoformat(raw).date()
+
+
+def parse_detailed_row(row: dict) -> dict:
+    """Una fila del formato detallado -> campos de Transaction. ValueError si es inválida."""
+    raw_date = (row.get("date") or "").strip()
+    if not raw_date:
+        raise ValueError("Fecha vacía")
+    occurred_on = _parse_date(raw_date)
+
+    kind = (row.get("kind") or "").strip().lower()
+    if kind not in ("income", "expense"):
+        raise ValueError("kind inválido")
+
+    total_str = (row.get("total") or "").strip()
+    if not total_str:
+        raise ValueError("total vacío")
+    neto, iva, total = _amounts(_parse_amount(total_str))
+
+    description = (row.get("description") or "").strip() or "Importado CSV"
+    return {
+        "kind": kind,
+        "occurred_on": occurred_on,
+        "rubro": (row.get("rubro") or "").strip() or "Sin rubro",
+        "neto": neto,
+        "iva": iva,
+        "total": total,
+        "description": description[:240],
+    }
+
+
+def _parse_month(mes_raw: str) -> int:
+    s = mes_raw.strip().lower()
+    if s.isdigit():
+        val = int(s)
+        if 1 <= val <= 12:
+            return val
+    if s in MONTHS:
+        return MONTHS[s]
+    raise ValueError(f"Mes inválido: {mes_raw!r}")
+
+
+def parse_monthly_row(row: dict, fieldnames: list[str], current_year: int) -> list[dict]:
+    """
+    Una fila del formato mensual -> una transacción por rubro con importe,
+    fechada el último día del mes. ValueError si el mes es inválido; las
+    celdas vacías, en cero o no numéricas se ignoran.
+    """
+    raw_mes = (row.get("mes") or "").strip()
+    if not raw_mes:
+        raise ValueError("Mes vacío")
+    month_num = _parse_month(raw_mes)
+
+    raw_year = (row.get("año") or row.get("anio") or "").strip()
+    year_val = int(raw_year) if raw_year.isdigit() else current_year
+    if month_num == 12:
+        next_month_first = dt.date(year_val + 1, 1, 1)
+    else:
+        next_month_first = dt.date(year_val, month_num + 1, 1)
+    occurred_on = next_month_first - dt.timedelta(days=1)
+
+    out = []
+    for col_name in fieldnames:
+        col_key = (col_name or "").strip()
+        col_norm = col_key.lower()
+        if col_norm in _IGNORE_COLUMNS:
+            continue
+
+        val_str = (row.get(col_name) or "").strip()
+        if not val_str:
+            continue
+        try:
+            amount = _parse_amount(val_str)
+        except Exception:
+            continue
+        if amount == 0:
+            continue
+
+        neto, iva, total = _amounts(amount)
+        rubro = col_key or "Sin rubro"
+        out.append(
+            {
+                "kind": "income" if col_norm in INCOME_COLUMNS else "expense",
+                "occurred_on": occurred_on,
+                "rubro": rubro,
+                "neto": neto,
+                "iva": iva,
+                "total": total,
+                "description": f"Histórico {raw_mes} - {rubro}"[:240],
+            }
+        )
+    return out
+
+
+# ==========================
+# Escritura por bloques
+# ==========================
+
+def _write_chunk(db, user_id: str, rows: list[dict]) -> None:
+    for r in rows:
+        r["id"] = str(uuid.uuid4())
+        r["user_id"] = user_id
+        r["document_id"] = "import-csv"
+    # executemany sobre la tabla (Core): sentencia compilada una vez y
+    # cacheada; el driver la manda en lotes (executemany de sqlite3,
+    # INSERT ... VALUES paginado con psycopg2)
+    db.execute(insert(Transaction.__table__), rows)
+    rollup.apply_many(db, rows)
+    analytics_cache.bump(db, user_id)
+    db.commit()
+
+
+def import_csv(db, user_id: str, src: BinaryIO, chunk_rows: int = CSV_IMPORT_CHUNK_ROWS) -> dict:
+    """
+    Importa el CSV de `src` (binario). Devuelve totales (importadas,
+    saltadas por inválidas, perdidas por bloques fallidos), el avance por
+    bloque y los números de línea con error. CsvFormatError si no tiene
+    encabezados o un formato reconocido.
+    """
+    reader = open_reader(src)
+    if not reader.fieldnames:
+        raise CsvFormatError("El CSV no tiene encabezados.")
+    fieldnames = list(reader.fieldnames)
+    headers = {h.strip().lower() for h in fieldnames if h}
+
+    if {"date", "kind", "rubro", "total"}.issubset(headers):
+        fmt = "detallado"
+
+        def parse(row):
+            return [parse_detailed_row(row)]
+
+    elif "mes" in headers:
+        fmt = "mensual"
+        current_year = dt.date.today().year
+
+        def parse(row):
+            return parse_monthly_row(row, fieldnames, current_year)
+
+    else:
+        raise CsvFormatError(
+            "El CSV no tiene formato reconocido. Se espera 'date,kind,rubro,total' "
+            "o bien 'mes, ventas, compras, ...'."
+        )
+
+    chunk_rows = max(1, chunk_rows)
+    imported = skipped = failed = 0
+    error_rows: list[int] = []
+    chunks: list[dict] = []
+    pending: list[dict] = []
+    chunk_first_line = None
+    chunk_skipped = 0
+    chunk_errors: list[int] = []
+
+    def flush(last_line: int):
+        nonlocal imported, skipped, failed, pending, chunk_first_line, chunk_skipped, chunk_errors
+        if not pending and not chunk_skipped:
+            return
+        info = {
+            "chunk": len(chunks) + 1,
+            "first_line": chunk_first_line,
+            "last_line": last_line,
+            "imported": 0,
+            "skipped": chunk_skipped,
+            "failed": 0,
+            "status": "ok",
+        }
+        if pending:
+            try:
+                _write_chunk(db, user_id, pending)
+                info["imported"] = len(pending)
+            except SQLAlchemyError as e:
+                db.rollback()
+                info.update(status="failed", failed=len(pending), error=type(e).__name__)
+                chunk_errors = list(range(chunk_first_line, last_line + 1))
+        imported += info["imported"]
+        skipped += info["skipped"]
+        failed += info["failed"]
+        for line in chunk_errors:
+            if len(error_rows) >= CSV_IMPORT_MAX_ERROR_ROWS:
+                break
+            error_rows.append(line)
+        chunks.append(info)
+        pending, chunk_first_line, chunk_skipped, chunk_errors = [], None, 0, []
+
+    line = 1
+    for row in reader:
+        line = reader.line_num
+        if chunk_first_line is None:
+            chunk_first_line = line
+        try:
+            pending.extend(parse(row))
+        except Exception:
+            chunk_skipped += 1
+            chunk_errors.append(line)
+        if len(pending) >= chunk_rows:
+            flush(line)
+    flush(line)
+
+    unit = "saltadas" if fmt == "detallado" else "meses con error"
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "failed": failed,
+        "format": fmt,
+        "chunks": chunks,
+        "error_rows": error_rows,
+        "message": f"Importadas {imported} filas (formato {fmt}), {unit} {skipped}.",
+    }
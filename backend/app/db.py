@@ -1,6 +1,9 @@
 import os
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
+    text,
     Column,
     String,
     Date,
@@ -8,11 +11,17 @@ from sqlalchemy import (
     Text,
     Numeric,
     Boolean,
+    Integer,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
+from typing import Optional
 import uuid
 
+from . import sql_profile
+
 # Base directory del backend
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -23,15 +32,92 @@ if DATABASE_URL:
     # Render a veces da "postgres://" y SQLAlchemy quiere "postgresql://"
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(
-    DATABASE_URL or f"sqlite:///{os.path.join(BASE_DIR, 'altium.db')}",
-    connect_args={"check_same_thread": False} if not DATABASE_URL else {},
-)
+# Perfil del engine: "production" (WAL + pragmas en SQLite, pool explícito
+# en Postgres) o "default" (lo que trae SQLAlchemy, para comparar)
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        # negativo = KiB
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
+
+
+def create_db_engine(url: Optional[str] = None, profile: str = DB_PROFILE):
+    """
+    Engine para `url` (por defecto DATABASE_URL o el SQLite local).
+
+    SQLite en "production": WAL (lectores no bloquean al escritor),
+    synchronous=NORMAL (seguro con WAL), busy timeout en vez de fallar con
+    "database is locked", mmap y cache de páginas más grandes.
+    Postgres en "production": pool con tamaño, timeout y reciclado explícitos
+    y pre_ping (Render corta conexiones ociosas).
+    En los dos, los hooks de sql_profile (conteo por request, SQL lenta).
+    """
+    eng = _create_engine(url, profile)
+    sql_profile.install(eng)
+    return eng
+
+
+def _create_engine(url: Optional[str], profile: str):
+    url = url or DATABASE_URL or f"sqlite:///{os.path.join(BASE_DIR, 'altium.db')}"
+    tuned = profile == "production"
+
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+        if tuned:
+            connect_args["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        eng = create_engine(url, connect_args=connect_args)
+        if tuned and ":memory:" not in url and url != "sqlite://":
+            event.listen(eng, "connect", _sqlite_pragmas)
+        return eng
+
+    if not tuned:
+        return create_engine(url)
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def get_db():
+    """Dependencia de FastAPI: una sesión por request, cerrada al terminar."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 # =========================
 # MODELOS
 # =========================
@@ -44,6 +130,8 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # tokens emitidos antes de esta fecha (cambio de clave / baja) no valen
+    credentials_changed_at = Column(DateTime, nullable=True, index=True)
 
 
 class Document(Base):
@@ -58,10 +146,18 @@ class Document(Base):
     status = Column(String, default="ready")
     ocr_text = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    batch_id = Column(String, nullable=True, index=True)
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # filtros por período (rangos semiabiertos, ver periods.py) y
+        # paginación keyset por (occurred_on, id) (ver ledger.py)
+        Index("ix_transactions_user_occurred_id", "user_id", "occurred_on", "id"),
+        Index("ix_transactions_user_rubro_occurred_id", "user_id", "rubro", "occurred_on", "id"),
+        Index("ix_transactions_document_id", "document_id"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, nullable=False, index=True)
@@ -77,6 +173,7 @@ class Transaction(Base):
 
 class Budget(Base):
     __tablename__ = "budgets"
+    __table_args__ = (Index("ix_budgets_user_year_month", "user_id", "year", "month"),)
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, nullable=False, index=True)
@@ -89,6 +186,7 @@ class Budget(Base):
 
 class StockSnapshot(Base):
     __tablename__ = "stock_snapshots"
+    __table_args__ = (Index("ix_stock_snapshots_user_year_month", "user_id", "year", "month"),)
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, nullable=False, index=True)
@@ -98,13 +196,114 @@ class StockSnapshot(Base):
     final_stock = Column(Numeric(14, 2), nullable=False, default=0)
 
 
+class MonthlyRollup(Base):
+    """
+    Totales por (usuario, período YYYY-MM, rubro, tipo). Se actualiza en la
+    misma transacción que cada alta de Transaction (ver rollup.py).
+    """
+    __tablename__ = "monthly_rollups"
+
+    user_id = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)  # YYYY-MM
+    rubro = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    neto = Column(Numeric(14, 2), nullable=False, default=0)
+    iva = Column(Numeric(14, 2), nullable=False, default=0)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UserDataVersion(Base):
+    """
+    Versión de los datos de un usuario: se incrementa en cada escritura de
+    transacciones o stock (ver analytics_cache.py) e invalida sus analytics.
+    """
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RubroRule(Base):
+    """Regla de clasificación: si el texto contiene `pattern`, el rubro es `rubro`."""
+    __tablename__ = "rubro_rules"
+    __table_args__ = (UniqueConstraint("user_id", "pattern", name="uq_rubro_rules_user_pattern"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, nullable=False, index=True)
+    pattern = Column(String, nullable=False)  # normalizado (minúsculas)
+    rubro = Column(String, nullable=False)
+    source = Column(String, nullable=False, default="manual")  # manual | learned
+    # learned: veces que se confirmó descripción -> rubro (activa desde rubros.RUBRO_LEARN_MIN_CONFIRMATIONS)
+    confirmations = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OcrCacheEntry(Base):
+    """Resultado OCR + parsing por contenido (checksum) y versión del pipeline."""
+    __tablename__ = "ocr_cache"
+
+    checksum = Column(String, primary_key=True)
+    pipeline_version = Column(String, primary_key=True)
+    ocr_text = Column(Text)
+    parsed = Column(Text)  # JSON con los campos parseados
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 # =========================
 # INIT DB
 # =========================
 
+def _add_missing_columns():
+    """
+    create_all no altera tablas existentes: agrega con ALTER TABLE las
+    columnas nuevas (nullable) que falten en bases ya creadas.
+    """
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing or not col.nullable:
+                continue
+            col_type = col.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+
+
+# Índices reemplazados por otros (se borran de bases existentes)
+_OBSOLETE_INDEXES = {
+    "transactions": ("ix_transactions_user_occurred_on",),
+}
+
+
+def _create_missing_indexes():
+    """
+    create_all tampoco agrega índices nuevos a tablas existentes: se crean
+    acá (CREATE INDEX) los declarados en los modelos que falten y se borran
+    los que quedaron obsoletos.
+    """
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+        for name in _OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f"DROP INDEX {name}"))
+
+
 def init_db():
     """
-    Crea las tablas si no existen.
-    Llamado desde main.py al arrancar la app.
+    Crea las tablas si no existen y agrega columnas e índices nuevos a las
+    existentes. Llamado desde main.py al arrancar la app.
     """
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
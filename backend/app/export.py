@@ -0,0 +1,181 @@
+# backend/app/export.py
+"""
+Exportación del libro de transacciones (GET /transactions/export).
+
+Las filas se leen con yield_per + stream_results (cursor del lado del
+servidor en Postgres; en SQLite el cursor ya es incremental) y se escriben
+bloque a bloque en la respuesta: ni el resultado completo ni el archivo
+generado están nunca enteros en memoria.
+
+- csv: texto UTF-8 con BOM (Excel lo abre bien), opcionalmente gzip;
+- parquet: un row group por bloque; requiere `pip install pyarrow`
+  (dependencia opcional). Con gzip se usa compresión gzip interna.
+"""
+
+import csv
+import datetime as dt
+import io
+import os
+import zlib
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from .db import SessionLocal, Transaction
+
+
+# Filas por bloque leído de la base / escrito en la respuesta
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+COLUMNS = ("id", "date", "kind", "rubro", "neto", "iva", "total", "description", "document_id")
+
+
+class ExportUnavailable(RuntimeError):
+    pass
+
+
+def _query(user_id: str, start: Optional[dt.date], end: Optional[dt.date]):
+    stmt = select(
+        Transaction.id,
+        Transaction.occurred_on,
+        Transaction.kind,
+        Transaction.rubro,
+        Transaction.neto,
+        Transaction.iva,
+        Transaction.total,
+        Transaction.description,
+        Transaction.document_id,
+    ).where(Transaction.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(Transaction.occurred_on >= start)
+    if end is not None:
+        stmt = stmt.where(Transaction.occurred_on < end)
+    # recorre el índice (user_id, occurred_on)
+    return stmt.order_by(Transaction.occurred_on, Transaction.id)
+
+
+def iter_batches(user_id: str, start: Optional[dt.date], end: Optional[dt.date], batch_rows: int) -> Iterator[list]:
+    """
+    Bloques de filas de [start, end). Abre su propia sesión: el generador
+    se consume mientras se envía la respuesta, después de que el endpoint
+    ya devolvió.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            _query(user_id, start, end).execution_options(yield_per=batch_rows, stream_results=True)
+        )
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def _csv_chunks(batches: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        for r in batch:
+            writer.writerow(
+                (r.id, r.occurred_on.isoformat(), r.kind, r.rubro, r.neto, r.iva, r.total, r.description, r.document_id)
+            )
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    rest = buf.getvalue()
+    if rest:
+        yield rest.encode("utf-8")
+
+
+class _Drain(io.RawIOBase):
+    """Sink de escritura que se vacía después de cada row group."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _parquet_modules():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportUnavailable("La exportación parquet requiere el paquete 'pyarrow'") from e
+    return pa, pq
+
+
+def _parquet_chunks(batches: Iterator[list], pa, pq, compression: str) -> Iterator[bytes]:
+    money = pa.decimal128(14, 2)
+    schema = pa.schema(
+        [
+            ("id", pa.string()),
+            ("date", pa.date32()),
+            ("kind", pa.string()),
+            ("rubro", pa.string()),
+            ("neto", money),
+            ("iva", money),
+            ("total", money),
+            ("description", pa.string()),
+            ("document_id", pa.string()),
+        ]
+    )
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_stream(
+    user_id: str,
+    start: Optional[dt.date],
+    end: Optional[dt.date],
+    fmt: str,
+    gzip: bool = False,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """
+    Bytes del archivo exportado, bloque a bloque. `end` es exclusivo.
+    ExportUnavailable (antes de empezar a enviar) si falta pyarrow.
+    """
+    if fmt == "parquet":
+        pa, pq = _parquet_modules()
+        batches = iter_batches(user_id, start, end, batch_rows)
+        return _parquet_chunks(batches, pa, pq, "gzip" if gzip else "snappy")
+    batches = iter_batches(user_id, start, end, batch_rows)
+    chunks = _csv_chunks(batches)
+    return _gzip(chunks) if gzip else chunks
@@ -0,0 +1,331 @@
+# backend/app/jobs.py
+
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import datetime as dt
+from typing import Optional
+
+from .db import SessionLocal, Document, Transaction
+from .ocr import ocr_pdf_file, ocr_image_file, is_pdf, parse_document_text, set_pdf_workers, OCR_PDF_WORKERS
+from . import ocr_cache
+from . import metrics
+from . import rubros
+from . import rollup
+from . import analytics_cache
+from . import search
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Configuración de la cola
+# ==========================
+
+# Procesos que corren OCR en paralelo (Tesseract es CPU-bound)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+# Máximo de documentos en cola + en proceso antes de rechazar uploads
+OCR_QUEUE_MAX = int(os.getenv("OCR_QUEUE_MAX", "100"))
+# Veces que un documento vuelve a la cola si el worker muere (OOM, segfault)
+OCR_CRASH_RETRIES = int(os.getenv("OCR_CRASH_RETRIES", "1"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(OCR_QUEUE_MAX)
+
+# Documentos esperando slot (uploads en lote que superan OCR_QUEUE_MAX)
+_backlog: deque = deque()
+_backlog_lock = threading.Lock()
+
+# document_id -> veces que estaba en el pool cuando se rompió
+_crashes: dict[str, int] = {}
+_crashes_lock = threading.Lock()
+
+
+def pdf_workers_per_job() -> int:
+    """Procesos de páginas por worker: OCR_WORKERS x esto no pasa de los cores."""
+    return max(1, min(OCR_PDF_WORKERS, (os.cpu_count() or 1) // max(1, OCR_WORKERS)))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Pool de procesos creado a demanda. Usamos "spawn" para no heredar
+    por fork los threads ni las conexiones a la base del proceso web.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, OCR_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=set_pdf_workers,
+                initargs=(pdf_workers_per_job(),),
+            )
+        return _executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor):
+    """
+    Un worker murió y el pool quedó roto (BrokenProcessPool para todo lo
+    que se le mande): se descarta y get_executor() crea uno nuevo.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:  # otro thread pudo haberlo reemplazado ya
+            _executor = None
+    try:
+        broken.shutdown(wait=False, cancel_futures=True)
+    except Exception:
+        pass
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# ==========================
+# Encolado
+# ==========================
+
+def acquire_slot() -> bool:
+    """Reserva un lugar en la cola. False si está llena."""
+    return _slots.acquire(blocking=False)
+
+
+def release_slot():
+    try:
+        _slots.release()
+    except ValueError:
+        pass
+
+
+def submit_document(document_id: str) -> Future:
+    """
+    Envía el documento al pool. Se asume un slot ya reservado con
+    acquire_slot(); se libera cuando el job termina.
+    """
+    try:
+        executor = get_executor()
+        try:
+            fut = executor.submit(process_document, document_id)
+        except BrokenProcessPool:
+            logger.warning("Pool de OCR roto; se crea uno nuevo")
+            _discard_executor(executor)
+            executor = get_executor()
+            fut = executor.submit(process_document, document_id)
+    except Exception:
+        release_slot()
+        raise
+    fut.add_done_callback(partial(_on_done, executor, document_id))
+    return fut
+
+
+def enqueue_document(document_id: str):
+    """
+    Encola sin rechazar: si la cola está llena, el documento espera en
+    memoria y entra al pool a medida que terminan otros jobs.
+    """
+    with _backlog_lock:
+        _backlog.append(document_id)
+    _pump_backlog()
+
+
+def _pump_backlog():
+    while True:
+        with _backlog_lock:
+            if not _backlog or not acquire_slot():
+                return
+            document_id = _backlog.popleft()
+        try:
+            submit_document(document_id)
+        except RuntimeError:
+            # pool cerrado (apagando): queda "pending" y se reencola al arrancar.
+            # Un pool roto no llega acá: submit_document lo reemplaza
+            return
+
+
+def _on_done(executor: ProcessPoolExecutor, document_id: str, fut: Future):
+    release_slot()
+    try:
+        result = fut.result()
+    except BrokenProcessPool:
+        logger.error("El worker de OCR murió con el documento %s en el pool", document_id)
+        _discard_executor(executor)
+        _recover_crashed(document_id)
+    except Exception:
+        logger.exception("Fallo inesperado en el worker de OCR")
+    else:
+        with _crashes_lock:
+            _crashes.pop(document_id, None)
+        if result.get("ocr_pass"):
+            metrics.inc("ocr_pass_total", **{"pass": result["ocr_pass"]})
+        metrics.record_spans(result.get("spans") or {})
+        logger.info("Documento %s procesado: %s", result.get("document_id"), result.get("status"))
+    _pump_backlog()
+
+
+def _recover_crashed(document_id: str):
+    """
+    Cuando el pool se rompe fallan todos sus futures, no solo el del
+    documento que lo tiró: cada uno vuelve a "pending" y a la cola hasta
+    OCR_CRASH_RETRIES veces; después queda "failed" (probablemente es el
+    que mata al worker).
+    """
+    with _crashes_lock:
+        crashes = _crashes.get(document_id, 0) + 1
+        retry = crashes <= OCR_CRASH_RETRIES
+        if retry:
+            _crashes[document_id] = crashes
+        else:
+            _crashes.pop(document_id, None)
+
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(
+            Document.id == document_id,
+            Document.status.in_(("pending", "processing")),
+        ).update({Document.status: "pending" if retry else "failed"}, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("No se pudo recuperar el documento %s", document_id)
+        return
+    finally:
+        db.close()
+
+    if retry:
+        enqueue_document(document_id)
+
+
+def requeue_pending():
+    """
+    Al arrancar, vuelve a encolar documentos que quedaron en "pending"
+    (por ejemplo, si el proceso se reinició con trabajos en cola). Los que
+    quedaron en "processing" eran de un worker que ya no existe: vuelven a
+    "pending", si no el cliente los consultaría para siempre.
+    """
+    db = SessionLocal()
+    try:
+        stale = (
+            db.query(Document)
+            .filter(Document.status == "processing")
+            .update({Document.status: "pending"}, synchronize_session=False)
+        )
+        db.commit()
+        if stale:
+            logger.warning("%s documentos en \"processing\" vuelven a la cola", stale)
+        ids = [r[0] for r in db.query(Document.id).filter(Document.status == "pending").all()]
+    finally:
+        db.close()
+
+    for doc_id in ids:
+        enqueue_document(doc_id)
+
+
+# ==========================
+# Worker (corre en el proceso hijo)
+# ==========================
+
+def finalize_document(db, doc: Document, ocr_text: str, parsed: dict) -> Transaction:
+    """
+    Crea la Transaction a partir de los campos parseados y deja el
+    Document en "ready" (y reindexado para la búsqueda). El rubro sale de
+    las reglas del usuario (el resultado parseado/cacheado no depende del
+    usuario). No hace commit.
+    """
+    rubro = rubros.classify(db, doc.user_id, ocr_text) or "Sin clasificar"
+    trx = Transaction(
+        user_id=doc.user_id,
+        kind=parsed["kind"],
+        occurred_on=dt.date.fromisoformat(parsed["date"]),
+        rubro=rubro,
+        neto=parsed["neto"],
+        iva=parsed["iva"],
+        total=parsed["total"],
+        description=(ocr_text or "")[:240],
+        document_id=str(doc.id),
+    )
+    db.add(trx)
+    rollup.apply(db, trx)
+    analytics_cache.bump(db, doc.user_id)
+    doc.ocr_text = ocr_text
+    doc.status = "ready"
+    search.index_document(db, doc)
+    return trx
+
+
+def _claim(db, document_id: str) -> bool:
+    """Pasa pending -> processing de forma atómica para no procesar dos veces."""
+    with metrics.span("document.claim"):
+        updated = (
+            db.query(Document)
+            .filter(Document.id == document_id, Document.status == "pending")
+            .update({Document.status: "processing"}, synchronize_session=False)
+        )
+        db.commit()
+    return updated == 1
+
+
+def process_document(document_id: str) -> dict:
+    """
+    OCR + parsing de un documento ya guardado en disco.
+    Crea la Transaction y deja el Document en "ready" o "failed".
+    Corre en el pool: los tiempos por etapa vuelven en "spans" y
+    _on_done los registra en las métricas del proceso web.
+    """
+    with metrics.collect_spans() as spans:
+        result = _process_document(document_id)
+    result["spans"] = spans
+    return result
+
+
+def _process_document(document_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        if not _claim(db, document_id):
+            return {"document_id": document_id, "status": "skipped"}
+
+        doc = db.get(Document, document_id)
+        try:
+            cached = ocr_cache.get(db, doc.checksum) if doc.checksum else None
+            if cached is not None:
+                ocr_text, parsed = cached
+                ocr_pass = "cache"
+            else:
+                with metrics.span("document.ocr"):
+                    if is_pdf(doc.original_filename, doc.mime_type):
+                        ocr_text = ocr_pdf_file(doc.storage_key)
+                        ocr_pass = "pdf"
+                    else:
+                        ocr_text, ocr_pass = ocr_image_file(doc.storage_key)
+                with metrics.span("document.parse"):
+                    parsed = parse_document_text(ocr_text)
+                # no cacheamos OCR vacío (puede ser un fallo transitorio)
+                if doc.checksum and ocr_text:
+                    ocr_cache.put(db, doc.checksum, ocr_text, parsed)
+
+            with metrics.span("document.finalize"):
+                finalize_document(db, doc, ocr_text, parsed)
+            with metrics.span("document.commit"):
+                db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Error procesando documento %s", document_id)
+            db.query(Document).filter(Document.id == document_id).update(
+                {Document.status: "failed"}, synchronize_session=False
+            )
+            db.commit()
+            return {"document_id": document_id, "status": "failed"}
+
+        return {"document_id": document_id, "status": "ready", "ocr_pass": ocr_pass}
+    finally:
+        db.close()
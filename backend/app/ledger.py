@@ -0,0 +1,139 @@
+# backend/app/ledger.py
+"""
+Listado de transacciones con filtros y paginación keyset (GET /transactions).
+
+El orden es (occurred_on, id), el mismo de los índices compuestos
+(user_id, occurred_on, id) y (user_id, rubro, occurred_on, id). Cada página
+continúa desde la última fila de la anterior con
+
+    occurred_on <= d AND (occurred_on < d OR id < i)        (orden desc)
+
+así que la base entra al índice directo en esa posición: el costo de una
+página no depende de cuántas se recorrieron antes (a diferencia de OFFSET).
+El cursor es opaco para el cliente: base64 de (orden, fecha, id).
+"""
+
+import base64
+import datetime as dt
+import json
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, or_
+
+from .db import Transaction
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order: str, occurred_on: dt.date, trx_id: str) -> str:
+    raw = json.dumps([order, occurred_on.isoformat(), trx_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> tuple[dt.date, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_order, c_date, c_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        occurred_on = dt.date.fromisoformat(c_date)
+    except Exception as e:
+        raise InvalidCursor(cursor) from e
+    if c_order != order or not isinstance(c_id, str):
+        raise InvalidCursor(cursor)
+    return occurred_on, c_id
+
+
+def _item(trx: Transaction) -> dict:
+    return {
+        "id": trx.id,
+        "date": trx.occurred_on.isoformat(),
+        "kind": trx.kind,
+        "rubro": trx.rubro,
+        "neto": float(trx.neto or 0),
+        "iva": float(trx.iva or 0),
+        "total": float(trx.total or 0),
+        "description": trx.description,
+        "document_id": trx.document_id,
+    }
+
+
+def page_query(
+    db,
+    user_id: str,
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    kind: Optional[str] = None,
+    rubro: Optional[str] = None,
+    min_total: Optional[Decimal] = None,
+    max_total: Optional[Decimal] = None,
+    document_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    order: str = "desc",
+):
+    """Query filtrada y ordenada que sigue al cursor (sin LIMIT). `end` es exclusivo."""
+    q = db.query(Transaction).filter(Transaction.user_id == user_id)
+    if start is not None:
+        q = q.filter(Transaction.occurred_on >= start)
+    if end is not None:
+        q = q.filter(Transaction.occurred_on < end)
+    if kind:
+        q = q.filter(Transaction.kind == kind)
+    if rubro:
+        q = q.filter(Transaction.rubro == rubro)
+    if min_total is not None:
+        q = q.filter(Transaction.total >= min_total)
+    if max_total is not None:
+        q = q.filter(Transaction.total <= max_total)
+    if document_id:
+        q = q.filter(Transaction.document_id == document_id)
+
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, order)
+        if order == "desc":
+            q = q.filter(
+                Transaction.occurred_on <= after_date,
+                or_(
+                    Transaction.occurred_on < after_date,
+                    and_(Transaction.occurred_on == after_date, Transaction.id < after_id),
+                ),
+            )
+        else:
+            q = q.filter(
+                Transaction.occurred_on >= after_date,
+                or_(
+                    Transaction.occurred_on > after_date,
+                    and_(Transaction.occurred_on == after_date, Transaction.id > after_id),
+                ),
+            )
+
+    if order == "desc":
+        q = q.order_by(Transaction.occurred_on.desc(), Transaction.id.desc())
+    else:
+        q = q.order_by(Transaction.occurred_on.asc(), Transaction.id.asc())
+    return q
+
+
+def list_transactions(db, user_id: str, limit: int = DEFAULT_PAGE_SIZE, order: str = "desc", **filters) -> dict:
+    """Una página de transacciones; `filters` y `cursor` como en page_query()."""
+    q = page_query(db, user_id, order=order, **filters)
+    # una fila de más para saber si hay otra página
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(order, last.occurred_on, last.id)
+
+    return {
+        "items": [_item(t) for t in rows],
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
@@ -1,6 +1,7 @@
 # backend/app/main.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -15,170 +16,47 @@ from .db import (
     Transaction,
     Budget,
     StockSnapshot,
+    RubroRule,
+    get_db,
     init_db,
 )
 
+from . import jobs
+from . import ocr_cache
+from . import metrics
+from . import rubros
+from . import rollup
+from . import analytics
+from . import analytics_cache
+from . import budget
+from . import csv_import
+from . import export
+from . import ledger
+from . import search
+from . import sql_profile
+from .storage import store_stream, UploadTooLarge, MAX_UPLOAD_BYTES
+from .periods import month_index, parse_period, period_key, shift_month
+
 
 import os
-import hashlib
-import re
-import csv
-import platform
-from io import BytesIO, StringIO
-from datetime import datetime, timedelta
+import uuid
+import zipfile
+import mimetypes
+from datetime import datetime
 import datetime as dt
 from decimal import Decimal
 from typing import Optional, Literal
 
-from sqlalchemy import func
-
-# OCR / imágenes / PDF
-import pytesseract
-from PIL import Image, ImageOps, ImageFilter
-import fitz  # PyMuPDF
-
-
-# ==========================
-# Configuración Tesseract
-# ==========================
-
-if platform.system() == "Windows":
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-
-# ==========================
-# Funciones de OCR
-# ==========================
-
-def ocr_image_bytes(data: bytes) -> str:
-    """OCR sobre imagen con preprocesado básico (sin OpenCV)."""
-    try:
-        img = Image.open(BytesIO(data))
-    except Exception:
-        return ""
-    try:
-        img = img.convert("L")
-        w, h = img.size
-        img = img.resize((max(1, w * 2), max(1, h * 2)))  # upsample ~>300dpi
-        img = ImageOps.autocontrast(img)
-        img = img.filter(ImageFilter.MedianFilter(size=3))
-
-        hist = img.histogram()
-        thr = 180 if sum(hist[:128]) < sum(hist[128:]) else 150
-        img = img.point(lambda p: 255 if p > thr else 0)
-
-        cfg = "--oem 1 --psm 6 -c preserve_interword_spaces=1"
-        text = pytesseract.image_to_string(img, lang="spa+eng", config=cfg)
-        return (text or "").strip()
-    except Exception:
-        return ""
-
-
-def ocr_pdf_bytes(data: bytes) -> str:
-    """PDF: intenta texto nativo; si no, rasteriza y hace OCR."""
-    parts: list[str] = []
-    try:
-        doc = fitz.open(stream=data, filetype="pdf")
-    except Exception:
-        return ""
-    for page in doc:
-        t = (page.get_text("text") or "").strip()
-        if len(t) >= 25:
-            parts.append(t)
-            continue
-        try:
-            pix = page.get_pixmap(dpi=300, alpha=False)
-            pil_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            buf = BytesIO()
-            pil_img.save(buf, format="PNG")
-            t_ocr = ocr_image_bytes(buf.getvalue())
-            if t_ocr:
-                parts.append(t_ocr)
-        except Exception:
-            pass
-    return "\n\n".join(parts).strip()
-
-
-# ==========================
-# Helpers de parsing contable
-# ==========================
-
-def extract_date(text: str) -> str:
-    m = re.search(
-        r"(20\d{2}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]20\d{2})",
-        text,
-    )
-    if not m:
-        return dt.date.today().isoformat()
-    raw = m.group(0).replace("/", "-").replace(".", "-")
-    parts = raw.split("-")
-    try:
-        if len(parts[0]) == 4:
-            return dt.datetime.strptime(raw, "%Y-%m-%d").date().isoformat()
-        else:
-            return dt.datetime.strptime(raw, "%d-%m-%Y").date().isoformat()
-    except Exception:
-        return dt.date.today().isoformat()
-
-
-def parse_rubro(text: str) -> Optional[str]:
-    keywords = {
-        "alquiler": "Alquiler",
-        "rent": "Alquiler",
-        "luz": "Servicios",
-        "ute": "Servicios",
-        "energ": "Servicios",
-        "agua": "Servicios",
-        "ose": "Servicios",
-        "internet": "Servicios",
-        "telefon": "Servicios",
-        "combust": "Movilidad",
-        "nafta": "Movilidad",
-        "gasol": "Movilidad",
-        "proveed": "Mercaderías",
-        "insumo": "Insumos",
-        "materia prima": "Insumos",
-        "venta": "Ventas",
-        "ingreso": "Ventas",
-        "factura": "Ventas",
-    }
-    lo = text.lower()
-    for k, v in keywords.items():
-        if k in lo:
-            return v
-    return None
-
-
-def parse_iva_y_neto(
-    text: str,
-) -> tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
-    nums = re.findall(r"\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})", text)
-    if not nums:
-        return None, None, None
-    vals = [Decimal(n.replace(".", "").replace(",", ".")) for n in nums]
-    total = max(vals)
-
-    m_iva = re.search(r"iva[^0-9]*([\d.,]{1,15})", text.lower())
-    if m_iva:
-        iva = Decimal(m_iva.group(1).replace(".", "").replace(",", "."))
-        neto = total - iva
-        return (
-            iva.quantize(Decimal("0.01")),
-            neto.quantize(Decimal("0.01")),
-            total.quantize(Decimal("0.01")),
-        )
-
-    iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
-    neto = (total - iva).quantize(Decimal("0.01"))
-    return iva, neto, total.quantize(Decimal("0.01"))
+from sqlalchemy.orm import Session
 
 
 # ==========================
 # Configuración general app
 # ==========================
 
-STORAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "storage")
-os.makedirs(STORAGE_PATH, exist_ok=True)
+# Límites de /documents/upload-batch
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "500")) * 1024 * 1024
 
 app = FastAPI(title="Altium Finanzas API")
 
@@ -198,9 +76,102 @@ app.add_middleware(
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 
 
+class _BodyTooLarge(Exception):
+    pass
+
+
+def _upload_limit(scope) -> Optional[int]:
+    """Tope del body para los uploads de documentos; None si no aplica."""
+    if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/documents/"):
+        return None
+    limit = BATCH_MAX_BYTES if scope["path"] == "/documents/upload-batch" else MAX_UPLOAD_BYTES
+    # margen para los encabezados multipart
+    return limit + 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rechaza con 413 los uploads de documentos que superan el tope: por
+    Content-Length antes de leer el body y, como el header puede faltar
+    (chunked) o mentir, contando los bytes que llegan; al pasarse corta la
+    lectura antes de que el parser multipart los vuelque a disco.
+    (store_stream vuelve a controlar el tamaño real por archivo.)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = _upload_limit(scope)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse(
+            status_code=413,
+            content={"detail": "El archivo supera el tamaño máximo permitido"},
+        )
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def receive_wrapper():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal started
+            # el parser convierte el corte en su propio error: se reemplaza por el 413
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not started:
+            await too_large(scope, receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+
+# Agregados al final = los más externos: miden también los 413 de arriba
+app.add_middleware(sql_profile.SqlProfileMiddleware)
+app.add_middleware(metrics.HttpMetricsMiddleware)
+
+
 @app.on_event("startup")
 def startup():
     init_db()
+    db = SessionLocal()
+    try:
+        ocr_cache.prune_stale(db)
+        rollup.backfill_if_empty(db)
+        search.init_index(db.get_bind())
+        search.backfill_if_empty(db)
+    finally:
+        db.close()
+    jobs.requeue_pending()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    jobs.shutdown()
 
 
 @app.get("/")
@@ -213,16 +184,55 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Contadores e histogramas del proceso en formato de texto de Prometheus."""
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/metrics/ocr")
+def ocr_metrics():
+    """Cuántos documentos resolvió cada pasada OCR (fast / full / pdf / cache)."""
+    by_pass = {c["labels"]["pass"]: c["value"] for c in metrics.counters("ocr_pass_total")}
+    return {"ocr_pass": by_pass, "total": sum(by_pass.values())}
+
+
 # ==========================
 # Pydantic models
 # ==========================
 
 class UploadResponse(BaseModel):
     document_id: str
+    status: str = "pending"
     ocr_preview: str
     parsed: Optional[dict] = None
 
 
+class BatchItem(BaseModel):
+    filename: str
+    document_id: Optional[str] = None
+    status: str  # pending | ready | duplicate | rejected
+    detail: Optional[str] = None
+    parsed: Optional[dict] = None  # "ready" (resultado OCR cacheado)
+
+
+class BatchUploadResponse(BaseModel):
+    batch_id: str
+    total: int
+    items: list[BatchItem]
+
+
+class DocumentStatusResponse(BaseModel):
+    document_id: str
+    status: str  # pending | processing | ready | failed
+    original_filename: Optional[str] = None
+    created_at: Optional[datetime] = None
+    ocr_preview: str = ""
+    parsed: Optional[dict] = None
+
+
 class ManualTransactionIn(BaseModel):
     date: dt.date
     kind: Literal["income", "expense"]
@@ -231,6 +241,11 @@ class ManualTransactionIn(BaseModel):
     total: Decimal
 
 
+class RubroRuleIn(BaseModel):
+    pattern: str
+    rubro: str
+
+
 class StockIn(BaseModel):
     initial_stock: Decimal
     final_stock: Decimal
@@ -245,37 +260,34 @@ def get_stock(
     year: int = Query(...),
     month: int = Query(...),
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        ym = f"{year:04d}"
-        mm = f"{month:02d}"
-
-        snap = (
-            db.query(StockSnapshot)
-            .filter(
-                StockSnapshot.user_id == current_user.id,
-                StockSnapshot.year == ym,
-                StockSnapshot.month == mm,
-            )
-            .first()
+    ym = f"{year:04d}"
+    mm = f"{month:02d}"
+
+    snap = (
+        db.query(StockSnapshot)
+        .filter(
+            StockSnapshot.user_id == current_user.id,
+            StockSnapshot.year == ym,
+            StockSnapshot.month == mm,
         )
-        if not snap:
-            return {
-                "year": year,
-                "month": month,
-                "initial_stock": None,
-                "final_stock": None,
-            }
-
+        .first()
+    )
+    if not snap:
         return {
             "year": year,
             "month": month,
-            "initial_stock": float(snap.initial_stock or 0),
-            "final_stock": float(snap.final_stock or 0),
+            "initial_stock": None,
+            "final_stock": None,
         }
-    finally:
-        db.close()
+
+    return {
+        "year": year,
+        "month": month,
+        "initial_stock": float(snap.initial_stock or 0),
+        "final_stock": float(snap.final_stock or 0),
+    }
 
 
 @app.post("/stock")
@@ -284,136 +296,359 @@ def upsert_stock(
     month: int = Query(...),
     payload: StockIn = None,
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     if payload is None:
         raise HTTPException(400, "Falta payload de stock")
 
-    db = SessionLocal()
-    try:
-        ym = f"{year:04d}"
-        mm = f"{month:02d}"
+    ym = f"{year:04d}"
+    mm = f"{month:02d}"
 
-        snap = (
-            db.query(StockSnapshot)
-            .filter(
-                StockSnapshot.user_id == current_user.id,
-                StockSnapshot.year == ym,
-                StockSnapshot.month == mm,
-            )
-            .first()
+    snap = (
+        db.query(StockSnapshot)
+        .filter(
+            StockSnapshot.user_id == current_user.id,
+            StockSnapshot.year == ym,
+            StockSnapshot.month == mm,
         )
+        .first()
+    )
 
-        if not snap:
-            snap = StockSnapshot(
-                user_id=current_user.id,
-                year=ym,
-                month=mm,
-            )
-            db.add(snap)
+    if not snap:
+        snap = StockSnapshot(
+            user_id=current_user.id,
+            year=ym,
+            month=mm,
+        )
+        db.add(snap)
 
-        snap.initial_stock = payload.initial_stock.quantize(Decimal("0.01"))
-        snap.final_stock = payload.final_stock.quantize(Decimal("0.01"))
+    snap.initial_stock = payload.initial_stock.quantize(Decimal("0.01"))
+    snap.final_stock = payload.final_stock.quantize(Decimal("0.01"))
+    analytics_cache.bump(db, current_user.id)
 
-        db.commit()
-        db.refresh(snap)
+    db.commit()
+    db.refresh(snap)
 
-        return {
-            "year": year,
-            "month": month,
-            "initial_stock": float(snap.initial_stock or 0),
-            "final_stock": float(snap.final_stock or 0),
-            "message": "Stock actualizado correctamente",
-        }
-    finally:
-        db.close()
+    return {
+        "year": year,
+        "month": month,
+        "initial_stock": float(snap.initial_stock or 0),
+        "final_stock": float(snap.final_stock or 0),
+        "message": "Stock actualizado correctamente",
+    }
 
 
 # ==========================
 # Endpoints: documentos / OCR
 # ==========================
 
+def _new_document(
+    db,
+    user_id: str,
+    path: str,
+    checksum: str,
+    filename: str,
+    content_type: Optional[str],
+    cached: Optional[tuple] = None,
+    batch_id: Optional[str] = None,
+) -> tuple[Document, Optional[Transaction]]:
+    """
+    Crea el Document en "pending"; si hay resultado OCR cacheado lo deja
+    directamente en "ready" con su Transaction y la devuelve. No hace commit.
+    """
+    doc = Document(
+        user_id=user_id,
+        storage_key=path,
+        original_filename=filename,
+        mime_type=content_type or "application/octet-stream",
+        checksum=checksum,
+        status="pending",
+        created_at=datetime.utcnow(),
+        batch_id=batch_id,
+    )
+    db.add(doc)
+    db.flush()
+
+    if cached is not None:
+        ocr_text, parsed = cached
+        trx = jobs.finalize_document(db, doc, ocr_text, parsed)
+        metrics.inc("ocr_pass_total", **{"pass": "cache"})
+        return doc, trx
+    # buscable por nombre hasta que el worker agregue el texto
+    search.index_document(db, doc)
+    return doc, None
+
+
+def _transaction_fields(trx: Transaction) -> dict:
+    """
+    Campos de la Transaction tal como quedan guardados: el rubro sale de
+    las reglas del usuario y los importes con los 2 decimales de la columna.
+    Sirve antes del commit (sin volver a leer la fila).
+    """
+    cent = Decimal("0.01")
+    return {
+        "date": trx.occurred_on.isoformat(),
+        "kind": trx.kind,
+        "rubro": trx.rubro,
+        "neto": str(Decimal(str(trx.neto)).quantize(cent)),
+        "iva": str(Decimal(str(trx.iva or 0)).quantize(cent)),
+        "total": str(Decimal(str(trx.total)).quantize(cent)),
+    }
+
+
 @app.post("/documents/upload", response_model=UploadResponse)
-async def upload_document(
+def upload_document(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
+    """
+    Guarda el archivo, crea el Document en "pending" y encola el OCR.
+    El resultado se consulta con GET /documents/{id}.
+    """
     if not file.filename:
         raise HTTPException(400, "Archivo inválido")
 
-    data = await file.read()
-    checksum = hashlib.sha256(data).hexdigest()
-    path = os.path.join(STORAGE_PATH, f"{checksum}-{file.filename}")
+    try:
+        with metrics.span("upload.store"):
+            path, checksum, _ = store_stream(file.file, file.filename)
+    except UploadTooLarge:
+        raise HTTPException(413, "El archivo supera el tamaño máximo permitido")
 
-    with open(path, "wb") as f:
-        f.write(data)
+    # Mismo contenido ya procesado con este pipeline: sin OCR
+    with metrics.span("upload.cache_lookup"):
+        cached = ocr_cache.get(db, checksum)
+    if cached is None and not jobs.acquire_slot():
+        raise HTTPException(503, "Hay demasiados documentos en proceso, reintentá en unos minutos")
 
-    filename = (file.filename or "").lower()
-    mime = (file.content_type or "").lower()
-    if filename.endswith(".pdf") or "pdf" in mime:
-        ocr_text = ocr_pdf_bytes(data)
-    else:
-        ocr_text = ocr_image_bytes(data)
-
-    db = SessionLocal()
     try:
-        doc = Document(
-            user_id=current_user.id,
-            storage_key=path,
-            original_filename=file.filename,
-            mime_type=file.content_type or "application/octet-stream",
-            checksum=checksum,
+        doc, trx = _new_document(
+            db,
+            current_user.id,
+            path,
+            checksum,
+            file.filename,
+            file.content_type,
+            cached=cached,
+        )
+        parsed = _transaction_fields(trx) if trx is not None else None
+        with metrics.span("upload.commit"):
+            db.commit()
+        doc_id = str(doc.id)
+    except Exception:
+        if cached is None:
+            jobs.release_slot()
+        raise
+
+    if cached is not None:
+        ocr_text, _ = cached
+        return UploadResponse(
+            document_id=doc_id,
             status="ready",
-            ocr_text=ocr_text,
-            created_at=datetime.utcnow(),
+            ocr_preview=_ocr_preview(ocr_text),
+            parsed=parsed,
         )
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
 
-        occurred_on = extract_date(ocr_text or "")
-        rubro = parse_rubro(ocr_text or "") or "Sin clasificar"
-        iva, neto, total = parse_iva_y_neto(ocr_text or "")
-        if iva is None or neto is None or total is None:
-            iva, neto, total = Decimal("0.00"), Decimal("0.00"), Decimal("0.00")
+    jobs.submit_document(doc_id)
 
-        kind = "expense"
-        tlow = (ocr_text or "").lower()
-        if "venta" in tlow or "ingreso" in tlow:
-            kind = "income"
+    return UploadResponse(
+        document_id=doc_id,
+        status="pending",
+        ocr_preview="",
+        parsed=None,
+    )
 
-        trx = Transaction(
-            user_id=current_user.id,
-            kind=kind,
-            occurred_on=dt.datetime.fromisoformat(occurred_on).date(),
-            rubro=rubro,
-            neto=neto,
-            iva=iva,
-            total=total,
-            description=(ocr_text or "")[:240],
-            document_id=str(doc.id),
+
+def _iter_batch_files(files: list[UploadFile]):
+    """
+    Devuelve (nombre, content_type, stream, tamaño declarado) por archivo.
+    Un único .zip se expande entrada por entrada sin descomprimirlo entero.
+    """
+    if len(files) == 1 and (
+        (files[0].filename or "").lower().endswith(".zip")
+        or "zip" in (files[0].content_type or "").lower()
+    ):
+        try:
+            zf = zipfile.ZipFile(files[0].file)
+        except zipfile.BadZipFile:
+            raise HTTPException(400, "ZIP inválido")
+        with zf:
+            entries = [
+                info
+                for info in zf.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if len(entries) > BATCH_MAX_FILES:
+                raise HTTPException(400, f"El lote supera el máximo de {BATCH_MAX_FILES} archivos")
+            for info in entries:
+                name = os.path.basename(info.filename)
+                with zf.open(info) as stream:
+                    yield name, mimetypes.guess_type(name)[0], stream, info.file_size
+        return
+
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(400, f"El lote supera el máximo de {BATCH_MAX_FILES} archivos")
+    for f in files:
+        yield f.filename, f.content_type, f.file, None
+
+
+@app.post("/documents/upload-batch", response_model=BatchUploadResponse)
+def upload_documents_batch(
+    files: list[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Sube muchos archivos (multipart) o un único ZIP en un solo request.
+    Cada archivo se guarda por streaming; los repetidos dentro del lote
+    (mismo checksum) no se procesan dos veces. El OCR corre en la cola
+    con concurrencia acotada; el avance se consulta con
+    GET /documents/batches/{batch_id}.
+    """
+    batch_id = str(uuid.uuid4())
+    items: list[BatchItem] = []
+    to_enqueue: list[str] = []
+    seen: dict[str, str] = {}  # checksum -> document_id
+
+    for name, content_type, stream, declared_size in _iter_batch_files(files):
+        if not name:
+            continue
+        if declared_size is not None and declared_size > MAX_UPLOAD_BYTES:
+            items.append(BatchItem(filename=name, status="rejected", detail="Archivo demasiado grande"))
+            continue
+        try:
+            path, checksum, _ = store_stream(stream, name)
+        except UploadTooLarge:
+            items.append(BatchItem(filename=name, status="rejected", detail="Archivo demasiado grande"))
+            continue
+
+        if checksum in seen:
+            items.append(
+                BatchItem(filename=name, document_id=seen[checksum], status="duplicate")
+            )
+            continue
+
+        cached = ocr_cache.get(db, checksum)
+        doc, trx = _new_document(
+            db,
+            current_user.id,
+            path,
+            checksum,
+            name,
+            content_type,
+            cached=cached,
+            batch_id=batch_id,
         )
-        db.add(trx)
+        seen[checksum] = str(doc.id)
+        if cached is None:
+            to_enqueue.append(str(doc.id))
+        items.append(
+            BatchItem(
+                filename=name,
+                document_id=str(doc.id),
+                status=doc.status,
+                parsed=_transaction_fields(trx) if trx is not None else None,
+            )
+        )
+
+    with metrics.span("upload.batch_commit"):
         db.commit()
 
-        preview = (ocr_text or "").replace("\n", " ").strip()
-        if len(preview) > 160:
-            preview = preview[:160] + "..."
-
-        parsed = {
-            "date": occurred_on,
-            "kind": kind,
-            "rubro": rubro,
-            "neto": str(neto),
-            "iva": str(iva),
-            "total": str(total),
-        }
-        return UploadResponse(
-            document_id=str(doc.id),
-            ocr_preview=preview,
-            parsed=parsed,
+    for doc_id in to_enqueue:
+        jobs.enqueue_document(doc_id)
+
+    return BatchUploadResponse(batch_id=batch_id, total=len(items), items=items)
+
+
+@app.get("/documents/batches/{batch_id}")
+def get_batch_status(
+    batch_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    rows = (
+        db.query(Document.id, Document.original_filename, Document.status)
+        .filter(Document.user_id == current_user.id, Document.batch_id == batch_id)
+        .all()
+    )
+    if not rows:
+        raise HTTPException(404, "Lote no encontrado")
+
+    counts: dict[str, int] = {}
+    for _, _, st in rows:
+        counts[st] = counts.get(st, 0) + 1
+
+    return {
+        "batch_id": batch_id,
+        "total": len(rows),
+        "counts": counts,
+        "done": all(st in ("ready", "failed") for _, _, st in rows),
+        "documents": [
+            {"document_id": str(doc_id), "filename": fname, "status": st}
+            for doc_id, fname, st in rows
+        ],
+    }
+
+
+def _ocr_preview(ocr_text: Optional[str]) -> str:
+    preview = (ocr_text or "").replace("\n", " ").strip()
+    if len(preview) > 160:
+        preview = preview[:160] + "..."
+    return preview
+
+
+# declarada antes de /documents/{document_id} para que "search" no se tome como id
+@app.get("/documents/search")
+def search_documents(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(default=search.DEFAULT_RESULTS, ge=1, le=search.MAX_RESULTS),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Búsqueda de texto completo en nombre y texto OCR de los documentos del
+    usuario, ordenada por relevancia, con un fragmento resaltado (<b>...</b>).
+    """
+    return search.search_documents(db, current_user.id, q, limit=limit)
+
+
+@app.get("/documents/{document_id}", response_model=DocumentStatusResponse)
+def get_document(
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    doc = (
+        db.query(Document)
+        .filter(Document.id == document_id, Document.user_id == current_user.id)
+        .first()
+    )
+    if not doc:
+        raise HTTPException(404, "Documento no encontrado")
+
+    parsed = None
+    if doc.status == "ready":
+        trx = (
+            db.query(Transaction)
+            .filter(
+                Transaction.user_id == current_user.id,
+                Transaction.document_id == str(doc.id),
+            )
+            .first()
         )
-    finally:
-        db.close()
+        if trx:
+            parsed = _transaction_fields(trx)
+
+    return DocumentStatusResponse(
+        document_id=str(doc.id),
+        status=doc.status,
+        original_filename=doc.original_filename,
+        created_at=doc.created_at,
+        ocr_preview=_ocr_preview(doc.ocr_text),
+        parsed=parsed,
+    )
 
 
 # ==========================
@@ -422,58 +657,36 @@ async def upload_document(
 
 @app.get("/analytics/income-statement")
 def income_statement(
+    request: Request,
     year: int = Query(...),
     month: int = Query(...),
     current_user: User = Depends(get_current_user_flexible),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        ym = f"{year:04d}-{month:02d}"
-        base = datetime(year, month, 1)
-        prev_dt = base - timedelta(days=1)
-        ym_prev = f"{prev_dt.year:04d}-{prev_dt.month:02d}"
-
-        def period_agg(yyyy_mm: str):
-            rows = (
-                db.query(
-                    Transaction.rubro,
-                    Transaction.kind,
-                    func.sum(Transaction.neto).label("neto"),
-                    func.sum(Transaction.iva).label("iva"),
-                    func.sum(Transaction.total).label("total"),
-                )
-                .filter(
-                    Transaction.user_id == current_user.id,
-                    func.strftime("%Y-%m", Transaction.occurred_on) == yyyy_mm,
-                )
-                .group_by(Transaction.rubro, Transaction.kind)
-                .all()
-            )
-            return [
-                {
-                    "rubro": r[0] or "Sin rubro",
-                    "kind": r[1],
-                    "neto": float(r[2] or 0),
-                    "iva": float(r[3] or 0),
-                    "total": float(r[4] or 0),
-                }
-                for r in rows
-            ]
+    cache_key = analytics_cache.CacheKey(db, current_user.id, "income-statement", year, month)
+    cached = analytics_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
+
+    ym = period_key(year, month)
+    ym_prev = period_key(*shift_month(year, month, -1))
+
+    def period_agg(yyyy_mm: str):
+        # O(rubros) filas del rollup mensual en vez de escanear transactions
+        return [
+            {
+                "rubro": r.rubro,
+                "kind": r.kind,
+                "neto": float(r.neto or 0),
+                "iva": float(r.iva or 0),
+                "total": float(r.total or 0),
+            }
+            for r in rollup.period_rows(db, current_user.id, yyyy_mm)
+        ]
 
+    with metrics.span("analytics.income_statement"):
         cur = period_agg(ym)
         prv = period_agg(ym_prev)
-
-        cur_income = sum(x["total"] for x in cur if x["kind"] == "income")
-        cur_exp = sum(x["total"] for x in cur if x["kind"] == "expense")
-        prv_income = sum(x["total"] for x in prv if x["kind"] == "income")
-        prv_exp = sum(x["total"] for x in prv if x["kind"] == "expense")
-
-        purchases_total = sum(
-            x["total"]
-            for x in cur
-            if x["kind"] == "expense" and x["rubro"].lower() in ("mercaderías", "mercaderias")
-        )
-
         snap = (
             db.query(StockSnapshot)
             .filter(
@@ -484,47 +697,89 @@ def income_statement(
             .first()
         )
 
-        if snap:
-            ei = float(snap.initial_stock or 0)
-            ef = float(snap.final_stock or 0)
-            cogs = ei + purchases_total - ef
-            gross_margin = cur_income - cogs
-            gross_margin_pct = (gross_margin / cur_income * 100.0) if cur_income else None
-        else:
-            ei = ef = cogs = gross_margin = gross_margin_pct = None
-
-        summary = {
-            "income": cur_income,
-            "expense": cur_exp,
-            "margin": cur_income - cur_exp,
-            "purchases": purchases_total,
-            "initial_stock": ei,
-            "final_stock": ef,
-            "cogs": cogs,
-            "gross_margin": gross_margin,
-            "gross_margin_pct": gross_margin_pct,
-            "prev_income": prv_income,
-            "prev_expense": prv_exp,
-            "prev_margin": prv_income - prv_exp,
-            "mom_income_pct": ((cur_income - prv_income) / prv_income * 100.0)
-            if prv_income
-            else None,
-            "mom_expense_pct": ((cur_exp - prv_exp) / prv_exp * 100.0)
-            if prv_exp
-            else None,
-            "margin_pct": ((cur_income - cur_exp) / cur_income * 100.0)
-            if cur_income
-            else None,
-        }
+    cur_income = sum(x["total"] for x in cur if x["kind"] == "income")
+    cur_exp = sum(x["total"] for x in cur if x["kind"] == "expense")
+    prv_income = sum(x["total"] for x in prv if x["kind"] == "income")
+    prv_exp = sum(x["total"] for x in prv if x["kind"] == "expense")
 
-        return {
-            "period": ym,
-            "previous": ym_prev,
-            "by_rubro": cur,
-            "summary": summary,
-        }
-    finally:
-        db.close()
+    purchases_total = sum(
+        x["total"]
+        for x in cur
+        if x["kind"] == "expense" and x["rubro"].lower() in ("mercaderías", "mercaderias")
+    )
+
+    if snap:
+        ei = float(snap.initial_stock or 0)
+        ef = float(snap.final_stock or 0)
+        cogs = ei + purchases_total - ef
+        gross_margin = cur_income - cogs
+        gross_margin_pct = (gross_margin / cur_income * 100.0) if cur_income else None
+    else:
+        ei = ef = cogs = gross_margin = gross_margin_pct = None
+
+    summary = {
+        "income": cur_income,
+        "expense": cur_exp,
+        "margin": cur_income - cur_exp,
+        "purchases": purchases_total,
+        "initial_stock": ei,
+        "final_stock": ef,
+        "cogs": cogs,
+        "gross_margin": gross_margin,
+        "gross_margin_pct": gross_margin_pct,
+        "prev_income": prv_income,
+        "prev_expense": prv_exp,
+        "prev_margin": prv_income - prv_exp,
+        "mom_income_pct": ((cur_income - prv_income) / prv_income * 100.0)
+        if prv_income
+        else None,
+        "mom_expense_pct": ((cur_exp - prv_exp) / prv_exp * 100.0)
+        if prv_exp
+        else None,
+        "margin_pct": ((cur_income - cur_exp) / cur_income * 100.0)
+        if cur_income
+        else None,
+    }
+
+    return analytics_cache.store(cache_key, {
+        "period": ym,
+        "previous": ym_prev,
+        "by_rubro": cur,
+        "summary": summary,
+    })
+
+
+@app.get("/analytics/series")
+def analytics_series(
+    request: Request,
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    granularity: Literal["month", "quarter", "year"] = "month",
+    current_user: User = Depends(get_current_user_flexible),
+    db: Session = Depends(get_db),
+):
+    """
+    Ingresos, egresos, márgenes, CMV y variaciones (contra el período
+    anterior y el mismo período del año anterior) por mes/trimestre/año,
+    con el detalle por rubro. from/to en formato YYYY-MM, inclusive.
+    """
+    try:
+        start = parse_period(from_)
+        end = parse_period(to)
+    except ValueError:
+        raise HTTPException(400, "Período inválido: usar YYYY-MM")
+    if start > end:
+        raise HTTPException(400, "'from' debe ser anterior o igual a 'to'")
+    if month_index(*end) - month_index(*start) + 1 > analytics.MAX_SERIES_MONTHS:
+        raise HTTPException(400, f"El rango supera el máximo de {analytics.MAX_SERIES_MONTHS} meses")
+
+    cache_key = analytics_cache.CacheKey(db, current_user.id, "series", start, end, granularity)
+    cached = analytics_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
+    with metrics.span("analytics.series"):
+        series = analytics.build_series(db, current_user.id, start, end, granularity)
+    return analytics_cache.store(cache_key, series)
 
 
 # ==========================
@@ -533,65 +788,26 @@ def income_statement(
 
 @app.get("/budget/suggest")
 def budget_suggest(
+    request: Request,
     year: int = Query(...),
-    month: int = Query(...),
-    window_months: int = 6,
+    month: int = Query(..., ge=1, le=12),
+    window_months: int = Query(default=6, ge=1, le=24),
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        target_first = datetime(year, month, 1)
-
-        y = year
-        m = month
-        for _ in range(window_months):
-            m -= 1
-            if m == 0:
-                m = 12
-                y -= 1
-        window_start = datetime(y, m, 1).date()
-        window_end = target_first.date()
-
-        rows = (
-            db.query(
-                Transaction.rubro,
-                Transaction.kind,
-                func.sum(Transaction.total).label("total"),
-            )
-            .filter(
-                Transaction.user_id == current_user.id,
-                Transaction.occurred_on >= window_start,
-                Transaction.occurred_on < window_end,
-            )
-            .group_by(Transaction.rubro, Transaction.kind)
-            .all()
-        )
+    """
+    Presupuesto sugerido por rubro para year-month y los 11 meses
+    siguientes (`months` en cada línea); `monthly`/`annual` son los del
+    mes pedido y la suma de los 12.
+    """
+    cache_key = analytics_cache.CacheKey(db, current_user.id, "budget-suggest", year, month, window_months)
+    cached = analytics_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
 
-        lines = []
-        for rubro, kind, total in rows:
-            total_val = float(total or 0.0)
-            suggested_monthly = (
-                total_val / float(window_months) if window_months > 0 else total_val
-            )
-            lines.append(
-                {
-                    "rubro": rubro or "Sin rubro",
-                    "kind": kind,
-                    "suggested": suggested_monthly,
-                    "monthly": suggested_monthly,
-                    "annual": suggested_monthly * 12.0,
-                }
-            )
-
-        return {
-            "period": f"{year:04d}-{month:02d}",
-            "window_months": window_months,
-            "from": window_start.isoformat(),
-            "to_exclusive": window_end.isoformat(),
-            "lines": lines,
-        }
-    finally:
-        db.close()
+    with metrics.span("analytics.budget_suggest"):
+        suggestion = budget.suggest(db, current_user.id, year, month, window_months)
+    return analytics_cache.store(cache_key, suggestion)
 
 
 # ==========================
@@ -602,242 +818,203 @@ def budget_suggest(
 def create_manual_transaction(
     payload: ManualTransactionIn,
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        total = payload.total.quantize(Decimal("0.01"))
-        iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
-        neto = (total - iva).quantize(Decimal("0.01"))
+    total = payload.total.quantize(Decimal("0.01"))
+    iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
+    neto = (total - iva).quantize(Decimal("0.01"))
 
-        trx = Transaction(
-            user_id=current_user.id,
-            kind=payload.kind,
-            occurred_on=payload.date,
-            rubro=payload.rubro,
-            neto=neto,
-            iva=iva,
-            total=total,
-            description=payload.description or "Carga manual",
-            document_id="manual",
-        )
-        db.add(trx)
-        db.commit()
-        db.refresh(trx)
+    trx = Transaction(
+        user_id=current_user.id,
+        kind=payload.kind,
+        occurred_on=payload.date,
+        rubro=payload.rubro,
+        neto=neto,
+        iva=iva,
+        total=total,
+        description=payload.description or "Carga manual",
+        document_id="manual",
+    )
+    db.add(trx)
+    rollup.apply(db, trx)
+    # la asignación manual alimenta las reglas de clasificación
+    rubros.learn_rule(db, current_user.id, payload.description, payload.rubro)
+    analytics_cache.bump(db, current_user.id)
+    db.commit()
+    db.refresh(trx)
+
+    return {
+        "id": trx.id,
+        "message": "Transacción manual registrada correctamente",
+    }
 
-        return {
-            "id": trx.id,
-            "message": "Transacción manual registrada correctamente",
-        }
-    finally:
-        db.close()
 
+@app.get("/transactions")
+def list_transactions(
+    from_: Optional[dt.date] = Query(default=None, alias="from"),
+    to: Optional[dt.date] = Query(default=None),
+    kind: Optional[Literal["income", "expense"]] = None,
+    rubro: Optional[str] = None,
+    min_total: Optional[Decimal] = None,
+    max_total: Optional[Decimal] = None,
+    document_id: Optional[str] = None,
+    limit: int = Query(default=ledger.DEFAULT_PAGE_SIZE, ge=1, le=ledger.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: Literal["desc", "asc"] = "desc",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Libro de transacciones filtrado (fechas inclusive), paginado por
+    cursor: pasar `next_cursor` de la respuesta para la página siguiente.
+    """
+    if from_ and to and from_ > to:
+        raise HTTPException(400, "'from' debe ser anterior o igual a 'to'")
 
-# ==========================
-# Importación CSV
-# ==========================
+    try:
+        return ledger.list_transactions(
+            db,
+            current_user.id,
+            start=from_,
+            end=to + dt.timedelta(days=1) if to else None,
+            kind=kind,
+            rubro=rubro,
+            min_total=min_total,
+            max_total=max_total,
+            document_id=document_id,
+            limit=limit,
+            cursor=cursor,
+            order=order,
+        )
+    except ledger.InvalidCursor:
+        raise HTTPException(400, "Cursor inválido")
 
-@app.post("/transactions/import-csv")
-async def import_transactions_csv(
-    file: UploadFile = File(...),
+
+@app.get("/transactions/export")
+def export_transactions(
+    from_: Optional[dt.date] = Query(default=None, alias="from"),
+    to: Optional[dt.date] = Query(default=None),
+    fmt: Literal["csv", "parquet"] = Query(default="csv", alias="format"),
+    gzip: bool = False,
     current_user: User = Depends(get_current_user),
 ):
-    if not file.filename:
-        raise HTTPException(400, "Archivo inválido")
+    """
+    Libro completo de transacciones entre from y to (fechas inclusive,
+    ambas opcionales), en streaming. Ver export.py.
+    """
+    if from_ and to and from_ > to:
+        raise HTTPException(400, "'from' debe ser anterior o igual a 'to'")
+    end = to + dt.timedelta(days=1) if to else None
 
-    raw = await file.read()
     try:
-        text = raw.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        text = raw.decode("latin-1")
+        stream = export.export_stream(current_user.id, from_, end, fmt, gzip=gzip)
+    except export.ExportUnavailable as e:
+        raise HTTPException(501, str(e))
+
+    if fmt == "parquet":
+        media_type, ext = "application/vnd.apache.parquet", "parquet"
+    elif gzip:
+        media_type, ext = "application/gzip", "csv.gz"
+    else:
+        media_type, ext = "text/csv; charset=utf-8", "csv"
+    filename = f"transacciones_{from_ or 'inicio'}_{to or 'hoy'}.{ext}"
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    try:
-        sample = "\n".join(text.splitlines()[:5]) or text
-        dialect = csv.Sniffer().sniff(sample)
-    except Exception:
-        dialect = csv.excel
 
-    f = StringIO(text)
-    reader = csv.DictReader(f, dialect=dialect)
+# ==========================
+# Reglas de rubro
+# ==========================
 
-    if not reader.fieldnames:
-        raise HTTPException(400, "El CSV no tiene encabezados.")
+def _rule_out(rule: RubroRule) -> dict:
+    return {
+        "id": rule.id,
+        "pattern": rule.pattern,
+        "rubro": rule.rubro,
+        "source": rule.source,
+        "confirmations": rule.confirmations,
+        "updated_at": rule.updated_at,
+    }
 
-    headers = [h.strip().lower() for h in reader.fieldnames]
 
-    db = SessionLocal()
-    try:
-        # Rama A: formato fila a fila
-        if {"date", "kind", "rubro", "total"}.issubset(set(headers)):
-            imported = 0
-            skipped = 0
-
-            for row in reader:
-                try:
-                    raw_date = (row.get("date") or "").strip()
-                    if not raw_date:
-                        raise ValueError("Fecha vacía")
-
-                    if "-" in raw_date:
-                        occurred_on = dt.datetime.strptime(raw_date, "%Y-%m-%d").date()
-                    elif "/" in raw_date:
-                        occurred_on = dt.datetime.strptime(raw_date, "%d/%m/%Y").date()
-                    else:
-                        occurred_on = dt.datetime.fromisoformat(raw_date).date()
-
-                    kind = (row.get("kind") or "").strip().lower()
-                    if kind not in ("income", "expense"):
-                        raise ValueError("kind inválido")
-
-                    rubro = (row.get("rubro") or "").strip() or "Sin rubro"
-                    description = (row.get("description") or "").strip() or "Importado CSV"
-
-                    total_str = (row.get("total") or "").strip()
-                    if not total_str:
-                        raise ValueError("total vacío")
-                    total = Decimal(total_str.replace(".", "").replace(",", "."))
-                    total = total.quantize(Decimal("0.01"))
-
-                    iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
-                    neto = (total - iva).quantize(Decimal("0.01"))
-
-                except Exception:
-                    skipped += 1
-                    continue
-
-                trx = Transaction(
-                    user_id=current_user.id,
-                    kind=kind,
-                    occurred_on=occurred_on,
-                    rubro=rubro,
-                    neto=neto,
-                    iva=iva,
-                    total=total,
-                    description=description[:240],
-                    document_id="import-csv",
-                )
-                db.add(trx)
-                imported += 1
+@app.get("/rubros/rules")
+def list_rubro_rules(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    rules = (
+        db.query(RubroRule)
+        .filter(RubroRule.user_id == current_user.id)
+        .order_by(RubroRule.pattern)
+        .all()
+    )
+    return {"rules": [_rule_out(r) for r in rules]}
 
-            db.commit()
-            return {
-                "imported": imported,
-                "skipped": skipped,
-                "message": f"Importadas {imported} filas (formato detallado), saltadas {skipped}.",
-            }
 
-        # Rama B: formato mensual
-        if "mes" not in headers:
-            raise HTTPException(
-                400,
-                "El CSV no tiene formato reconocido. Se espera 'date,kind,rubro,total' "
-                "o bien 'mes, ventas, compras, ...'.",
-            )
+@app.post("/rubros/rules")
+def upsert_rubro_rule(
+    payload: RubroRuleIn,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    pattern = rubros.normalize_pattern(payload.pattern)
+    rubro = payload.rubro.strip()
+    if len(pattern) < 3 or not rubro:
+        raise HTTPException(400, "La regla necesita un texto de al menos 3 caracteres y un rubro")
+
+    rule = (
+        db.query(RubroRule)
+        .filter(RubroRule.user_id == current_user.id, RubroRule.pattern == pattern)
+        .first()
+    )
+    if rule is None:
+        rule = RubroRule(user_id=current_user.id, pattern=pattern)
+        db.add(rule)
+    rule.rubro = rubro
+    rule.source = "manual"
+    db.commit()
+    db.refresh(rule)
+    return _rule_out(rule)
+
+
+@app.delete("/rubros/rules/{rule_id}")
+def delete_rubro_rule(
+    rule_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    deleted = (
+        db.query(RubroRule)
+        .filter(RubroRule.id == rule_id, RubroRule.user_id == current_user.id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    if not deleted:
+        raise HTTPException(404, "Regla no encontrada")
+    return {"message": "Regla eliminada"}
 
-        month_map = {
-            "enero": 1,
-            "febrero": 2,
-            "marzo": 3,
-            "abril": 4,
-            "mayo": 5,
-            "junio": 6,
-            "julio": 7,
-            "agosto": 8,
-            "setiembre": 9,
-            "septiembre": 9,
-            "octubre": 10,
-            "noviembre": 11,
-            "diciembre": 12,
-        }
 
-        def parse_month(mes_raw: str) -> int:
-            s = mes_raw.strip().lower()
-            if s.isdigit():
-                val = int(s)
-                if 1 <= val <= 12:
-                    return val
-            if s in month_map:
-                return month_map[s]
-            raise ValueError(f"Mes inválido: {mes_raw!r}")
-
-        current_year = dt.date.today().year
-        imported = 0
-        skipped = 0
-        ignore_cols = {"mes", "año", "anio", ""}
-
-        for row in reader:
-            try:
-                raw_mes = (row.get("mes") or "").strip()
-                if not raw_mes:
-                    raise ValueError("Mes vacío")
-
-                month_num = parse_month(raw_mes)
-
-                raw_year = (row.get("año") or row.get("anio") or "").strip()
-                if raw_year.isdigit():
-                    year_val = int(raw_year)
-                else:
-                    year_val = current_year
-
-                if month_num == 12:
-                    next_month_first = dt.date(year_val + 1, 1, 1)
-                else:
-                    next_month_first = dt.date(year_val, month_num + 1, 1)
-                occurred_on = next_month_first - dt.timedelta(days=1)
-
-                for col_name in reader.fieldnames or []:
-                    col_key = (col_name or "").strip()
-                    col_norm = col_key.lower()
-                    if col_norm in ignore_cols:
-                        continue
-
-                    val_str = (row.get(col_name) or "").strip()
-                    if not val_str:
-                        continue
-
-                    try:
-                        total = Decimal(val_str.replace(".", "").replace(",", "."))
-                    except Exception:
-                        continue
-
-                    if total == 0:
-                        continue
-
-                    total = total.quantize(Decimal("0.01"))
-                    iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
-                    neto = (total - iva).quantize(Decimal("0.01"))
-
-                    if col_norm in ("ventas", "ingresos", "ventas totales"):
-                        kind = "income"
-                    else:
-                        kind = "expense"
-
-                    rubro = col_key or "Sin rubro"
-                    description = f"Histórico {raw_mes} - {rubro}"
-
-                    trx = Transaction(
-                        user_id=current_user.id,
-                        kind=kind,
-                        occurred_on=occurred_on,
-                        rubro=rubro,
-                        neto=neto,
-                        iva=iva,
-                        total=total,
-                        description=description[:240],
-                        document_id="import-csv",
-                    )
-                    db.add(trx)
-                    imported += 1
-
-            except Exception:
-                skipped += 1
-                continue
+# ==========================
+# Importación CSV
+# ==========================
 
-        db.commit()
-        return {
-            "imported": imported,
-            "skipped": skipped,
-            "message": f"Importadas {imported} filas (formato mensual), meses con error {skipped}.",
-        }
-    finally:
-        db.close()
+@app.post("/transactions/import-csv")
+def import_transactions_csv(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Importa transacciones (formato detallado o mensual) leyendo el archivo
+    en streaming y escribiendo en bloques; ver csv_import.py.
+    """
+    if not file.filename:
+        raise HTTPException(400, "Archivo inválido")
 
+    try:
+        return csv_import.import_csv(db, current_user.id, file.file)
+    except csv_import.CsvFormatError as e:
+        raise HTTPException(400, str(e))
@@ -0,0 +1,211 @@
+# backend/app/metrics.py
+"""
+Métricas en memoria del proceso web: contadores, histogramas de duración
+y spans por etapa, expuestos en formato de texto de Prometheus (GET /metrics).
+
+- inc(nombre, **labels): contador.
+- observe(nombre, valor, **labels): histograma (buckets de duración por
+  defecto, o los que se pasen).
+- span("ocr.preprocess"): context manager / decorador que mide una etapa
+  en stage_duration_seconds{stage=...}. Dentro de collect_spans() (el
+  worker de OCR, que corre en otro proceso) las duraciones se juntan en un
+  dict que el job devuelve, y el proceso web las registra con record_spans().
+- HttpMetricsMiddleware: latencia por método, ruta (la plantilla, no el
+  path con ids) y status.
+
+Cada proceso tiene sus propios valores (con varios workers de uvicorn,
+Prometheus los suma). El costo por medición es un perf_counter, un lock
+y una búsqueda binaria en los buckets.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+
+# Buckets en segundos: de 1 ms (consultas, caché) a 60 s (OCR de un PDF largo)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "http_request_duration_seconds": "Latencia de requests HTTP por método, ruta y status",
+    "stage_duration_seconds": "Duración por etapa (OCR, parseo, commits, analytics)",
+    "ocr_pass_total": "Documentos resueltos por cada pasada OCR",
+    "db_statements_per_request": "Sentencias SQL por request, por ruta",
+    "db_time_per_request_seconds": "Tiempo en la base por request, por ruta",
+    "db_slow_statements_total": "Sentencias SQL por encima de SQL_SLOW_QUERY_MS",
+}
+
+# Contadores en memoria del proceso web: (nombre, labels) -> valor
+_counters: Counter = Counter()
+# (nombre, labels) -> [buckets, conteos por bucket (+Inf al final), suma, cantidad]
+_histograms: dict = {}
+_lock = threading.Lock()
+
+_collector: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("metrics_spans", default=None)
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def counters(prefix: str = "") -> list[dict]:
+    with _lock:
+        items = list(_counters.items())
+    return [
+        {"name": name, "labels": dict(labels), "value": value}
+        for (name, labels), value in sorted(items)
+        if name.startswith(prefix)
+    ]
+
+
+def observe(name: str, value: float, buckets: tuple = DURATION_BUCKETS, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    i = bisect.bisect_left(buckets, value)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+        h[1][i] += 1
+        h[2] += value
+        h[3] += 1
+
+
+@contextmanager
+def span(stage: str):
+    """Mide una etapa. Sirve como `with metrics.span(...)` o como decorador."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        spans = _collector.get()
+        if spans is None:
+            observe("stage_duration_seconds", elapsed, stage=stage)
+        else:
+            spans[stage] = spans.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def collect_spans():
+    """Junta los spans del bloque en un dict (etapa -> segundos) en vez de registrarlos."""
+    spans: dict[str, float] = {}
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def record_spans(spans: dict[str, float]):
+    """Registra spans juntados en otro proceso (collect_spans)."""
+    for stage, seconds in spans.items():
+        observe("stage_duration_seconds", seconds, stage=stage)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple, le: Optional[str] = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Todas las métricas en formato de texto de Prometheus (0.0.4)."""
+    with _lock:
+        counters_ = sorted(_counters.items())
+        histograms = sorted((k, (h[0], list(h[1]), h[2], h[3])) for k, h in _histograms.items())
+
+    lines: list[str] = []
+    seen: set[str] = set()
+
+    def header(name: str, kind: str):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters_:
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {_num(value)}")
+
+    for (name, labels), (bounds, buckets, total, count) in histograms:
+        header(name, "histogram")
+        cumulative = 0
+        for bound, n in zip(bounds, buckets):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(labels, str(bound))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, '+Inf')} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    """
+    Plantilla de la ruta matcheada (/documents/{document_id}), no el path
+    con ids: una serie por endpoint. "unmatched" si no hubo match.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(path):
+        # ruta de un router incluido con prefijo (/auth): el scope la trae sin él
+        for i, ch in enumerate(path):
+            if ch == "/" and i and regex.match(path[i:]):
+                return path[:i] + template
+    return template
+
+
+class HttpMetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware: no envuelve el body) que mide
+    cada request hasta el último chunk de la respuesta, así los streams de
+    /export cuentan completos.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - t0,
+                method=scope["method"],
+                route=route_template(scope),
+                status=str(status),
+            )
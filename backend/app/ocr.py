@@ -0,0 +1,526 @@
+# backend/app/ocr.py
+
+import os
+import re
+import json
+import hashlib
+import logging
+import platform
+import threading
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import datetime as dt
+from decimal import Decimal
+from typing import Optional
+
+# OCR / imágenes / PDF
+import numpy as np
+import pytesseract
+from PIL import Image, ImageOps, ImageFilter
+import fitz  # PyMuPDF
+
+from . import metrics
+from .ocr_engines import OcrEngine, build_engine
+from .receipt_parser import parse_receipt, receipt_confidence, transaction_fields
+
+logger = logging.getLogger(__name__)
+
+# ==========================
+# Configuración Tesseract
+# ==========================
+
+if platform.system() == "Windows":
+    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+# Tesseract usa OpenMP y por defecto toma todos los cores. Como ya
+# paralelizamos por página/documento en procesos, lo limitamos a 1 thread
+# por subproceso para no sobresuscribir la CPU.
+os.environ.setdefault("OMP_THREAD_LIMIT", os.getenv("OCR_TESSERACT_THREADS", "1"))
+
+# Procesos para OCR de páginas de un mismo PDF (tope por job: ver set_pdf_workers)
+OCR_PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", "2"))
+# Veces que se reintentan las páginas si un worker de páginas muere (OOM)
+OCR_PAGE_CRASH_RETRIES = int(os.getenv("OCR_PAGE_CRASH_RETRIES", "1"))
+OCR_PDF_DPI = 300
+
+# Parámetros del pipeline (preprocesado + motor)
+OCR_LANG = "spa+eng"
+OCR_OEM = 1
+OCR_PSM = 6
+OCR_TESSERACT_VARS = {"preserve_interword_spaces": "1"}
+# Motor: "tesseract" (subproceso por imagen) o "tesserocr" (instancias en pool)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract")
+OCR_ENGINE_POOL_SIZE = int(os.getenv("OCR_ENGINE_POOL_SIZE", "1"))
+OCR_UPSCALE = 2
+OCR_MEDIAN_SIZE = 3
+OCR_MIN_NATIVE_TEXT = 25
+
+# Preprocesado: "numpy" (por defecto) o "pillow" (cadena original)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "numpy")
+# Umbral del preprocesado numpy: "otsu" (global) o "adaptive" (media local)
+OCR_THRESHOLD = os.getenv("OCR_THRESHOLD", "otsu")
+OCR_ADAPTIVE_BLOCK = 31
+OCR_ADAPTIVE_C = 10
+
+# Primera pasada barata (resolución nativa, sin mediana) en imágenes; la
+# pasada completa solo corre si los parsers no quedan conformes.
+OCR_FAST_PASS = os.getenv("OCR_FAST_PASS", "1") == "1"
+OCR_FAST_MAX_SIDE = int(os.getenv("OCR_FAST_MAX_SIDE", "2000"))
+OCR_FAST_MIN_CONFIDENCE = float(os.getenv("OCR_FAST_MIN_CONFIDENCE", "0.6"))
+
+# Subir cuando cambie el código del preprocesado o de los parsers:
+# invalida el caché de resultados OCR (ver ocr_cache.py).
+OCR_PIPELINE_REV = 4
+
+
+_engine: Optional[OcrEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> OcrEngine:
+    """Motor OCR del proceso, creado una sola vez y reutilizado."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = build_engine(
+                OCR_ENGINE,
+                lang=OCR_LANG,
+                psm=OCR_PSM,
+                oem=OCR_OEM,
+                variables=OCR_TESSERACT_VARS,
+                pool_size=OCR_ENGINE_POOL_SIZE,
+            )
+        return _engine
+
+
+_pipeline_version: Optional[str] = None
+
+
+def pipeline_version() -> str:
+    """
+    Huella de la configuración del pipeline OCR (preprocesado, motor,
+    idioma, versión de Tesseract). Cambia sola cuando cambia cualquiera
+    de esos parámetros.
+    """
+    global _pipeline_version
+    if _pipeline_version is None:
+        try:
+            engine = get_engine()
+            engine_name, engine_version = engine.name, engine.version()
+        except Exception:
+            engine_name, engine_version = OCR_ENGINE, "unknown"
+        settings = {
+            "rev": OCR_PIPELINE_REV,
+            "lang": OCR_LANG,
+            "oem": OCR_OEM,
+            "psm": OCR_PSM,
+            "vars": OCR_TESSERACT_VARS,
+            "engine": engine_name,
+            "upscale": OCR_UPSCALE,
+            "median": OCR_MEDIAN_SIZE,
+            "dpi": OCR_PDF_DPI,
+            "min_native_text": OCR_MIN_NATIVE_TEXT,
+            "preprocess": OCR_PREPROCESS,
+            "threshold": OCR_THRESHOLD,
+            "adaptive": [OCR_ADAPTIVE_BLOCK, OCR_ADAPTIVE_C],
+            "fast_pass": [OCR_FAST_PASS, OCR_FAST_MAX_SIDE, OCR_FAST_MIN_CONFIDENCE],
+            "tesseract": engine_version,
+        }
+        raw = json.dumps(settings, sort_keys=True).encode("utf-8")
+        _pipeline_version = hashlib.sha256(raw).hexdigest()[:16]
+    return _pipeline_version
+
+
+# ==========================
+# Funciones de OCR
+# ==========================
+
+def preprocess_pillow(img: Image.Image) -> Image.Image:
+    """Cadena original con Pillow (se mantiene como referencia y fallback)."""
+    img = img.convert("L")
+    w, h = img.size
+    img = img.resize((max(1, w * OCR_UPSCALE), max(1, h * OCR_UPSCALE)))  # upsample ~>300dpi
+    img = ImageOps.autocontrast(img)
+    img = img.filter(ImageFilter.MedianFilter(size=OCR_MEDIAN_SIZE))
+
+    hist = img.histogram()
+    thr = 180 if sum(hist[:128]) < sum(hist[128:]) else 150
+    return img.point(lambda p: 255 if p > thr else 0)
+
+
+def otsu_threshold(hist: np.ndarray) -> int:
+    """Umbral de Otsu sobre un histograma de 256 niveles."""
+    p = hist.astype(np.float64)
+    total = p.sum()
+    if total == 0:
+        return 127
+    p /= total
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma_b = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return int(np.argmax(np.nan_to_num(sigma_b)))
+
+
+def _adaptive_binarize(a: np.ndarray, local_mean: np.ndarray, c: int) -> np.ndarray:
+    """Blanco donde a > media local - c; todo en uint8/int16, sin temporales int64."""
+    out = np.greater(np.add(a, c, dtype=np.int16), local_mean).view(np.uint8)
+    out *= 255
+    return out
+
+
+def preprocess_numpy(img: Image.Image) -> Image.Image:
+    """
+    Gris -> mediana -> upscale -> binarizado, con menos imágenes intermedias
+    a tamaño completo:
+    - la mediana 3x3 se aplica a resolución nativa (4x menos píxeles);
+    - el autocontraste no hace falta: el umbral de Otsu se calcula sobre el
+      histograma nativo y un estiramiento lineal no cambia la partición;
+    - el binarizado global es una sola tabla (LUT) aplicada con NumPy;
+    - el adaptativo calcula la media local (BoxBlur de Pillow) a resolución
+      nativa y la escala igual que la imagen: a tamaño completo solo hay
+      arrays de 1 byte por píxel.
+    """
+    gray = img.convert("L").filter(ImageFilter.MedianFilter(size=OCR_MEDIAN_SIZE))
+    w, h = gray.size
+    hist = np.asarray(gray.histogram(), dtype=np.int64)
+    size = (max(1, w * OCR_UPSCALE), max(1, h * OCR_UPSCALE))  # upsample ~>300dpi
+    a = np.asarray(gray.resize(size))
+
+    if OCR_THRESHOLD == "adaptive":
+        # ventana de OCR_ADAPTIVE_BLOCK píxeles ya escalados
+        radius = (OCR_ADAPTIVE_BLOCK / OCR_UPSCALE - 1) / 2
+        local_mean = np.asarray(gray.filter(ImageFilter.BoxBlur(radius)).resize(size))
+        out = _adaptive_binarize(a, local_mean, OCR_ADAPTIVE_C)
+    else:
+        lut = np.where(np.arange(256) > otsu_threshold(hist), 255, 0).astype(np.uint8)
+        out = lut[a]
+    return Image.fromarray(out)
+
+
+def preprocess_image(img: Image.Image) -> Image.Image:
+    if OCR_PREPROCESS == "pillow":
+        return preprocess_pillow(img)
+    return preprocess_numpy(img)
+
+
+def preprocess_fast(img: Image.Image) -> Image.Image:
+    """Pasada rápida: gris + Otsu a resolución nativa (reducida si es muy grande)."""
+    gray = img.convert("L")
+    if max(gray.size) > OCR_FAST_MAX_SIDE:
+        gray.thumbnail((OCR_FAST_MAX_SIDE, OCR_FAST_MAX_SIDE))
+    a = np.asarray(gray)
+    hist = np.bincount(a.ravel(), minlength=256)
+    lut = np.where(np.arange(256) > otsu_threshold(hist), 255, 0).astype(np.uint8)
+    return Image.fromarray(lut[a])
+
+
+def ocr_image(img: Image.Image) -> str:
+    """OCR sobre imagen con preprocesado básico (sin OpenCV)."""
+    try:
+        with metrics.span("ocr.preprocess"):
+            img = preprocess_image(img)
+        with metrics.span("ocr.engine"):
+            text = get_engine().image_to_string(img)
+        return (text or "").strip()
+    except Exception:
+        return ""
+
+
+def ocr_image_two_pass(img: Image.Image) -> tuple[str, str]:
+    """
+    Primero una pasada barata; si fecha, total e IVA salen con confianza
+    suficiente se devuelve esa. Si no, pasada completa (upscale + mediana).
+    Devuelve (texto, "fast" | "full").
+    """
+    if OCR_FAST_PASS:
+        try:
+            with metrics.span("ocr.fast_preprocess"):
+                small = preprocess_fast(img)
+            with metrics.span("ocr.fast_engine"):
+                fast = (get_engine().image_to_string(small) or "").strip()
+        except Exception:
+            fast = ""
+        if fast and min(parse_confidence(fast).values()) >= OCR_FAST_MIN_CONFIDENCE:
+            return fast, "fast"
+    return ocr_image(img), "full"
+
+
+def ocr_image_bytes(data: bytes) -> str:
+    try:
+        img = Image.open(BytesIO(data))
+    except Exception:
+        return ""
+    return ocr_image(img)
+
+
+def ocr_image_file(path: str) -> tuple[str, str]:
+    """
+    Imagen desde disco (Pillow decodifica leyendo del archivo), en dos
+    pasadas. Devuelve (texto, pasada usada).
+    """
+    try:
+        with Image.open(path) as img:
+            with metrics.span("ocr.decode"):
+                img.load()
+            return ocr_image_two_pass(img)
+    except Exception:
+        return "", "failed"
+
+
+def _native_page_text(page) -> Optional[str]:
+    """Texto nativo de la página, o None si hay que rasterizar."""
+    t = (page.get_text("text") or "").strip()
+    return t if len(t) >= OCR_MIN_NATIVE_TEXT else None
+
+
+def _ocr_page(page) -> str:
+    try:
+        with metrics.span("ocr.rasterize"):
+            pix = page.get_pixmap(dpi=OCR_PDF_DPI, alpha=False)
+            pil_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        return ocr_image(pil_img)
+    except Exception:
+        return ""
+
+
+def _ocr_pdf_page_at(path: str, page_no: int) -> str:
+    """Worker: abre el PDF desde disco y hace OCR de una sola página."""
+    try:
+        with fitz.open(path) as doc:
+            return _ocr_page(doc[page_no])
+    except Exception:
+        return ""
+
+
+_pdf_workers = OCR_PDF_WORKERS
+_page_executor: Optional[ProcessPoolExecutor] = None
+_page_executor_lock = threading.Lock()
+_page_exit_hook = False
+
+
+def set_pdf_workers(n: int):
+    """
+    Procesos de páginas de este proceso. jobs lo fija en cada worker del
+    pool para que OCR_WORKERS x páginas no pase de los cores.
+    """
+    global _pdf_workers
+    _pdf_workers = max(1, n)
+
+
+def _get_page_executor() -> ProcessPoolExecutor:
+    global _page_executor, _page_exit_hook
+    with _page_executor_lock:
+        if _page_executor is None:
+            _page_executor = ProcessPoolExecutor(
+                max_workers=_pdf_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            if not _page_exit_hook:
+                # corre al salir el worker de jobs, antes de que multiprocessing
+                # espere a sus hijos (los workers de páginas no saldrían nunca)
+                # y antes que las colas del pool (prioridad 10), que cierran
+                # el canal por el que viajan los avisos de apagado
+                multiprocessing.util.Finalize(None, shutdown_page_executor, exitpriority=100)
+                _page_exit_hook = True
+        return _page_executor
+
+
+def _discard_page_executor(broken: ProcessPoolExecutor):
+    """Como jobs._discard_executor: el pool roto se descarta y se crea otro."""
+    global _page_executor
+    with _page_executor_lock:
+        if _page_executor is broken:
+            _page_executor = None
+    try:
+        broken.shutdown(wait=False, cancel_futures=True)
+    except Exception:
+        pass
+
+
+def shutdown_page_executor():
+    global _page_executor
+    with _page_executor_lock:
+        executor, _page_executor = _page_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _ocr_pages_in_pool(path: str, pages: list[int]) -> dict[int, str]:
+    """
+    Texto por página. Si un worker muere, el pool se rompe y todas las
+    páginas pendientes fallan: esas quedan afuera del resultado.
+    """
+    executor = _get_page_executor()
+    futures = []
+    for i in pages:
+        try:
+            futures.append((i, executor.submit(_ocr_pdf_page_at, path, i)))
+        except BrokenProcessPool:
+            break
+    out: dict[int, str] = {}
+    for i, fut in futures:
+        try:
+            out[i] = fut.result()
+        except BrokenProcessPool:
+            pass
+    if len(out) < len(pages):
+        _discard_page_executor(executor)
+    return out
+
+
+def ocr_pdf_file(path: str) -> str:
+    """
+    PDF desde disco: texto nativo cuando lo hay; las páginas escaneadas
+    se rasterizan y pasan por OCR en paralelo (set_pdf_workers procesos),
+    cada worker abriendo el archivo y leyendo solo su página. Si un worker
+    de páginas muere, las páginas que quedaron sin texto se reintentan en
+    un pool nuevo hasta OCR_PAGE_CRASH_RETRIES veces y después se omiten.
+    """
+    try:
+        doc = fitz.open(path)
+    except Exception:
+        return ""
+
+    with doc:
+        texts: list[Optional[str]] = [_native_page_text(page) for page in doc]
+        to_ocr = [i for i, t in enumerate(texts) if t is None]
+
+        if len(to_ocr) <= 1 or _pdf_workers <= 1:
+            for i in to_ocr:
+                texts[i] = _ocr_page(doc[i])
+            return "\n\n".join(t for t in texts if t).strip()
+
+    # los spans de esas páginas quedan en los procesos del pool: en
+    # /metrics cuenta document.ocr
+    pending = to_ocr
+    for attempt in range(OCR_PAGE_CRASH_RETRIES + 1):
+        done = _ocr_pages_in_pool(path, pending)
+        for i, t in done.items():
+            texts[i] = t
+        pending = [i for i in pending if i not in done]
+        if not pending:
+            break
+        logger.warning("Pool de páginas roto con %s páginas de %s pendientes", len(pending), path)
+    else:
+        logger.error("Páginas %s de %s omitidas: el worker murió en cada intento", pending, path)
+    return "\n\n".join(t for t in texts if t).strip()
+
+
+def ocr_pdf_bytes(data: bytes) -> str:
+    """PDF en memoria: intenta texto nativo; si no, rasteriza y hace OCR."""
+    parts: list[str] = []
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+    except Exception:
+        return ""
+    for page in doc:
+        t = _native_page_text(page)
+        if t is None:
+            t = _ocr_page(page)
+        if t:
+            parts.append(t)
+    return "\n\n".join(parts).strip()
+
+
+# ==========================
+# Helpers de parsing contable
+# ==========================
+
+# extract_date / parse_rubro / parse_iva_y_neto son los parsers originales
+# (un escaneo cada uno). El pipeline usa receipt_parser.parse_receipt, que
+# resuelve todo en una pasada; estos quedan como referencia de regresión.
+
+_DATE_RE = re.compile(r"(20\d{2}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]20\d{2})")
+
+
+def _find_date(text: str) -> Optional[str]:
+    m = _DATE_RE.search(text)
+    if not m:
+        return None
+    raw = m.group(0).replace("/", "-").replace(".", "-")
+    parts = raw.split("-")
+    try:
+        if len(parts[0]) == 4:
+            return dt.datetime.strptime(raw, "%Y-%m-%d").date().isoformat()
+        else:
+            return dt.datetime.strptime(raw, "%d-%m-%Y").date().isoformat()
+    except Exception:
+        return None
+
+
+def extract_date(text: str) -> str:
+    return _find_date(text) or dt.date.today().isoformat()
+
+
+def parse_rubro(text: str) -> Optional[str]:
+    keywords = {
+        "alquiler": "Alquiler",
+        "rent": "Alquiler",
+        "luz": "Servicios",
+        "ute": "Servicios",
+        "energ": "Servicios",
+        "agua": "Servicios",
+        "ose": "Servicios",
+        "internet": "Servicios",
+        "telefon": "Servicios",
+        "combust": "Movilidad",
+        "nafta": "Movilidad",
+        "gasol": "Movilidad",
+        "proveed": "Mercaderías",
+        "insumo": "Insumos",
+        "materia prima": "Insumos",
+        "venta": "Ventas",
+        "ingreso": "Ventas",
+        "factura": "Ventas",
+    }
+    lo = text.lower()
+    for k, v in keywords.items():
+        if k in lo:
+            return v
+    return None
+
+
+def parse_iva_y_neto(
+    text: str,
+) -> tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
+    nums = re.findall(r"\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})", text)
+    if not nums:
+        return None, None, None
+    vals = [Decimal(n.replace(".", "").replace(",", ".")) for n in nums]
+    total = max(vals)
+
+    m_iva = re.search(r"iva[^0-9]*([\d.,]{1,15})", text.lower())
+    if m_iva:
+        iva = Decimal(m_iva.group(1).replace(".", "").replace(",", "."))
+        neto = total - iva
+        return (
+            iva.quantize(Decimal("0.01")),
+            neto.quantize(Decimal("0.01")),
+            total.quantize(Decimal("0.01")),
+        )
+
+    iva = (total * Decimal("0.22")).quantize(Decimal("0.01"))
+    neto = (total - iva).quantize(Decimal("0.01"))
+    return iva, neto, total.quantize(Decimal("0.01"))
+
+
+def parse_confidence(text: str) -> dict[str, float]:
+    return receipt_confidence(parse_receipt(text or ""))
+
+
+def is_pdf(filename: str, mime: str) -> bool:
+    filename = (filename or "").lower()
+    mime = (mime or "").lower()
+    return filename.endswith(".pdf") or "pdf" in mime
+
+
+def parse_document_text(ocr_text: str) -> dict:
+    """
+    Aplica el parser de comprobantes sobre el texto OCR y devuelve
+    los campos de la transacción (fecha, tipo, rubro, importes).
+    """
+    return transaction_fields(parse_receipt(ocr_text or ""))
@@ -0,0 +1,84 @@
+# backend/app/ocr_cache.py
+
+import os
+import json
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from .cache import LRUCache
+from .db import OcrCacheEntry
+from .ocr import pipeline_version
+
+
+# Entradas en memoria por proceso (delante de la tabla ocr_cache)
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "512"))
+
+_DECIMAL_FIELDS = ("neto", "iva", "total")
+
+
+_memory = LRUCache(OCR_CACHE_SIZE)
+
+
+def _dump_parsed(parsed: dict) -> str:
+    return json.dumps({k: str(v) if isinstance(v, Decimal) else v for k, v in parsed.items()})
+
+
+def _load_parsed(raw: Optional[str]) -> dict:
+    parsed = json.loads(raw or "{}")
+    for k in _DECIMAL_FIELDS:
+        if parsed.get(k) is not None:
+            parsed[k] = Decimal(parsed[k])
+    return parsed
+
+
+def get(db, checksum: str) -> Optional[tuple[str, dict]]:
+    """
+    Devuelve (ocr_text, parsed) si el contenido ya pasó por la versión
+    actual del pipeline, sin llamar a Tesseract.
+    """
+    key = (checksum, pipeline_version())
+    hit = _memory.get(key)
+    if hit is not None:
+        return hit[0], dict(hit[1])
+
+    entry = db.get(OcrCacheEntry, key)
+    if entry is None:
+        return None
+
+    value = (entry.ocr_text or "", _load_parsed(entry.parsed))
+    _memory.put(key, value)
+    return value[0], dict(value[1])
+
+
+def put(db, checksum: str, ocr_text: str, parsed: dict):
+    """Guarda el resultado; no hace commit (va en la transacción del caller)."""
+    version = pipeline_version()
+    key = (checksum, version)
+    if db.get(OcrCacheEntry, key) is None:
+        try:
+            # savepoint: si otro worker la insertó en paralelo, seguimos
+            with db.begin_nested():
+                db.add(
+                    OcrCacheEntry(
+                        checksum=checksum,
+                        pipeline_version=version,
+                        ocr_text=ocr_text,
+                        parsed=_dump_parsed(parsed),
+                    )
+                )
+        except IntegrityError:
+            pass
+    _memory.put(key, (ocr_text or "", dict(parsed)))
+
+
+def prune_stale(db) -> int:
+    """Borra entradas de versiones anteriores del pipeline."""
+    deleted = (
+        db.query(OcrCacheEntry)
+        .filter(OcrCacheEntry.pipeline_version != pipeline_version())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
@@ -0,0 +1,130 @@
+# backend/app/ocr_engines.py
+
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import pytesseract
+from PIL import Image
+
+
+class OcrEngine:
+    """
+    Interfaz mínima de un motor OCR: imagen PIL -> texto.
+    Las implementaciones reciben idioma, modos y variables de Tesseract.
+    """
+
+    name = "base"
+
+    def __init__(self, lang: str, psm: int, oem: int, variables: Optional[dict] = None):
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.variables = dict(variables or {})
+
+    def image_to_string(self, img: Image.Image) -> str:
+        raise NotImplementedError
+
+    def version(self) -> str:
+        return "unknown"
+
+
+class TesseractCliEngine(OcrEngine):
+    """
+    Comportamiento original: pytesseract lanza un proceso `tesseract`
+    por imagen (archivos temporales + carga de traineddata cada vez).
+    """
+
+    name = "tesseract"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        flags = [f"--oem {self.oem}", f"--psm {self.psm}"]
+        flags += [f"-c {k}={v}" for k, v in self.variables.items()]
+        self.config = " ".join(flags)
+
+    def image_to_string(self, img: Image.Image) -> str:
+        return pytesseract.image_to_string(img, lang=self.lang, config=self.config)
+
+    def version(self) -> str:
+        try:
+            return str(pytesseract.get_tesseract_version())
+        except Exception:
+            return "unknown"
+
+
+class TesserocrPoolEngine(OcrEngine):
+    """
+    Mantiene instancias de Tesseract ya inicializadas (tesserocr, API C)
+    y las reutiliza entre páginas y requests. Cada proceso worker tiene su
+    propio pool; por defecto una instancia por proceso.
+
+    Requiere `pip install tesserocr` (dependencia opcional).
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, *args, pool_size: int = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise RuntimeError("OCR_ENGINE=tesserocr requiere el paquete 'tesserocr'") from e
+        self._tesserocr = tesserocr
+        self._pool: queue.Queue = queue.Queue()
+        self._created = 0
+        self._max = max(1, pool_size)
+        self._lock = threading.Lock()
+
+    def _new_api(self):
+        api = self._tesserocr.PyTessBaseAPI(
+            lang=self.lang,
+            psm=self.psm,
+            oem=self.oem,
+        )
+        for k, v in self.variables.items():
+            api.SetVariable(k, str(v))
+        return api
+
+    @contextmanager
+    def _acquire(self):
+        api = None
+        try:
+            api = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self._max:
+                    self._created += 1
+                    api = self._new_api()
+            if api is None:
+                api = self._pool.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._pool.put(api)
+
+    def image_to_string(self, img: Image.Image) -> str:
+        with self._acquire() as api:
+            api.SetImage(img)
+            return api.GetUTF8Text()
+
+    def version(self) -> str:
+        return f"tesserocr-{self._tesserocr.tesseract_version().split()[1]}"
+
+
+ENGINES = {
+    TesseractCliEngine.name: TesseractCliEngine,
+    TesserocrPoolEngine.name: TesserocrPoolEngine,
+}
+
+
+def build_engine(name: str, lang: str, psm: int, oem: int, variables: dict, pool_size: int = 1) -> OcrEngine:
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise RuntimeError(f"OCR_ENGINE desconocido: {name!r} (opciones: {', '.join(ENGINES)})")
+    if cls is TesserocrPoolEngine:
+        return cls(lang, psm, oem, variables, pool_size=pool_size)
+    return cls(lang, psm, oem, variables)
@@ -0,0 +1,46 @@
+# backend/app/periods.py
+"""
+Períodos mensuales como rangos de fechas semiabiertos [inicio, fin).
+
+Filtrar con `occurred_on >= inicio AND occurred_on < fin` deja la columna
+sin envolver en funciones (strftime/extract), así que el planner puede usar
+el índice (user_id, occurred_on), y funciona igual en SQLite y Postgres.
+"""
+
+import datetime as dt
+
+
+def shift_month(year: int, month: int, offset: int) -> tuple[int, int]:
+    """(year, month) desplazado `offset` meses (negativo hacia atrás)."""
+    return from_month_index(month_index(year, month) + offset)
+
+
+def month_start(year: int, month: int, offset: int = 0) -> dt.date:
+    y, m = shift_month(year, month, offset)
+    return dt.date(y, m, 1)
+
+
+def month_range(year: int, month: int, months: int = 1) -> tuple[dt.date, dt.date]:
+    """[primer día del mes, primer día del mes `months` después)."""
+    return month_start(year, month), month_start(year, month, months)
+
+
+def period_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+def parse_period(raw: str) -> tuple[int, int]:
+    """'YYYY-MM' -> (year, month). ValueError si no es un mes válido."""
+    year, month = raw.strip().split("-")
+    if len(year) != 4 or not 1 <= int(month) <= 12:
+        raise ValueError(raw)
+    return int(year), int(month)
+
+
+def month_index(year: int, month: int) -> int:
+    """Meses desde el año 0: índice lineal para aritmética y arrays."""
+    return year * 12 + (month - 1)
+
+
+def from_month_index(idx: int) -> tuple[int, int]:
+    return idx // 12, idx % 12 + 1
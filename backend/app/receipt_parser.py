@@ -0,0 +1,168 @@
+# backend/app/receipt_parser.py
+
+import re
+import datetime as dt
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+
+# ==========================
+# Patrones (compilados una vez)
+# ==========================
+
+_AMOUNT = r"\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})"
+
+_DATE_RE = re.compile(r"20\d{2}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]20\d{2}")
+_AMOUNT_RE = re.compile(_AMOUNT)
+# Valor tras la etiqueta (misma semántica que parse_iva_y_neto)
+_IVA_VALUE_RE = re.compile(r"iva[^0-9]*([\d.,]{1,15})")
+_TOTAL_VALUE_RE = re.compile(rf"total[^0-9]{{0,20}}({_AMOUNT})")
+
+RUBRO_KEYWORDS = {
+    "alquiler": "Alquiler",
+    "rent": "Alquiler",
+    "luz": "Servicios",
+    "ute": "Servicios",
+    "energ": "Servicios",
+    "agua": "Servicios",
+    "ose": "Servicios",
+    "internet": "Servicios",
+    "telefon": "Servicios",
+    "combust": "Movilidad",
+    "nafta": "Movilidad",
+    "gasol": "Movilidad",
+    "proveed": "Mercaderías",
+    "insumo": "Insumos",
+    "materia prima": "Insumos",
+    "venta": "Ventas",
+    "ingreso": "Ventas",
+    "factura": "Ventas",
+}
+INCOME_KEYWORDS = ("venta", "ingreso")
+
+IVA_RATE = Decimal("0.22")
+CENT = Decimal("0.01")
+
+
+def _to_decimal(raw: str) -> Optional[Decimal]:
+    try:
+        return Decimal(raw.replace(".", "").replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def _parse_date(raw: str) -> Optional[str]:
+    raw = raw.replace("/", "-").replace(".", "-")
+    try:
+        if len(raw.split("-")[0]) == 4:
+            return dt.datetime.strptime(raw, "%Y-%m-%d").date().isoformat()
+        return dt.datetime.strptime(raw, "%d-%m-%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+# ==========================
+# Parser
+# ==========================
+
+def parse_receipt(text: str) -> dict:
+    """
+    Parsea el texto OCR de un comprobante y devuelve de una vez:
+    date (ISO o None si no hay fecha explícita), amounts, total, iva, neto,
+    iva_explicit, total_labelled, rubro (o None) y kind.
+
+    Mismo criterio que extract_date / parse_iva_y_neto / parse_rubro:
+    primera fecha, total = mayor importe, IVA explícito tras "iva" o 22%
+    derivado, rubro por prioridad de keyword. El texto se pasa a minúsculas
+    una sola vez, los importes se tokenizan en un único findall y fecha/IVA
+    cortan en la primera coincidencia. Sigue siendo una pasada por campo,
+    no un escaneo único: el tiempo queda a la par de los parsers originales
+    (ver benchmarks/bench_parser.py).
+    """
+    lo = (text or "").lower()
+
+    m_date = _DATE_RE.search(lo)
+    date = _parse_date(m_date.group()) if m_date else None
+
+    amounts = [v for v in map(_to_decimal, _AMOUNT_RE.findall(lo)) if v is not None]
+
+    rubro = None
+    for k, v in RUBRO_KEYWORDS.items():
+        if k in lo:
+            rubro = v
+            break
+    kind = "income" if any(k in lo for k in INCOME_KEYWORDS) else "expense"
+
+    total = iva = neto = None
+    iva_explicit = total_labelled = False
+    if amounts:
+        total = max(amounts)
+        m_iva = _IVA_VALUE_RE.search(lo)
+        explicit = _to_decimal(m_iva.group(1)) if m_iva else None
+        if explicit is not None:
+            iva_explicit = True
+            iva = explicit.quantize(CENT)
+            neto = (total - explicit).quantize(CENT)
+        else:
+            iva = (total * IVA_RATE).quantize(CENT)
+            neto = (total - iva).quantize(CENT)
+        total = total.quantize(CENT)
+
+        if "total" in lo:
+            for raw in _TOTAL_VALUE_RE.findall(lo):
+                value = _to_decimal(raw)
+                if value is not None and value.quantize(CENT) == total:
+                    total_labelled = True
+                    break
+
+    return {
+        "date": date,
+        "amounts": amounts,
+        "total": total,
+        "iva": iva,
+        "neto": neto,
+        "iva_explicit": iva_explicit,
+        "total_labelled": total_labelled,
+        "rubro": rubro,
+        "kind": kind,
+    }
+
+
+def receipt_confidence(receipt: dict) -> dict[str, float]:
+    """
+    Confianza (0..1) de los campos que necesita la Transaction:
+    - date: 1 si hay una fecha explícita válida, 0 si se usaría "hoy";
+    - total: 1 si coincide con un importe rotulado "total", 0.7 si es solo
+      el mayor importe del texto, 0 si no hay importes;
+    - iva: 1 si está explícito y es menor al total, 0.6 si se deriva con
+      la tasa básica, 0 si el explícito no es consistente.
+    """
+    total = receipt["total"]
+    if total is None:
+        conf_total = conf_iva = 0.0
+    else:
+        conf_total = 1.0 if receipt["total_labelled"] else 0.7
+        if receipt["iva_explicit"]:
+            conf_iva = 1.0 if Decimal("0") < receipt["iva"] < total else 0.0
+        else:
+            conf_iva = 0.6
+    return {
+        "date": 1.0 if receipt["date"] else 0.0,
+        "total": conf_total,
+        "iva": conf_iva,
+    }
+
+
+def transaction_fields(receipt: dict, default_rubro: str = "Sin clasificar") -> dict:
+    """Campos de la Transaction (fecha, tipo, rubro, importes) a partir del parseo."""
+    iva, neto, total = receipt["iva"], receipt["neto"], receipt["total"]
+    if iva is None or neto is None or total is None:
+        iva, neto, total = Decimal("0.00"), Decimal("0.00"), Decimal("0.00")
+    return {
+        "date": receipt["date"] or dt.date.today().isoformat(),
+        "kind": receipt["kind"],
+        "rubro": receipt["rubro"] or default_rubro,
+        "neto": neto,
+        "iva": iva,
+        "total": total,
+    }
@@ -0,0 +1,262 @@
+# backend/app/rollup.py
+"""
+Rollup mensual de transacciones para el estado de resultados.
+
+Cada alta de Transaction llama a apply() dentro de su misma transacción
+de base de datos, así el rollup nunca queda desfasado. Para backfill o
+reparación:
+
+    python -m app.rollup rebuild [--user USER_ID]      (desde backend/)
+"""
+
+import argparse
+import datetime as dt
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal, MonthlyRollup, Transaction, init_db
+from .periods import period_key
+
+
+SIN_RUBRO = "Sin rubro"
+
+
+def period_of(occurred_on: dt.date) -> str:
+    return period_key(occurred_on.year, occurred_on.month)
+
+
+def _key(user_id: str, occurred_on: dt.date, rubro: Optional[str], kind: str) -> tuple:
+    return (user_id, period_of(occurred_on), rubro or SIN_RUBRO, kind)
+
+
+def _add(db, key: tuple, neto, iva, total, count: int) -> None:
+    user_id, period, rubro, kind = key
+    q = db.query(MonthlyRollup).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.period == period,
+        MonthlyRollup.rubro == rubro,
+        MonthlyRollup.kind == kind,
+    )
+    values = {
+        MonthlyRollup.neto: MonthlyRollup.neto + neto,
+        MonthlyRollup.iva: MonthlyRollup.iva + iva,
+        MonthlyRollup.total: MonthlyRollup.total + total,
+        MonthlyRollup.count: MonthlyRollup.count + count,
+    }
+    if q.update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(
+                MonthlyRollup(
+                    user_id=user_id,
+                    period=period,
+                    rubro=rubro,
+                    kind=kind,
+                    neto=neto,
+                    iva=iva,
+                    total=total,
+                    count=count,
+                )
+            )
+    except IntegrityError:
+        # otro proceso insertó la fila entre el UPDATE y el INSERT
+        q.update(values, synchronize_session=False)
+
+
+def apply(db, trx: Transaction) -> None:
+    """Suma una Transaction nueva al rollup. No hace commit."""
+    _add(
+        db,
+        _key(trx.user_id, trx.occurred_on, trx.rubro, trx.kind),
+        trx.neto or Decimal("0"),
+        trx.iva or Decimal("0"),
+        trx.total or Decimal("0"),
+        1,
+    )
+
+
+def apply_many(db, rows: Iterable[dict]) -> None:
+    """
+    Suma muchas transacciones (dicts con user_id, occurred_on, rubro, kind,
+    neto, iva, total), agrupando primero en memoria. Las claves existentes
+    se leen con una consulta y se actualizan con un UPDATE en lote; las
+    nuevas van en un INSERT en lote. No hace commit.
+    """
+    acc: dict[tuple, list] = defaultdict(lambda: [Decimal("0"), Decimal("0"), Decimal("0"), 0])
+    for r in rows:
+        a = acc[_key(r["user_id"], r["occurred_on"], r.get("rubro"), r["kind"])]
+        a[0] += r["neto"] or 0
+        a[1] += r["iva"] or 0
+        a[2] += r["total"] or 0
+        a[3] += 1
+    if not acc:
+        return
+
+    periods_by_user: dict[str, set] = defaultdict(set)
+    for user_id, period, _, _ in acc:
+        periods_by_user[user_id].add(period)
+    existing = set()
+    for user_id, periods in periods_by_user.items():
+        existing.update(
+            tuple(k)
+            for k in db.query(
+                MonthlyRollup.user_id, MonthlyRollup.period, MonthlyRollup.rubro, MonthlyRollup.kind
+            ).filter(MonthlyRollup.user_id == user_id, MonthlyRollup.period.in_(periods))
+        )
+
+    params = [
+        {
+            "k_user_id": key[0],
+            "k_period": key[1],
+            "k_rubro": key[2],
+            "k_kind": key[3],
+            "d_neto": v[0],
+            "d_iva": v[1],
+            "d_total": v[2],
+            "d_count": v[3],
+        }
+        for key, v in acc.items()
+    ]
+    updates = [p for p in params if (p["k_user_id"], p["k_period"], p["k_rubro"], p["k_kind"]) in existing]
+    inserts = [p for p in params if (p["k_user_id"], p["k_period"], p["k_rubro"], p["k_kind"]) not in existing]
+
+    t = MonthlyRollup.__table__
+    if updates:
+        db.execute(
+            update(t)
+            .where(
+                t.c.user_id == bindparam("k_user_id"),
+                t.c.period == bindparam("k_period"),
+                t.c.rubro == bindparam("k_rubro"),
+                t.c.kind == bindparam("k_kind"),
+            )
+            .values(
+                neto=t.c.neto + bindparam("d_neto"),
+                iva=t.c.iva + bindparam("d_iva"),
+                total=t.c.total + bindparam("d_total"),
+                count=t.c.count + bindparam("d_count"),
+            ),
+            updates,
+        )
+    if inserts:
+        try:
+            with db.begin_nested():
+                db.execute(
+                    insert(t),
+                    [
+                        {
+                            "user_id": p["k_user_id"],
+                            "period": p["k_period"],
+                            "rubro": p["k_rubro"],
+                            "kind": p["k_kind"],
+                            "neto": p["d_neto"],
+                            "iva": p["d_iva"],
+                            "total": p["d_total"],
+                            "count": p["d_count"],
+                        }
+                        for p in inserts
+                    ],
+                )
+        except IntegrityError:
+            # otro proceso creó alguna clave en paralelo: de a una
+            for p in inserts:
+                key = (p["k_user_id"], p["k_period"], p["k_rubro"], p["k_kind"])
+                _add(db, key, p["d_neto"], p["d_iva"], p["d_total"], p["d_count"])
+
+
+def period_rows(db, user_id: str, period: str) -> list[MonthlyRollup]:
+    return (
+        db.query(MonthlyRollup)
+        .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.period == period)
+        .all()
+    )
+
+
+def rebuild(db, user_id: Optional[str] = None) -> int:
+    """
+    Recalcula el rollup desde transactions (de un usuario o de todos).
+    Agrupa por fecha en SQL (portable entre SQLite y Postgres) y pliega
+    a meses en Python. Hace commit.
+    """
+    q = db.query(MonthlyRollup)
+    if user_id:
+        q = q.filter(MonthlyRollup.user_id == user_id)
+    q.delete(synchronize_session=False)
+
+    src = db.query(
+        Transaction.user_id,
+        Transaction.occurred_on,
+        Transaction.rubro,
+        Transaction.kind,
+        func.sum(Transaction.neto),
+        func.sum(Transaction.iva),
+        func.sum(Transaction.total),
+        func.count(Transaction.id),
+    )
+    if user_id:
+        src = src.filter(Transaction.user_id == user_id)
+    src = src.group_by(
+        Transaction.user_id, Transaction.occurred_on, Transaction.rubro, Transaction.kind
+    )
+
+    acc: dict[tuple, list] = defaultdict(lambda: [Decimal("0"), Decimal("0"), Decimal("0"), 0])
+    for uid, occurred_on, rubro, kind, neto, iva, total, count in src.yield_per(5000):
+        a = acc[_key(uid, occurred_on, rubro, kind)]
+        a[0] += Decimal(str(neto or 0))
+        a[1] += Decimal(str(iva or 0))
+        a[2] += Decimal(str(total or 0))
+        a[3] += count
+
+    db.bulk_insert_mappings(
+        MonthlyRollup,
+        [
+            {
+                "user_id": k[0],
+                "period": k[1],
+                "rubro": k[2],
+                "kind": k[3],
+                "neto": v[0],
+                "iva": v[1],
+                "total": v[2],
+                "count": v[3],
+            }
+            for k, v in acc.items()
+        ],
+    )
+    db.commit()
+    return len(acc)
+
+
+def backfill_if_empty(db) -> Optional[int]:
+    """Primer arranque con el rollup nuevo sobre una base con datos."""
+    if db.query(MonthlyRollup.user_id).first() is not None:
+        return None
+    if db.query(Transaction.id).first() is None:
+        return None
+    return rebuild(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del rollup mensual")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="recalcula el rollup desde transactions")
+    p_rebuild.add_argument("--user", default=None, help="solo este user_id")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.cmd == "rebuild":
+            n = rebuild(db, args.user)
+            print(f"Rollup reconstruido: {n} filas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
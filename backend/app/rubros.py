@@ -0,0 +1,269 @@
+# backend/app/rubros.py
+
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+
+from .db import RubroRule
+from .cache import LRUCache
+from .receipt_parser import RUBRO_KEYWORDS
+
+
+# Usuarios con matcher compilado en memoria (por proceso)
+RUBRO_MATCHER_CACHE_SIZE = int(os.getenv("RUBRO_MATCHER_CACHE_SIZE", "256"))
+
+# Reglas aprendidas de cargas manuales: activas después de esta cantidad
+# de confirmaciones de la misma descripción -> rubro, y como mucho estas
+# por usuario (se descartan primero las no confirmadas más viejas)
+RUBRO_LEARN_MIN_CONFIRMATIONS = int(os.getenv("RUBRO_LEARN_MIN_CONFIRMATIONS", "3"))
+RUBRO_LEARNED_MAX = int(os.getenv("RUBRO_LEARNED_MAX", "200"))
+
+# Prioridad: reglas manuales > keywords por defecto > aprendidas
+_TIER = {"manual": 0, "default": 1, "learned": 2}
+
+_MIN_PATTERN_LEN = 3
+
+# Palabras que no identifican un rubro: una descripción hecha solo de estas
+# ("pago", "compra", "venta mostrador") no se aprende
+_GENERIC_TERMS = frozenset(
+    """
+    pago pagos compra compras venta ventas gasto gastos varios varias otro otros
+    mostrador factura facturas ticket boleta recibo cuota efectivo contado
+    credito débito debito tarjeta transferencia deposito depósito cobro cobros
+    carga manual mes mensual total servicio servicios de del la las el los y en
+    a al con por para un una sin
+    """.split()
+)
+_MONTHS = frozenset(
+    "enero febrero marzo abril mayo junio julio agosto setiembre septiembre octubre noviembre diciembre".split()
+)
+
+
+def normalize_pattern(raw: str) -> str:
+    return re.sub(r"\s+", " ", (raw or "").strip().lower())
+
+
+def learned_pattern(description: Optional[str]) -> Optional[str]:
+    """
+    Patrón aprendible de una descripción: sus palabras sin números ni
+    meses (cambian en cada carga), o None si no queda nada específico.
+    """
+    tokens = [
+        t for t in re.findall(r"\w+", (description or "").lower())
+        if not t.isdigit() and t not in _MONTHS
+    ]
+    if not any(t not in _GENERIC_TERMS and len(t) >= _MIN_PATTERN_LEN for t in tokens):
+        return None
+    return " ".join(tokens)
+
+
+def _is_active(rule: RubroRule) -> bool:
+    return rule.source != "learned" or (rule.confirmations or 0) >= RUBRO_LEARN_MIN_CONFIRMATIONS
+
+
+# ==========================
+# Automata Aho-Corasick
+# ==========================
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick sobre caracteres: encuentra todas las keywords contenidas
+    en un texto en una pasada, en tiempo lineal en el largo del texto
+    (más la cantidad de coincidencias), sin importar cuántas reglas haya.
+
+    add() inserta en el trie de forma incremental; los enlaces de falla se
+    recalculan (BFS, lineal en el tamaño del trie) antes de la próxima búsqueda.
+    """
+
+    def __init__(self):
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[list[int]] = [[]]
+        self._fail: list[int] = [0]
+        self._link: list[int] = [0]  # nodo sufijo más cercano con salida
+        self.payloads: list = []
+        self._dirty = False
+
+    def add(self, pattern: str, payload) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append(len(self.payloads))
+        self.payloads.append(payload)
+        self._dirty = True
+
+    def _build(self) -> None:
+        goto, out = self._goto, self._out
+        fail = [0] * len(goto)
+        link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            r = queue.popleft()
+            for ch, s in goto[r].items():
+                queue.append(s)
+                f = fail[r]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                t = goto[f].get(ch, 0)
+                fail[s] = t if t != s else 0
+                link[s] = fail[s] if out[fail[s]] else link[fail[s]]
+        self._fail, self._link = fail, link
+        self._dirty = False
+
+    def iter_matches(self, text: str):
+        """Devuelve (posición final, índice de payload) por cada coincidencia."""
+        if self._dirty:
+            self._build()
+        goto, out, fail, link = self._goto, self._out, self._fail, self._link
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            m = node if out[node] else link[node]
+            while m:
+                for idx in out[m]:
+                    yield i, idx
+                m = link[m]
+
+
+class RubroMatcher:
+    """Automata de un usuario: sus reglas + las keywords por defecto."""
+
+    def __init__(self):
+        self.automaton = KeywordAutomaton()
+        self.count = 0
+        self.max_updated: Optional[datetime] = None
+        self.lock = threading.Lock()
+        for order, (pattern, rubro) in enumerate(RUBRO_KEYWORDS.items()):
+            self.automaton.add(pattern, (_TIER["default"], order, rubro, 0))
+
+    def add_rule(self, rule: RubroRule) -> None:
+        # entre reglas del usuario gana la más específica (la más larga);
+        # las aprendidas solo matchean palabras completas
+        if _is_active(rule):
+            whole_words = rule.source == "learned"
+            self.automaton.add(
+                rule.pattern,
+                (_TIER.get(rule.source, 0), -len(rule.pattern), rule.rubro, len(rule.pattern) if whole_words else 0),
+            )
+        self.count += 1
+        if rule.updated_at and (self.max_updated is None or rule.updated_at > self.max_updated):
+            self.max_updated = rule.updated_at
+
+    def classify(self, text: str) -> Optional[str]:
+        lo = normalize_pattern(text)
+        with self.lock:
+            best = None
+            for end, idx in self.automaton.iter_matches(lo):
+                payload = self.automaton.payloads[idx]
+                if best is not None and payload[:2] >= best[:2]:
+                    continue
+                length = payload[3]
+                if length and not _word_bounded(lo, end - length + 1, end + 1):
+                    continue
+                best = payload
+        return best[2] if best else None
+
+
+def _word_bounded(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+_matchers = LRUCache(RUBRO_MATCHER_CACHE_SIZE)
+_build_lock = threading.Lock()
+
+
+def get_matcher(db, user_id: str) -> RubroMatcher:
+    """
+    Matcher compilado del usuario, validado contra la tabla con una sola
+    consulta (cantidad + última modificación). Si solo hay reglas nuevas se
+    agregan al automata existente; si se borró o editó alguna, se reconstruye.
+    """
+    count, max_updated = (
+        db.query(func.count(RubroRule.id), func.max(RubroRule.updated_at))
+        .filter(RubroRule.user_id == user_id)
+        .one()
+    )
+
+    with _build_lock:
+        matcher = _matchers.get(user_id)
+        if matcher is not None and matcher.count == count and matcher.max_updated == max_updated:
+            return matcher
+
+        if matcher is not None and matcher.max_updated is not None:
+            new_rules = (
+                db.query(RubroRule)
+                .filter(RubroRule.user_id == user_id, RubroRule.updated_at > matcher.max_updated)
+                .all()
+            )
+            if matcher.count + len(new_rules) == count:
+                with matcher.lock:
+                    for rule in new_rules:
+                        matcher.add_rule(rule)
+                return matcher
+
+        matcher = RubroMatcher()
+        for rule in db.query(RubroRule).filter(RubroRule.user_id == user_id).all():
+            matcher.add_rule(rule)
+        _matchers.put(user_id, matcher)
+        return matcher
+
+
+def classify(db, user_id: str, text: str) -> Optional[str]:
+    return get_matcher(db, user_id).classify(text)
+
+
+def learn_rule(db, user_id: str, description: Optional[str], rubro: Optional[str]) -> Optional[RubroRule]:
+    """
+    Suma una confirmación a la regla descripción -> rubro de una carga
+    manual; clasifica recién con RUBRO_LEARN_MIN_CONFIRMATIONS. Si la misma
+    descripción va a otro rubro, la cuenta vuelve a empezar. No pisa reglas
+    cargadas a mano. No hace commit.
+    """
+    pattern = learned_pattern(description)
+    rubro = (rubro or "").strip()
+    if pattern is None or not rubro:
+        return None
+
+    rule = (
+        db.query(RubroRule)
+        .filter(RubroRule.user_id == user_id, RubroRule.pattern == pattern)
+        .first()
+    )
+    if rule is None:
+        rule = RubroRule(user_id=user_id, pattern=pattern, rubro=rubro, source="learned", confirmations=1)
+        db.add(rule)
+        db.flush()
+        _prune_learned(db, user_id)
+    elif rule.source == "learned":
+        if rule.rubro == rubro:
+            rule.confirmations = (rule.confirmations or 0) + 1
+        else:
+            rule.rubro = rubro
+            rule.confirmations = 1
+    return rule
+
+
+def _prune_learned(db, user_id: str) -> None:
+    """Deja como mucho RUBRO_LEARNED_MAX aprendidas: primero las activas, después las más nuevas."""
+    active = func.coalesce(RubroRule.confirmations, 0) >= RUBRO_LEARN_MIN_CONFIRMATIONS
+    extra = (
+        db.query(RubroRule.id)
+        .filter(RubroRule.user_id == user_id, RubroRule.source == "learned")
+        .order_by(active.desc(), RubroRule.updated_at.desc())
+        .offset(RUBRO_LEARNED_MAX)
+        .all()
+    )
+    if extra:
+        db.query(RubroRule).filter(RubroRule.id.in_([r[0] for r in extra])).delete(synchronize_session=False)
@@ -0,0 +1,307 @@
+# backend/app/search.py
+"""
+Búsqueda de texto completo sobre los documentos (GET /documents/search).
+
+Índice invertido según el motor:
+
+- SQLite: tabla virtual FTS5 `documents_fts` (user_key, document_id,
+  filename, content). Se mantiene a mano: index_document() se llama en la
+  misma transacción que deja el Document en la base (alta y
+  procesamiento/reproceso en jobs.finalize_document). El usuario se filtra
+  dentro del MATCH con un token único por usuario (user_key), así el costo
+  depende de los documentos del usuario y no del total. Ranking con bm25()
+  y fragmentos con snippet().
+- Postgres: columna generada (STORED) documents.search_vector =
+  to_tsvector('spanish', nombre || texto OCR) con índice GIN; la base la
+  recalcula al escribir el documento, así el ranking lee el vector ya
+  guardado en vez de tokenizar el texto OCR en cada consulta. Ranking con
+  ts_rank() y fragmentos con ts_headline().
+
+Rankear cuesta por cada documento que coincide: con términos muy comunes
+("factura") se rankean solo las SEARCH_RANK_CANDIDATES coincidencias más
+recientes, lo que mantiene la latencia acotada con 100k documentos. Una
+coincidencia más vieja puede quedar afuera aunque sea mejor: la respuesta
+lo indica con "truncated". Con consultas selectivas (menos coincidencias
+que el tope) se rankean todas.
+
+La consulta se reduce a sus palabras y cada una se busca como prefijo, con
+AND entre ellas: "ute 2024" encuentra "UTE ... 2024-03". Para reindexar:
+
+    python -m app.search rebuild [--user USER_ID]      (desde backend/)
+"""
+
+import argparse
+import os
+import re
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from .db import SessionLocal, Document, init_db
+
+
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 100
+# Palabras de la consulta que se usan (el resto se ignora)
+MAX_QUERY_TERMS = 8
+# Palabras de contexto en cada fragmento
+SNIPPET_WORDS = 12
+# Coincidencias más recientes que se rankean (ver arriba)
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "1000"))
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_PG_CONFIG = "spanish"
+_PG_DOCUMENT = (
+    f"to_tsvector('{_PG_CONFIG}', coalesce(original_filename, '') || ' ' || coalesce(ocr_text, ''))"
+)
+# índice de expresión de la versión anterior (recalculaba el vector al rankear)
+_PG_OBSOLETE_INDEX = "ix_documents_search"
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def user_key(user_id: str) -> str:
+    # un solo token alfanumérico (el tokenizer partiría un uuid en cinco);
+    # igual a 'u' || lower(hex(user_id)) en SQL
+    return "u" + user_id.encode("utf-8").hex()
+
+
+def query_terms(q: str) -> list[str]:
+    return _TERM.findall(q or "")[:MAX_QUERY_TERMS]
+
+
+# ==========================
+# Índice
+# ==========================
+
+def init_index(engine) -> None:
+    """Crea el índice si no existe (idempotente)."""
+    if _dialect(engine) == "postgresql":
+        # ADD COLUMN con un valor generado reescribe la tabla una vez
+        ddl = [
+            "ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({_PG_DOCUMENT}) STORED",
+            "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING GIN (search_vector)",
+            f"DROP INDEX IF EXISTS {_PG_OBSOLETE_INDEX}",
+        ]
+    else:
+        # las columnas de id van indexadas para poder filtrar y borrar por
+        # MATCH (por índice) en vez de recorrer la tabla
+        ddl = [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "user_key, document_id, filename, content, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        ]
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+def _phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _delete_sqlite(db, column: str, value: str) -> None:
+    db.execute(
+        text(
+            "DELETE FROM documents_fts WHERE rowid IN "
+            "(SELECT rowid FROM documents_fts WHERE documents_fts MATCH :m)"
+        ),
+        {"m": f"{column} : {_phrase(value)}"},
+    )
+
+
+def index_document(db, doc: Document) -> None:
+    """(Re)indexa un documento con su texto actual. No hace commit."""
+    if _dialect(db.get_bind()) == "postgresql":
+        return  # columna generada: la mantiene Postgres
+    _delete_sqlite(db, "document_id", str(doc.id))
+    db.execute(
+        text(
+            "INSERT INTO documents_fts (user_key, document_id, filename, content) "
+            "VALUES (:user_key, :document_id, :filename, :content)"
+        ),
+        {
+            "user_key": user_key(doc.user_id),
+            "document_id": str(doc.id),
+            "filename": doc.original_filename or "",
+            "content": doc.ocr_text or "",
+        },
+    )
+
+
+def rebuild(db, user_id: Optional[str] = None) -> int:
+    """Reconstruye el índice FTS desde documents (todo o un usuario). Hace commit."""
+    if _dialect(db.get_bind()) == "postgresql":
+        db.execute(text("REINDEX INDEX ix_documents_search_vector"))
+        db.commit()
+        return db.query(Document.id).count()
+
+    params = {}
+    where = ""
+    if user_id is None:
+        db.execute(text("DELETE FROM documents_fts"))
+    else:
+        _delete_sqlite(db, "user_key", user_key(user_id))
+        where = "WHERE user_id = :user_id"
+        params["user_id"] = user_id
+    result = db.execute(
+        text(
+            "INSERT INTO documents_fts (user_key, document_id, filename, content) "
+            "SELECT 'u' || lower(hex(user_id)), id, coalesce(original_filename, ''), coalesce(ocr_text, '') "
+            f"FROM documents {where}"
+        ),
+        params,
+    )
+    # fusiona los segmentos del índice en uno (consultas más rápidas)
+    db.execute(text("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')"))
+    db.commit()
+    return result.rowcount
+
+
+def backfill_if_empty(db) -> Optional[int]:
+    """Primer arranque con el índice nuevo sobre una base con documentos."""
+    if _dialect(db.get_bind()) == "postgresql":
+        return None
+    if db.execute(text("SELECT 1 FROM documents_fts LIMIT 1")).first() is not None:
+        return None
+    if db.query(Document.id).first() is None:
+        return None
+    return rebuild(db)
+
+
+# ==========================
+# Consulta
+# ==========================
+
+def _search_sqlite(db, user_id: str, terms: list[str], limit: int) -> tuple[list, bool]:
+    text_query = " AND ".join(f"{_phrase(t)}*" for t in terms)
+    match = f"user_key : {user_key(user_id)} AND {{filename content}} : ({text_query})"
+    candidates = max(SEARCH_RANK_CANDIDATES, limit)
+    # recorrer por rowid descendente es barato (no calcula bm25): si existe
+    # la coincidencia candidates+1, las de ese rowid para atrás no se rankean
+    cutoff = db.execute(
+        text(
+            "SELECT rowid FROM documents_fts WHERE documents_fts MATCH :m "
+            "ORDER BY rowid DESC LIMIT 1 OFFSET :candidates"
+        ),
+        {"m": match, "candidates": candidates},
+    ).scalar()
+    rows = db.execute(
+        text(
+            "SELECT d.id, d.original_filename, d.status, d.created_at, r.score, r.snippet "
+            "FROM ("
+            "  SELECT document_id, -rank AS score, "
+            # sin texto OCR (pendiente o vacío) se resalta el nombre
+            f"   coalesce(nullif(snippet(documents_fts, 3, '<b>', '</b>', '…', {SNIPPET_WORDS}), ''), "
+            "     highlight(documents_fts, 2, '<b>', '</b>')) AS snippet "
+            "  FROM documents_fts "
+            # pesos bm25 por columna: los ids no puntúan, el nombre pesa doble
+            "  WHERE documents_fts MATCH :m AND rank MATCH 'bm25(0.0, 0.0, 2.0, 1.0)' "
+            "    AND rowid > :cutoff "
+            "  ORDER BY rank LIMIT :limit"
+            ") AS r JOIN documents AS d ON d.id = r.document_id "
+            "ORDER BY r.score DESC"
+        ),
+        {"m": match, "limit": limit, "cutoff": cutoff or 0},
+    ).all()
+    return rows, cutoff is not None
+
+
+def _search_postgres(db, user_id: str, terms: list[str], limit: int) -> tuple[list, bool]:
+    # prefijos (term:*) unidos con AND, igual que en SQLite
+    tsquery = " & ".join(f"{t}:*" for t in terms)
+    candidates = max(SEARCH_RANK_CANDIDATES, limit)
+    # candidatos: las coincidencias más recientes (una de más para saber si
+    # quedaron afuera); ts_rank sobre el vector guardado y ts_headline solo
+    # sobre las filas ya cortadas por LIMIT
+    rows = db.execute(
+        text(
+            f"WITH q AS (SELECT to_tsquery('{_PG_CONFIG}', :q) AS q), "
+            "c AS ("
+            "  SELECT d.id, d.search_vector, row_number() OVER (ORDER BY d.created_at DESC) AS n "
+            "  FROM documents AS d, q "
+            "  WHERE d.user_id = :user_id AND d.search_vector @@ q.q "
+            "  ORDER BY d.created_at DESC LIMIT :candidates + 1"
+            "), "
+            "r AS ("
+            "  SELECT c.id, ts_rank(c.search_vector, q.q) AS rank FROM c, q "
+            "  WHERE c.n <= :candidates ORDER BY rank DESC LIMIT :limit"
+            ") "
+            "SELECT d.id, d.original_filename, d.status, d.created_at, r.rank AS score, "
+            f"ts_headline('{_PG_CONFIG}', coalesce(nullif(d.ocr_text, ''), d.original_filename, ''), q.q, "
+            f"'MaxWords={SNIPPET_WORDS}, MinWords=4, MaxFragments=1, FragmentDelimiter=…') AS snippet, "
+            "(SELECT max(n) FROM c) > :candidates AS truncated "
+            "FROM r JOIN documents AS d ON d.id = r.id, q "
+            "ORDER BY r.rank DESC"
+        ),
+        {"q": tsquery, "user_id": user_id, "limit": limit, "candidates": candidates},
+    ).all()
+    return rows, bool(rows and rows[0].truncated)
+
+
+def _isoformat(value) -> Optional[str]:
+    # SQL textual: SQLite devuelve el datetime como texto
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat() if value is not None else None
+
+
+def search_documents(db, user_id: str, q: str, limit: int = DEFAULT_RESULTS) -> dict:
+    """
+    Documentos del usuario que contienen todas las palabras de `q`, por
+    relevancia entre las SEARCH_RANK_CANDIDATES coincidencias más recientes.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return {"query": q, "truncated": False, "results": []}
+
+    if _dialect(db.get_bind()) == "postgresql":
+        rows, truncated = _search_postgres(db, user_id, terms, limit)
+    else:
+        rows, truncated = _search_sqlite(db, user_id, terms, limit)
+
+    return {
+        "query": q,
+        # hubo más de SEARCH_RANK_CANDIDATES coincidencias: se rankearon las
+        # más recientes y puede faltar alguna más vieja mejor puntuada
+        "truncated": truncated,
+        "results": [
+            {
+                "document_id": r.id,
+                "filename": r.original_filename,
+                "status": r.status,
+                "created_at": _isoformat(r.created_at),
+                # mayor es más relevante (-bm25 en SQLite, ts_rank en Postgres)
+                "score": round(float(r.score), 4),
+                "snippet": r.snippet,
+            }
+            for r in rows
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del índice de búsqueda de documentos")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="reindexa desde documents")
+    p_rebuild.add_argument("--user", default=None, help="solo este user_id")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        init_index(db.get_bind())
+        if args.cmd == "rebuild":
+            n = rebuild(db, args.user)
+            print(f"Índice de búsqueda reconstruido: {n} documentos")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# backend/app/sql_profile.py
+"""
+Perfilado de SQL con eventos del engine (SQLite y Postgres).
+
+create_db_engine() llama a install() en cada engine:
+- cada sentencia se cuenta y se cronometra; dentro de un request
+  (SqlProfileMiddleware) se acumula por request y al terminar va a
+  /metrics: db_statements_per_request y db_time_per_request_seconds por
+  ruta. Con SQL_SERVER_TIMING=1 también sale en el header Server-Timing
+  (lo muestran las devtools del navegador);
+- las que tardan SQL_SLOW_QUERY_MS o más se loguean como warning con la
+  forma de los parámetros (tipos y cantidad, nunca los valores: son datos
+  de usuarios). SQL_SLOW_QUERY_MS=0 lo apaga;
+- count_queries() / assert_max_queries(n) cuentan todas las sentencias
+  del proceso mientras están abiertos, en cualquier thread (TestClient
+  corre la app en otro): para tests y benchmarks.
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import event
+
+from . import metrics
+
+
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_SERVER_TIMING = os.getenv("SQL_SERVER_TIMING", "0") == "1"
+
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 50, 100, 200)
+MAX_STATEMENT_CHARS = 500
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Sentencias y tiempo acumulados (un request o un bloque de count_queries)."""
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[list[str]] = [] if keep_statements else None
+        self.lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float) -> None:
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+            if self.statements is not None:
+                self.statements.append(compact(statement))
+
+
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("sql_stats", default=None)
+_counters: list[QueryStats] = []
+_counters_lock = threading.Lock()
+_installed: set[int] = set()
+
+
+def compact(statement: str) -> str:
+    s = re.sub(r"\s+", " ", statement).strip()
+    return s if len(s) <= MAX_STATEMENT_CHARS else s[:MAX_STATEMENT_CHARS] + "..."
+
+
+def _types(values) -> str:
+    """Tipos en orden, con las repeticiones juntas: (str, int x 3, Decimal)."""
+    runs: list[list] = []
+    for v in values:
+        name = type(v).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return ", ".join(name if n == 1 else f"{name} x {n}" for name, n in runs)
+
+
+def param_shape(parameters, executemany: bool) -> str:
+    """Forma de los parámetros sin sus valores."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} filas de {param_shape(rows[0], False) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return f"({_types(parameters)})"
+    return type(parameters).__name__
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_profile_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("sql_profile_t0")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    if _counters:
+        with _counters_lock:
+            active = list(_counters)
+        for counter in active:
+            counter.add(statement, elapsed)
+
+    if SQL_SLOW_QUERY_MS > 0 and elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        metrics.inc("db_slow_statements_total")
+        logger.warning(
+            "SQL lenta (%.1f ms): %s | parámetros: %s",
+            elapsed * 1000,
+            compact(statement),
+            param_shape(parameters, executemany),
+        )
+
+
+def _on_error(exception_context):
+    # after_cursor_execute no corre si la sentencia falla
+    conn = exception_context.connection
+    stack = conn.info.get("sql_profile_t0") if conn is not None else None
+    if stack:
+        stack.pop()
+
+
+def install(engine) -> None:
+    if id(engine) in _installed:
+        return
+    _installed.add(id(engine))
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _on_error)
+
+
+@contextmanager
+def count_queries(keep_statements: bool = True):
+    """Cuenta las sentencias de todo el proceso mientras el bloque está abierto."""
+    stats = QueryStats(keep_statements)
+    with _counters_lock:
+        _counters.append(stats)
+    try:
+        yield stats
+    finally:
+        with _counters_lock:
+            _counters.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "bloque"):
+    """
+    Para tests: falla (AssertionError con las sentencias) si el bloque
+    ejecuta más de `limit` sentencias.
+
+        with assert_max_queries(4, "GET /analytics/income-statement"):
+            client.get("/analytics/income-statement?year=2025&month=3", headers=h)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        listed = "\n".join(f"  {i}. {s}" for i, s in enumerate(stats.statements, 1))
+        raise AssertionError(f"{label}: {stats.count} sentencias SQL, presupuesto {limit}\n{listed}")
+
+
+class SqlProfileMiddleware:
+    """Abre el contador del request y lo registra por ruta al terminar."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # los endpoints sync corren en un thread con una copia de este
+        # contexto: ven (y llenan) el mismo QueryStats
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if SQL_SERVER_TIMING and message["type"] == "http.response.start":
+                value = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} sentencias"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = metrics.route_template(scope)
+            metrics.observe("db_statements_per_request", stats.count, buckets=COUNT_BUCKETS, route=route)
+            metrics.observe("db_time_per_request_seconds", stats.seconds, route=route)
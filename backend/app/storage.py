@@ -0,0 +1,62 @@
+# backend/app/storage.py
+
+import os
+import hashlib
+import tempfile
+from typing import BinaryIO
+
+
+STORAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "storage")
+os.makedirs(STORAGE_PATH, exist_ok=True)
+
+# Tamaño máximo por archivo subido (MB)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "25")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_filename(filename: str) -> str:
+    """Solo el nombre base: evita rutas tipo ../../ en el nombre original."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name or "archivo"
+
+
+def store_stream(
+    src: BinaryIO,
+    filename: str,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> tuple[str, str, int]:
+    """
+    Copia el stream a STORAGE_PATH por bloques, calculando el SHA-256 a
+    medida que llegan los bytes. Nunca tiene el archivo entero en memoria.
+
+    Devuelve (path, checksum, size). Lanza UploadTooLarge si supera max_bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=STORAGE_PATH, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(filename)
+                digest.update(chunk)
+                out.write(chunk)
+
+        checksum = digest.hexdigest()
+        path = os.path.join(STORAGE_PATH, f"{checksum}-{safe_filename(filename)}")
+        os.replace(tmp_path, path)
+        return path, checksum, size
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
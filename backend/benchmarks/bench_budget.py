@@ -0,0 +1,214 @@
+# backend/benchmarks/bench_budget.py
+"""
+Benchmark y chequeo del presupuesto sugerido (budget.suggest).
+
+Genera usuarios con --years años de historia (alquiler fijo, un seguro
+pagado una vez por año, ventas con estacionalidad y tendencia, insumos
+con ruido y algún mes atípico, una reparación única dentro de la ventana)
+y un usuario con pocos meses de historia, arma el rollup y compara:
+
+- antes: una consulta agrupada sobre transactions por cada mes sugerido
+  (ventana / window_months), 12 para el año;
+- ahora: budget.suggest(), una consulta al rollup + NumPy para los 12.
+
+Verifica que el pago anual cae en su mes, que el costo fijo se mantiene,
+que la estacionalidad y la tendencia se reflejan, que el gasto único no se
+infla a gasto mensual y que con historia corta la sugerencia es el
+promedio de la ventana.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_budget [--users 20] [--years 5]
+
+Sale con código 1 si algún chequeo falla.
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend.app import budget, rollup
+from backend.app.db import Base, Transaction, create_db_engine
+from backend.app.periods import month_start, shift_month
+
+
+YEAR, MONTH = 2026, 1  # primer mes sugerido
+INSURANCE_MONTH = 3
+WINDOW = 6
+REPAIR = 6000.0  # gasto único, 2 meses antes del primer mes sugerido
+SHORT_MONTHS = 3
+
+
+def history(rnd: random.Random, years: int):
+    """(fecha, kind, rubro, total) de `years` años antes de YEAR-MONTH."""
+    for back in range(years * 12, 0, -1):
+        y, m = shift_month(YEAR, MONTH, -back)
+        t = years * 12 - back  # meses desde el inicio
+        yield dt.date(y, m, 5), "expense", "Alquiler", 1000.0
+        if m == INSURANCE_MONTH:
+            yield dt.date(y, m, 10), "expense", "Seguro", 12000.0
+        season = 2.0 if m == 12 else 1.0
+        sales = (10000 + 100 * t) * season
+        for day in (3, 13, 23):  # varias transacciones por mes
+            yield dt.date(y, m, day), "income", "Ventas", round(sales / 3 * rnd.uniform(0.95, 1.05), 2)
+        supplies = 3000 * rnd.uniform(0.9, 1.1) * (4 if rnd.random() < 0.05 else 1)
+        yield dt.date(y, m, 20), "expense", "Insumos", round(supplies, 2)
+        if back == 2:
+            yield dt.date(y, m, 15), "expense", "Reparaciones", REPAIR
+
+
+def short_history():
+    """Un usuario nuevo: SHORT_MONTHS meses de alquiler."""
+    for back in range(SHORT_MONTHS, 0, -1):
+        y, m = shift_month(YEAR, MONTH, -back)
+        yield dt.date(y, m, 5), "expense", "Alquiler", 1000.0
+
+
+def seed(engine, users: list[str], years: int) -> None:
+    rnd = random.Random(0)
+    with Session(engine) as s:
+        for user_id in users + ["short"]:
+            source = short_history() if user_id == "short" else history(rnd, years)
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "kind": kind,
+                    "occurred_on": date,
+                    "rubro": rubro,
+                    "neto": total,
+                    "iva": 0,
+                    "total": total,
+                    "description": "bench",
+                    "document_id": "bench",
+                }
+                for date, kind, rubro, total in source
+            ]
+            s.execute(insert(Transaction.__table__), rows)
+        s.commit()
+        rollup.rebuild(s)
+
+
+def legacy_year(db, user_id: str) -> dict:
+    """La versión anterior, repetida para cada uno de los 12 meses."""
+    out = {}
+    for h in range(12):
+        y, m = shift_month(YEAR, MONTH, h)
+        rows = (
+            db.query(Transaction.rubro, Transaction.kind, func.sum(Transaction.total))
+            .filter(
+                Transaction.user_id == user_id,
+                Transaction.occurred_on >= month_start(y, m, -WINDOW),
+                Transaction.occurred_on < month_start(y, m),
+            )
+            .group_by(Transaction.rubro, Transaction.kind)
+            .all()
+        )
+        for rubro, kind, total in rows:
+            out.setdefault(rubro, [0.0] * 12)[h] = float(total or 0) / WINDOW
+    return out
+
+
+def check(result: dict) -> list[str]:
+    lines = {line["rubro"]: line for line in result["lines"]}
+    missing = {"Alquiler", "Seguro", "Ventas"} - set(lines)
+    if missing:
+        return [f"sin sugerencia para {', '.join(sorted(missing))}"]
+    problems = []
+
+    rent = lines["Alquiler"]["months"]
+    if any(abs(v - 1000) > 50 for v in rent):
+        problems.append(f"Alquiler: esperaba ~1000 por mes, vino {rent}")
+
+    insurance = lines["Seguro"]["months"]
+    march = INSURANCE_MONTH - MONTH
+    others = [v for h, v in enumerate(insurance) if h != march]
+    if abs(insurance[march] - 12000) > 1200 or max(others) > 600:
+        problems.append(f"Seguro: esperaba ~12000 en marzo y ~0 el resto, vino {insurance}")
+
+    sales = lines["Ventas"]["months"]
+    december = 12 - MONTH
+    if sales[december] < 1.6 * sales[december - 1]:
+        problems.append(f"Ventas: diciembre sin estacionalidad ({sales[december]:.0f} vs {sales[december - 1]:.0f})")
+    if lines["Ventas"]["trend"] <= 0:
+        problems.append("Ventas: sin tendencia creciente")
+    last_year = [v for v in lines["Ventas"]["last_year"] if v is not None]
+    if statistics.mean(sales) <= statistics.mean(last_year):
+        problems.append("Ventas: la sugerencia no supera al año anterior")
+
+    repair = lines.get("Reparaciones", {"months": [0.0]})["months"]
+    if repair[0] > REPAIR / WINDOW + 0.01:
+        problems.append(f"Reparaciones: gasto único inflado a {repair[0]:.0f} por mes (máx. {REPAIR / WINDOW:.0f})")
+    return problems
+
+
+def check_short(result: dict) -> list[str]:
+    """Historia corta: total de la ventana / WINDOW, sin tendencia ni estacionalidad."""
+    lines = {line["rubro"]: line for line in result["lines"]}
+    expected = 1000.0 * SHORT_MONTHS / WINDOW
+    rent = lines.get("Alquiler", {"months": []})["months"]
+    if not rent or any(abs(v - expected) > 0.01 for v in rent):
+        return [f"historia corta: esperaba {expected:.2f} por mes, vino {rent}"]
+    if result["from"] != month_start(YEAR, MONTH, -WINDOW).isoformat():
+        return [f"historia corta: 'from' debería ser el inicio de la ventana, vino {result['from']}"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-budget-")
+    engine = create_db_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    users = [f"user-{i}" for i in range(args.users)]
+    seed(engine, users, args.years)
+
+    failed = 0
+    legacy_t, new_t = [], []
+    with Session(engine) as db:
+        for i, user_id in enumerate(users):
+            t = time.perf_counter()
+            old = legacy_year(db, user_id)
+            legacy_t.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            result = budget.suggest(db, user_id, YEAR, MONTH, WINDOW, history_months=args.years * 12)
+            new_t.append(time.perf_counter() - t)
+
+            problems = check(result)
+            failed += bool(problems)
+            for p in problems:
+                print(f"FALLA {user_id}: {p}")
+            if i == 0:
+                print("Seguro (anual, marzo), 12 meses desde", result["months"][0])
+                print("  antes:", [round(v) for v in old.get("Seguro", [0.0] * 12)])
+                new = {line["rubro"]: line["months"] for line in result["lines"]}
+                print("  ahora:", [round(v) for v in new.get("Seguro", [0.0] * 12)])
+
+    with Session(engine) as db:
+        result = budget.suggest(db, "short", YEAR, MONTH, WINDOW, history_months=args.years * 12)
+    problems = check_short(result)
+    failed += bool(problems)
+    for p in problems:
+        print(f"FALLA short: {p}")
+
+    print(f"{args.users} usuarios x {args.years} años de historia")
+    print(f"  antes (12 consultas sobre transactions): {statistics.median(legacy_t) * 1000:7.1f} ms/usuario")
+    print(f"  ahora (rollup + NumPy):                  {statistics.median(new_t) * 1000:7.1f} ms/usuario")
+    engine.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
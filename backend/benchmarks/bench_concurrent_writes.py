@@ -0,0 +1,138 @@
+# backend/benchmarks/bench_concurrent_writes.py
+"""
+Benchmark de escrituras concurrentes en SQLite por perfil de engine.
+
+Cada worker (thread con su propia conexión del pool) repite lo que hace un
+alta de transacción manual: INSERT de la Transaction + rollup mensual +
+versión de datos del usuario, y commit. Entre medio, lectores hacen la
+consulta del estado de resultados. Se compara el perfil "default" (journal
+de rollback, synchronous=FULL) con "production" (WAL + pragmas).
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_concurrent_writes [--writers 8] [--readers 4] [--writes 200]
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import analytics_cache, rollup
+from backend.app.db import Base, Transaction, create_db_engine
+
+
+def writer(Session, user_id: str, n: int, stats: dict, lock: threading.Lock):
+    rnd = random.Random(user_id)
+    ok = failed = 0
+    for _ in range(n):
+        db = Session()
+        try:
+            total = Decimal(rnd.randrange(100, 100000)) / 100
+            trx = Transaction(
+                user_id=user_id,
+                kind=rnd.choice(("income", "expense")),
+                occurred_on=dt.date(2025, rnd.randrange(1, 13), 1),
+                rubro=rnd.choice(("Ventas", "Servicios", "Insumos")),
+                neto=total,
+                iva=Decimal("0"),
+                total=total,
+                description="bench",
+                document_id="manual",
+            )
+            db.add(trx)
+            rollup.apply(db, trx)
+            analytics_cache.bump(db, user_id)
+            db.commit()
+            ok += 1
+        except OperationalError:
+            db.rollback()
+            failed += 1
+        finally:
+            db.close()
+    with lock:
+        stats["ok"] += ok
+        stats["failed"] += failed
+
+
+def reader(Session, user_ids: list[str], stop: threading.Event, stats: dict, lock: threading.Lock):
+    reads = failed = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            rollup.period_rows(db, random.choice(user_ids), "2025-06")
+            reads += 1
+        except OperationalError:
+            failed += 1
+        finally:
+            db.close()
+    with lock:
+        stats["reads"] += reads
+        stats["read_failed"] += failed
+
+
+def run(profile: str, args) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="bench-writes-")
+    engine = create_db_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", profile=profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    stats = {"ok": 0, "failed": 0, "reads": 0, "read_failed": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    # pocos usuarios: varios escritores pisan las mismas filas del rollup
+    users = [f"user-{i}" for i in range(max(1, args.writers // 2))]
+
+    writers = [
+        threading.Thread(target=writer, args=(Session, users[i % len(users)], args.writes, stats, lock))
+        for i in range(args.writers)
+    ]
+    readers = [
+        threading.Thread(target=reader, args=(Session, users, stop, stats, lock))
+        for _ in range(args.readers)
+    ]
+
+    t0 = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    for t in readers:
+        t.join()
+
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    engine.dispose()
+
+    stats.update(elapsed=elapsed, journal_mode=mode)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=200, help="commits por escritor")
+    args = parser.parse_args()
+
+    print(f"escritores: {args.writers} x {args.writes} commits, lectores: {args.readers}")
+    print(f"{'perfil':<12}{'journal':<10}{'commits/s':>10}{'fallidos':>10}{'lecturas/s':>12}{'lect. fallidas':>16}")
+    for profile in ("default", "production"):
+        s = run(profile, args)
+        print(
+            f"{profile:<12}{s['journal_mode']:<10}"
+            f"{s['ok'] / s['elapsed']:>10.0f}{s['failed']:>10}"
+            f"{s['reads'] / s['elapsed']:>12.0f}{s['read_failed']:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# backend/benchmarks/bench_endpoints.py
+"""
+Benchmark por endpoint sobre la app FastAPI en proceso (TestClient).
+
+Genera (o reutiliza) una base SQLite con datagen.py, levanta la app
+apuntando a ella y mide por endpoint la distribución de latencias
+(p50/p90/p95/p99/máx) y cuántas consultas SQL hace cada request. Los
+endpoints de analytics se miden en frío (cache de respuestas vacío, otro
+mes por request) y con el ETag del cliente (304).
+
+Cada endpoint tiene un presupuesto de consultas (QUERY_BUDGETS, contadas
+con sql_profile.count_queries): si algún request lo supera, la corrida
+sale con código 1.
+
+El resultado va a un JSON (--out) para comparar corridas:
+
+    python -m backend.benchmarks.bench_endpoints --scale 10k --out antes.json
+    ... cambio ...
+    python -m backend.benchmarks.bench_endpoints --scale 10k --out despues.json --compare antes.json
+
+Con --db se guarda/reutiliza la base generada (las escalas 1m y 10m
+tardan en generarse). import-csv y POST /stock escriben en esa base: para
+repetir exactamente una corrida, usar una copia.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_endpoints [--scale 10k|1m|10m] [--db archivo]
+        [--requests 200] [--only income-statement,budget-suggest] [--out archivo.json]
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+CSV_ROWS = 500
+WARMUP = 5
+
+# Máximo de sentencias SQL por request (incluye la primera del usuario, que
+# agrega la consulta de auth, y la primera escritura, que crea filas de
+# versión/rollup). Pasarse hace fallar la corrida: una consulta por fila o
+# por mes se nota acá antes que en la latencia.
+QUERY_BUDGETS = {
+    "income-statement": 5,
+    "income-statement (304)": 2,
+    "budget-suggest": 3,
+    "budget-suggest (304)": 2,
+    "stock-get": 2,
+    "stock-post": 7,
+    "import-csv": 6,
+}
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(latencies: list[float], queries: list[int], statuses: dict) -> dict:
+    ms = sorted(v * 1000 for v in latencies)
+    return {
+        "requests": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(_percentile(ms, 50), 3),
+        "p90_ms": round(_percentile(ms, 90), 3),
+        "p95_ms": round(_percentile(ms, 95), 3),
+        "p99_ms": round(_percentile(ms, 99), 3),
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+        "queries_median": statistics.median(queries) if queries else 0,
+        "queries_max": max(queries) if queries else 0,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _csv_body(k: int) -> bytes:
+    lines = ["date,kind,rubro,total,description"]
+    for j in range(CSV_ROWS):
+        day = dt.date(2025, 1, 1) + dt.timedelta(days=(k * 7 + j) % 365)
+        lines.append(f"{day.isoformat()},{'income' if j % 3 else 'expense'},Bench,{100 + j % 900}.50,bench {k}-{j}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def cases(users: int, months: list[tuple[int, int]]) -> dict:
+    """
+    nombre -> función (k) -> (método, url, kwargs de TestClient, índice de usuario, limpiar cache).
+    `k` es el número de request: rota usuarios y meses.
+    """
+
+    def month(k):
+        return months[k % len(months)]
+
+    def income_statement(k):
+        y, m = month(k)
+        return "GET", f"/analytics/income-statement?year={y}&month={m}", {}, k % users, True
+
+    def budget_suggest(k):
+        y, m = month(k)
+        return "GET", f"/budget/suggest?year={y}&month={m}", {}, k % users, True
+
+    def stock_get(k):
+        y, m = month(k)
+        return "GET", f"/stock?year={y}&month={m}", {}, k % users, False
+
+    def stock_post(k):
+        y, m = month(k)
+        body = {"initial_stock": str(1000 + k), "final_stock": str(900 + k)}
+        return "POST", f"/stock?year={y}&month={m}", {"json": body}, k % users, False
+
+    def import_csv(k):
+        files = {"file": (f"bench-{k}.csv", _csv_body(k), "text/csv")}
+        return "POST", "/transactions/import-csv", {"files": files}, k % users, False
+
+    return {
+        "income-statement": income_statement,
+        "budget-suggest": budget_suggest,
+        "stock-get": stock_get,
+        "stock-post": stock_post,
+        "import-csv": import_csv,
+    }
+
+
+def run_case(client, build, tokens: list[str], n: int, count_queries, clear_cache) -> dict:
+    latencies, queries, statuses = [], [], {}
+    for k in range(-WARMUP, n):
+        method, url, kwargs, user, cold = build(k % max(n, 1))
+        headers = {"Authorization": f"Bearer {tokens[user]}"}
+        if cold:
+            clear_cache()
+        with count_queries(keep_statements=False) as stats:
+            t0 = time.perf_counter()
+            r = client.request(method, url, headers=headers, **kwargs)
+            elapsed = time.perf_counter() - t0
+        if k < 0:
+            continue
+        latencies.append(elapsed)
+        queries.append(stats.count)
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+    return summarize(latencies, queries, statuses)
+
+
+def run_etag_case(client, build, tokens: list[str], n: int, count_queries) -> dict:
+    """Mismo request repetido con If-None-Match: el camino del 304."""
+    method, url, kwargs, user, _ = build(0)
+    headers = {"Authorization": f"Bearer {tokens[user]}"}
+    etag = client.request(method, url, headers=headers, **kwargs).headers.get("etag")
+    if etag:
+        headers["If-None-Match"] = etag
+    latencies, queries, statuses = [], [], {}
+    for _ in range(n):
+        with count_queries(keep_statements=False) as stats:
+            t0 = time.perf_counter()
+            r = client.request(method, url, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+        queries.append(stats.count)
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+    return summarize(latencies, queries, statuses)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _row_counts(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0]
+            for t in ("users", "transactions", "documents", "monthly_rollups", "stock_snapshots")
+        }
+    finally:
+        conn.close()
+
+
+def compare(current: dict, previous: dict) -> None:
+    print(f"\ncomparado con {previous['meta'].get('git_commit')} ({previous['meta'].get('started_at')}):")
+    print(f"{'endpoint':<26}{'p50 antes':>11}{'p50 ahora':>11}{'p95 antes':>11}{'p95 ahora':>11}{'consultas':>12}")
+    for name, cur in current["endpoints"].items():
+        old = previous["endpoints"].get(name)
+        if not old:
+            continue
+        print(
+            f"{name:<26}{old['p50_ms']:>11.2f}{cur['p50_ms']:>11.2f}{old['p95_ms']:>11.2f}{cur['p95_ms']:>11.2f}"
+            f"{old['queries_median']:>6} -> {cur['queries_median']:<4}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="10k", help="10k, 1m o 10m (ver datagen.SCALES)")
+    parser.add_argument("--db", default=None, help="base a generar o reutilizar (por defecto, temporal)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="por endpoint")
+    parser.add_argument("--only", default=None, help="endpoints separados por coma")
+    parser.add_argument("--out", default=None, help="JSON de resultados (por defecto bench-endpoints-<escala>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench-endpoints-"), "bench.db")
+    # la app toma la base de DATABASE_URL al importarse: antes de cualquier import de backend.app
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+    from fastapi.testclient import TestClient
+
+    from backend.app import analytics_cache, auth, sql_profile
+    from backend.app import db as app_db
+    from backend.app.main import app
+    from backend.benchmarks import datagen
+
+    users, transactions, documents = datagen.SCALES[args.scale]
+    if not os.path.exists(db_path) or _row_counts(db_path)["users"] == 0:
+        t0 = time.perf_counter()
+        datagen.generate(app_db.engine, users, transactions, documents, seed=args.seed)
+        print(f"base generada en {time.perf_counter() - t0:.1f}s: {db_path}")
+    rows = _row_counts(db_path)
+    users = rows["users"]
+
+    tokens = [
+        auth.create_access_token(
+            {"sub": datagen.email(i), "uid": datagen.user_id(i)}, expires_delta=dt.timedelta(hours=12)
+        )
+        for i in range(users)
+    ]
+    months = [
+        datagen.END.year * 12 + datagen.END.month - 1 - back for back in range(1, datagen.MONTHS + 1)
+    ]
+    months = [(m // 12, m % 12 + 1) for m in months]
+    all_cases = cases(users, months)
+    selected = args.only.split(",") if args.only else list(all_cases)
+
+    result = {
+        "meta": {
+            "scale": args.scale,
+            "rows": rows,
+            "requests": args.requests,
+            "git_commit": _git_commit(),
+            "started_at": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "endpoints": {},
+    }
+
+    with TestClient(app) as client:
+        for name in selected:
+            build = all_cases[name]
+            result["endpoints"][name] = run_case(
+                client, build, tokens, args.requests, sql_profile.count_queries, analytics_cache._responses.clear
+            )
+            if name in ("income-statement", "budget-suggest"):
+                result["endpoints"][f"{name} (304)"] = run_etag_case(
+                    client, build, tokens, args.requests, sql_profile.count_queries
+                )
+
+    print(f"escala {args.scale}: " + ", ".join(f"{t} {n}" for t, n in rows.items()))
+    print(f"{'endpoint':<26}{'p50 ms':>9}{'p90 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}{'consultas':>11}  status")
+    for name, s in result["endpoints"].items():
+        print(
+            f"{name:<26}{s['p50_ms']:>9.2f}{s['p90_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+            f"{s['max_ms']:>9.2f}{s['queries_median']:>11}  {s['status']}"
+        )
+
+    out = args.out or f"bench-endpoints-{args.scale}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"resultados: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+    failed = [n for n, s in result["endpoints"].items() if any(int(c) >= 500 for c in s["status"])]
+    for name, s in result["endpoints"].items():
+        budget = QUERY_BUDGETS.get(name)
+        if budget is not None and s["queries_max"] > budget:
+            print(f"FALLA {name}: {s['queries_max']} consultas en un request, presupuesto {budget}")
+            failed.append(name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
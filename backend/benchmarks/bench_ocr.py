@@ -0,0 +1,311 @@
+# backend/benchmarks/bench_ocr.py
+"""
+Benchmark del OCR sobre el corpus sintético de receipt_corpus.py.
+
+Pasa cada comprobante por ocr.ocr_image_bytes / ocr.ocr_pdf_bytes (lo que
+usa la app) y mide:
+
+- páginas por segundo y latencia por archivo (p50/p95);
+- tiempo por etapa: texto nativo del PDF, rasterizado, preprocesado,
+  motor OCR y "resto" (apertura y decodificación del archivo, parte del
+  decode que Pillow hace recién al convertir queda en preprocesado);
+- memoria pico: ru_maxrss del proceso y de los hijos (tesseract corre
+  como subproceso) y, con --tracemalloc, el pico de Python/NumPy por
+  archivo (agrega overhead a los tiempos);
+- acierto por campo de extract_date / parse_iva_y_neto / parse_rubro y
+  del pipeline (parse_document_text), sobre el texto OCR y sobre el texto
+  exacto del comprobante (el techo del parser), por calidad y por dpi.
+
+Para que las corridas sean comparables: misma --seed, OMP_THREAD_LIMIT=1
+por defecto (Tesseract usa un hilo) y las versiones de Tesseract, Pillow
+y PyMuPDF quedan en el JSON junto con la configuración del OCR.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_ocr [--corpus carpeta] [--n 60] [--seed 0]
+        [--skip-ocr] [--tracemalloc] [--out bench-ocr.json] [--min-accuracy 0.8]
+
+Sin --corpus genera uno temporal. Requiere Tesseract salvo con
+--skip-ocr, que mide las demás etapas y el techo del parser.
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+import fitz  # PyMuPDF
+import numpy as np
+import PIL
+
+from backend.app import ocr
+from backend.benchmarks.receipt_corpus import generate
+
+
+FIELDS = ("date", "kind", "rubro", "neto", "iva", "total")
+STAGES = ("native_text", "rasterize", "preprocess", "ocr", "other")
+
+
+class StageTimer:
+    """Envuelve las etapas de ocr.py (globales del módulo) y acumula tiempos."""
+
+    def __init__(self, skip_ocr: bool):
+        self.skip_ocr = skip_ocr
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self._saved = {}
+
+    def _timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.times[stage] += time.perf_counter() - t0
+
+        return wrapper
+
+    def install(self) -> None:
+        timer = self
+        engine = None if self.skip_ocr else ocr.get_engine()
+
+        class _Engine:
+            def image_to_string(self, img):
+                t0 = time.perf_counter()
+                try:
+                    return "" if engine is None else engine.image_to_string(img)
+                finally:
+                    timer.times["ocr"] += time.perf_counter() - t0
+
+        proxy = _Engine()
+        original_ocr_page = ocr._ocr_page
+
+        def ocr_page(page):
+            # rasterizado = _ocr_page menos lo que ya cuentan preprocesado y OCR
+            inner = self.times["preprocess"] + self.times["ocr"]
+            t0 = time.perf_counter()
+            try:
+                return original_ocr_page(page)
+            finally:
+                spent = time.perf_counter() - t0
+                self.times["rasterize"] += spent - (self.times["preprocess"] + self.times["ocr"] - inner)
+
+        self._saved = {
+            name: getattr(ocr, name) for name in ("get_engine", "preprocess_image", "_native_page_text", "_ocr_page")
+        }
+        ocr.get_engine = lambda: proxy
+        ocr.preprocess_image = self._timed("preprocess", ocr.preprocess_image)
+        ocr._native_page_text = self._timed("native_text", ocr._native_page_text)
+        ocr._ocr_page = ocr_page
+
+    def uninstall(self) -> None:
+        for name, fn in self._saved.items():
+            setattr(ocr, name, fn)
+
+    def reset(self) -> None:
+        self.times = dict.fromkeys(STAGES, 0.0)
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _dec(value) -> Decimal | None:
+    return None if value is None else Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def score(text: str, truth: dict) -> dict[str, bool]:
+    """Acierto por campo de los parsers de referencia y del pipeline."""
+    expected = {k: truth[k] if k in ("date", "kind", "rubro") else _dec(truth[k]) for k in FIELDS}
+    iva, neto, total = ocr.parse_iva_y_neto(text)
+    out = {
+        "extract_date": ocr.extract_date(text) == expected["date"],
+        "parse_rubro": ocr.parse_rubro(text) == expected["rubro"],
+        "parse_iva_y_neto.iva": _dec(iva) == expected["iva"],
+        "parse_iva_y_neto.neto": _dec(neto) == expected["neto"],
+        "parse_iva_y_neto.total": _dec(total) == expected["total"],
+    }
+    fields = ocr.parse_document_text(text)
+    for k in FIELDS:
+        got = fields[k] if k in ("date", "kind", "rubro") else _dec(fields[k])
+        out[f"pipeline.{k}"] = got == expected[k]
+    return out
+
+
+def accuracy(rows: list[dict], key: str) -> dict[str, float]:
+    if not rows:
+        return {}
+    return {field: round(sum(r[key][field] for r in rows) / len(rows), 3) for field in rows[0][key]}
+
+
+def _pages(path: str) -> int:
+    if not path.endswith(".pdf"):
+        return 1
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _tesseract_version() -> str | None:
+    try:
+        version = ocr.get_engine().version()
+    except Exception:
+        return None
+    return None if version == "unknown" else version
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=None, help="carpeta con manifest.json (por defecto, uno temporal)")
+    parser.add_argument("--n", type=int, default=60, help="comprobantes del corpus temporal")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-ocr", action="store_true", help="no llamar al motor (sin Tesseract)")
+    parser.add_argument("--tracemalloc", action="store_true", help="pico de memoria de Python por archivo")
+    parser.add_argument("--out", default=None, help="JSON de resultados")
+    parser.add_argument("--min-accuracy", type=float, default=0.0, help="acierto mínimo del pipeline sobre OCR")
+    args = parser.parse_args()
+
+    # el motor lee la variable al lanzar cada tesseract
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    tesseract = _tesseract_version()
+    if tesseract is None and not args.skip_ocr:
+        print("Tesseract no disponible: instalarlo o correr con --skip-ocr", file=sys.stderr)
+        sys.exit(1)
+
+    tmpdir = None
+    corpus = args.corpus
+    if corpus is None:
+        tmpdir = corpus = tempfile.mkdtemp(prefix="bench-ocr-")
+        generate(corpus, args.n, args.seed)
+    with open(os.path.join(corpus, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    timer = StageTimer(args.skip_ocr)
+    timer.install()
+    rows = []
+    try:
+        for entry in manifest["items"]:
+            path = os.path.join(corpus, entry["file"])
+            with open(path, "rb") as f:
+                data = f.read()
+            timer.reset()
+            if args.tracemalloc:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            if entry["file"].endswith(".pdf"):
+                text = ocr.ocr_pdf_bytes(data)
+            else:
+                text = ocr.ocr_image_bytes(data)
+            elapsed = time.perf_counter() - t0
+            peak = None
+            if args.tracemalloc:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            stages = dict(timer.times)
+            stages["other"] = max(0.0, elapsed - sum(v for k, v in stages.items() if k != "other"))
+            rows.append({
+                "file": entry["file"],
+                "source": entry["source"],
+                "quality": entry["quality"],
+                "dpi": entry["dpi"],
+                "pages": _pages(path),
+                "seconds": elapsed,
+                "stages": stages,
+                "py_peak_bytes": peak,
+                "ocr": score(text, entry["truth"]),
+                "truth": score(entry["text"], entry["truth"]),
+            })
+    finally:
+        timer.uninstall()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    total_s = sum(r["seconds"] for r in rows)
+    pages = sum(r["pages"] for r in rows)
+    ms = sorted(r["seconds"] * 1000 for r in rows)
+    peaks = [r["py_peak_bytes"] for r in rows if r["py_peak_bytes"] is not None]
+
+    def group(key):
+        values = sorted({r[key] for r in rows}, key=lambda v: (v is None, v))
+        return {str(v): accuracy([r for r in rows if r[key] == v], "ocr") for v in values}
+
+    result = {
+        "meta": {
+            "started_at": dt.datetime.now().isoformat(timespec="seconds"),
+            "corpus": {"seed": manifest["seed"], "n": manifest["n"]},
+            "skip_ocr": args.skip_ocr,
+            "tesseract": tesseract,
+            "pillow": PIL.__version__,
+            "pymupdf": fitz.VersionBind,
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "omp_thread_limit": os.environ.get("OMP_THREAD_LIMIT"),
+            "ocr": {
+                "engine": ocr.OCR_ENGINE,
+                "lang": ocr.OCR_LANG,
+                "oem": ocr.OCR_OEM,
+                "psm": ocr.OCR_PSM,
+                "preprocess": ocr.OCR_PREPROCESS,
+                "threshold": ocr.OCR_THRESHOLD,
+                "upscale": ocr.OCR_UPSCALE,
+                "pdf_dpi": ocr.OCR_PDF_DPI,
+            },
+        },
+        "throughput": {
+            "files": len(rows),
+            "pages": pages,
+            "pages_per_second": round(pages / total_s, 2) if total_s else 0.0,
+            "p50_ms": round(_percentile(ms, 50), 2),
+            "p95_ms": round(_percentile(ms, 95), 2),
+            "max_ms": round(ms[-1], 2) if ms else 0.0,
+        },
+        "stages_ms": {s: round(sum(r["stages"][s] for r in rows) * 1000 / max(len(rows), 1), 2) for s in STAGES},
+        "memory": {
+            # en Linux ru_maxrss viene en KiB
+            "max_rss_self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "max_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            "py_peak_mb_max": round(max(peaks) / 2**20, 1) if peaks else None,
+            "py_peak_mb_median": round(statistics.median(peaks) / 2**20, 1) if peaks else None,
+        },
+        "accuracy": {
+            "ocr": accuracy(rows, "ocr"),
+            "truth_text": accuracy(rows, "truth"),
+            "ocr_by_quality": group("quality"),
+            "ocr_by_dpi": group("dpi"),
+        },
+        "files": rows,
+    }
+
+    t = result["throughput"]
+    print(f"{t['files']} archivos, {t['pages']} páginas: {t['pages_per_second']} pág/s, "
+          f"p50 {t['p50_ms']} ms, p95 {t['p95_ms']} ms" + (" (sin OCR)" if args.skip_ocr else ""))
+    print("ms por archivo: " + ", ".join(f"{s} {v}" for s, v in result["stages_ms"].items()))
+    m = result["memory"]
+    print(f"RSS pico: proceso {m['max_rss_self_mb']} MB, hijos {m['max_rss_children_mb']} MB"
+          + (f", Python {m['py_peak_mb_max']} MB" if peaks else ""))
+    print(f"{'campo':<26}{'OCR':>8}{'texto':>8}")
+    for field, value in result["accuracy"]["ocr"].items():
+        print(f"{field:<26}{value:>8.0%}{result['accuracy']['truth_text'][field]:>8.0%}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+        print(f"resultados: {args.out}")
+
+    pipeline = [v for k, v in result["accuracy"]["ocr"].items() if k.startswith("pipeline.")]
+    sys.exit(1 if pipeline and min(pipeline) < args.min_accuracy else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# backend/benchmarks/bench_parser.py
+"""
+Benchmark y regresión del parser de comprobantes.
+
+Genera un corpus sintético de textos tipo OCR (o lee .txt de --dir),
+compara receipt_parser.parse_receipt contra los parsers originales
+(extract_date, parse_rubro, parse_iva_y_neto y la detección de ingreso)
+y mide el tiempo de ambos (el mejor de --repeat corridas alternadas, para
+que el orden y el ruido no decidan la comparación).
+
+parse_receipt sigue haciendo varias pasadas sobre el texto (fecha,
+importes, IVA, total y keywords); lo que ahorra es pasar a minúsculas y
+compilar una sola vez. Un solo regex con alternativas no da lo mismo:
+fecha, importes y valores rotulados se superponen en los mismos dígitos
+y el rubro va por prioridad de keyword, no por posición.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_parser [--n 5000] [--dir carpeta] [--seed 0] [--repeat 5]
+
+Sale con código 1 si algún texto da distinto.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from backend.app.ocr import extract_date, parse_rubro, parse_iva_y_neto
+from backend.app.receipt_parser import parse_receipt, transaction_fields
+
+
+VENDORS = [
+    "UTE Administración Nacional de Usinas",
+    "OSE Agua Potable",
+    "ANTEL Internet Fibra",
+    "Estación ANCAP Nafta Super",
+    "Distribuidora Proveedores del Sur",
+    "Insumos Gráficos SRL",
+    "Inmobiliaria Alquiler Centro",
+    "Supermercado El Dorado",
+    "Ferretería La Tuerca",
+    "Movistar Telefonía",
+]
+NOISE = {"0": "O", "1": "l", "5": "S", "a": "@", "e": "c"}
+
+
+def _amount(rng: random.Random) -> str:
+    value = rng.uniform(10, 250000)
+    entero, dec = f"{value:.2f}".split(".")
+    if rng.random() < 0.5:
+        entero = f"{int(entero):,}".replace(",", ".")
+        return f"{entero},{dec}"
+    return f"{entero}.{dec}"
+
+
+def _date(rng: random.Random) -> str:
+    y, m, d = rng.randint(2019, 2026), rng.randint(1, 12), rng.randint(1, 31)
+    fmt = rng.choice(["{d:02d}/{m:02d}/{y}", "{y}-{m:02d}-{d:02d}", "{d}.{m}.{y}", "{d:02d}-{m:02d}-{y}"])
+    return fmt.format(y=y, m=m, d=d)
+
+
+def make_text(rng: random.Random) -> str:
+    lines = [rng.choice(VENDORS), f"RUT 21{rng.randint(1000000, 9999999)}0012"]
+    if rng.random() < 0.9:
+        lines.append(f"Fecha: {_date(rng)}")
+    if rng.random() < 0.3:
+        lines.append(rng.choice(["e-Factura", "Factura contado", "Venta mostrador", "Ingreso caja"]))
+    for _ in range(rng.randint(1, 12)):
+        lines.append(f"{rng.randint(1, 9)} x ARTICULO {rng.randint(100, 999)}  {_amount(rng)}")
+    if rng.random() < 0.6:
+        lines.append(f"IVA 22%  {_amount(rng)}")
+    if rng.random() < 0.7:
+        lines.append(f"TOTAL $ {_amount(rng)}")
+    text = "\n".join(lines)
+    if rng.random() < 0.3:
+        text = "".join(NOISE.get(c, c) if rng.random() < 0.05 else c for c in text)
+    return text
+
+
+def legacy(text: str):
+    try:
+        iva, neto, total = parse_iva_y_neto(text)
+    except Exception:
+        return None  # el parser original lanza con IVA mal formado
+    tlow = text.lower()
+    kind = "income" if ("venta" in tlow or "ingreso" in tlow) else "expense"
+    return (extract_date(text), parse_rubro(text), iva, neto, total, kind)
+
+
+def current(text: str):
+    r = parse_receipt(text)
+    fields = transaction_fields(r)
+    if r["total"] is None:
+        iva = neto = total = None
+    else:
+        iva, neto, total = fields["iva"], fields["neto"], fields["total"]
+    return (fields["date"], r["rubro"], iva, neto, total, fields["kind"])
+
+
+def load_corpus(args) -> list[str]:
+    if args.dir:
+        corpus = []
+        for name in sorted(os.listdir(args.dir)):
+            if name.endswith(".txt"):
+                with open(os.path.join(args.dir, name), encoding="utf-8", errors="replace") as f:
+                    corpus.append(f.read())
+        return corpus
+    rng = random.Random(args.seed)
+    return [make_text(rng) for _ in range(args.n)]
+
+
+def timed(fn, corpus) -> tuple[list, float]:
+    t0 = time.perf_counter()
+    out = [fn(t) for t in corpus]
+    return out, time.perf_counter() - t0
+
+
+def best_of(repeat: int, corpus) -> tuple[list, float, list, float]:
+    """Corre los dos parsers alternados `repeat` veces; devuelve el mejor tiempo de cada uno."""
+    t_old = t_new = float("inf")
+    for _ in range(max(1, repeat)):
+        old, t = timed(legacy, corpus)
+        t_old = min(t_old, t)
+        new, t = timed(current, corpus)
+        t_new = min(t_new, t)
+    return old, t_old, new, t_new
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    old, t_old, new, t_new = best_of(args.repeat, corpus)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(old, new)) if a is not None and a != b]
+    legacy_errors = sum(1 for a in old if a is None)
+
+    n = len(corpus)
+    print(f"textos: {n}")
+    print(f"original: {t_old * 1e6 / n:8.1f} µs/texto")
+    print(f"parse_receipt: {t_new * 1e6 / n:3.1f} µs/texto  ({t_old / t_new:.2f}x)")
+    print(f"original con error (IVA mal formado): {legacy_errors}")
+    print(f"diferencias: {len(mismatches)}")
+    for i in mismatches[:10]:
+        print("-" * 40)
+        print(corpus[i])
+        print("original:     ", old[i])
+        print("parse_receipt:", new[i])
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/benchmarks/bench_preprocess.py
+"""
+Compara el preprocesado de imágenes para OCR: cadena original con Pillow
+vs. versión NumPy (Otsu / adaptativo).
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_preprocess [--repeat 5]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from backend.app import ocr
+
+
+SIZES = [(600, 900), (1200, 1600), (1500, 2000)]
+
+
+def make_receipt(size: tuple[int, int], seed: int = 0) -> Image.Image:
+    """Ticket sintético: texto oscuro sobre fondo claro con ruido y viñeteo."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    img = Image.new("L", size, 235)
+    draw = ImageDraw.Draw(img)
+    y = 20
+    while y < h - 20:
+        draw.text((20, y), f"ITEM {y:05d} ......... $ {rng.integers(10, 9999)},00  IVA 22%", fill=30)
+        y += 18
+    a = np.asarray(img, dtype=np.float32)
+    # iluminación despareja (foto de celular) + ruido gaussiano
+    gradient = np.linspace(-40, 10, w, dtype=np.float32)[None, :]
+    a = a + gradient + rng.normal(0, 12, a.shape).astype(np.float32)
+    return Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+
+
+def bench(fn, img: Image.Image, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(img)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    def numpy_otsu(img):
+        ocr.OCR_THRESHOLD = "otsu"
+        return ocr.preprocess_numpy(img)
+
+    def numpy_adaptive(img):
+        ocr.OCR_THRESHOLD = "adaptive"
+        return ocr.preprocess_numpy(img)
+
+    variants = [
+        ("pillow", ocr.preprocess_pillow),
+        ("numpy-otsu", numpy_otsu),
+        ("numpy-adaptive", numpy_adaptive),
+    ]
+
+    print(f"{'tamaño':>11} | " + " | ".join(f"{name:>15}" for name, _ in variants) + " | speedup otsu")
+    for size in SIZES:
+        img = make_receipt(size)
+        results = [bench(fn, img, args.repeat) for _, fn in variants]
+        speedup = results[0] / results[1] if results[1] else float("inf")
+        cells = " | ".join(f"{ms:>12.1f} ms" for ms in results)
+        print(f"{size[0]:>5}x{size[1]:<5} | {cells} | {speedup:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
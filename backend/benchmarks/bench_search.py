@@ -0,0 +1,166 @@
+# backend/benchmarks/bench_search.py
+"""
+Benchmark de la búsqueda de documentos (search.py) en SQLite/FTS5.
+
+Carga --docs documentos sintéticos tipo OCR para un usuario (más ruido de
+otros usuarios), construye el índice y mide la latencia de consultas
+típicas. Verifica además que el índice sigue a los documentos: un
+documento reindexado se encuentra por el texto nuevo y no por el viejo,
+ningún resultado es de otro usuario y "truncated" avisa cuando un término
+común tuvo más coincidencias que las que se rankean.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.bench_search [--docs 100000] [--max-p95-ms 100]
+
+Sale con código 1 si algún chequeo falla o el p95 supera el límite.
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.app import search
+from backend.app.db import Base, Document, create_db_engine
+
+
+VENDORS = [
+    "UTE Administración Nacional de Usinas",
+    "OSE Agua Potable",
+    "ANTEL Internet Fibra",
+    "Estación ANCAP Nafta Súper",
+    "Distribuidora Proveedores del Sur",
+    "Insumos Gráficos SRL",
+    "Inmobiliaria Alquiler Centro",
+    "Supermercado El Dorado",
+    "Ferretería La Tuerca",
+    "Movistar Telefonía",
+]
+ITEMS = ["tornillos", "papel", "tóner", "energía", "consumo", "abono", "nafta", "alquiler", "servicio", "materiales"]
+
+QUERIES = ["ute", "antel fibra", "ferreteria tuerca", "toner", "factura 2024", "rut 2150", "alquiler centro", "xyzzy"]
+
+
+def ocr_text(rnd: random.Random, i: int) -> str:
+    vendor = rnd.choice(VENDORS)
+    date = dt.date(2022, 1, 1) + dt.timedelta(days=rnd.randrange(1000))
+    items = " ".join(rnd.sample(ITEMS, 3))
+    return (
+        f"{vendor}\nRUT {rnd.randrange(2100, 2200)}{rnd.randrange(10**8):08d}\n"
+        f"e-Factura A-{i:07d} Fecha {date:%d/%m/%Y}\n{items}\n"
+        f"Subtotal {rnd.randrange(100, 50000)},00 IVA 22% TOTAL {rnd.randrange(100, 60000)},00"
+    )
+
+
+def seed(engine, n_docs: int, user_id: str, others: int) -> None:
+    rnd = random.Random(0)
+    now = dt.datetime(2025, 1, 1)
+    with Session(engine) as s:
+        batch = []
+        for i in range(n_docs + others):
+            batch.append(
+                {
+                    "id": f"doc-{i}",
+                    "user_id": user_id if i < n_docs else f"otro-{i % 20}",
+                    "storage_key": f"/tmp/doc-{i}",
+                    "original_filename": f"comprobante_{i}.jpg",
+                    "mime_type": "image/jpeg",
+                    "status": "ready",
+                    "ocr_text": ocr_text(rnd, i),
+                    "created_at": now,
+                }
+            )
+            if len(batch) >= 5000:
+                s.execute(insert(Document.__table__), batch)
+                batch.clear()
+        if batch:
+            s.execute(insert(Document.__table__), batch)
+        s.commit()
+
+
+def check_sync(s: Session, user_id: str) -> list[str]:
+    problems = []
+    # "A-0000000" solo aparece en el texto original de doc-0
+    if [r["document_id"] for r in search.search_documents(s, user_id, "0000000")["results"]] != ["doc-0"]:
+        problems.append("doc-0 no aparece por su texto original")
+    doc = s.get(Document, "doc-0")
+    doc.ocr_text = "Comprobante reprocesado zanahoria orgánica"
+    search.index_document(s, doc)
+    s.commit()
+    found = [r["document_id"] for r in search.search_documents(s, user_id, "zanahoria organica")["results"]]
+    if found != ["doc-0"]:
+        problems.append(f"reindexado: esperaba ['doc-0'], vino {found}")
+    if search.search_documents(s, user_id, "0000000")["results"]:
+        problems.append("el texto viejo de doc-0 sigue indexado")
+    if search.search_documents(s, "otro-1", "zanahoria")["results"]:
+        problems.append("resultado de otro usuario")
+    return problems
+
+
+def check_truncated(s: Session, user_id: str, n_docs: int) -> list[str]:
+    problems = []
+    common = search.search_documents(s, user_id, "factura")
+    if n_docs > search.SEARCH_RANK_CANDIDATES and not common["truncated"]:
+        problems.append("'factura' coincide en todos los documentos y no vino truncated")
+    if search.search_documents(s, user_id, "0000001")["truncated"]:
+        problems.append("consulta selectiva marcada como truncated")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--others", type=int, default=20_000, help="documentos de otros usuarios")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-p95-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-search-")
+    engine = create_db_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    search.init_index(engine)
+    user_id = "user-bench"
+
+    t0 = time.perf_counter()
+    seed(engine, args.docs, user_id, args.others)
+    with Session(engine) as s:
+        n = search.rebuild(s)
+    print(f"{args.docs} documentos (+{args.others} de otros usuarios), índice de {n} en {time.perf_counter() - t0:.1f}s")
+
+    failed = 0
+    print(f"{'consulta':<22}{'resultados':>11}{'p50 ms':>9}{'p95 ms':>9}")
+    with Session(engine) as s:
+        for q in QUERIES:
+            times = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                out = search.search_documents(s, user_id, q)
+                times.append((time.perf_counter() - t) * 1000)
+            times.sort()
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            slow = p95 > args.max_p95_ms
+            failed += slow
+            print(f"{q:<22}{len(out['results']):>11}{statistics.median(times):>9.1f}{p95:>9.1f}{'  LENTO' if slow else ''}")
+
+        example = search.search_documents(s, user_id, "antel fibra", limit=1)["results"]
+        if example:
+            print(f"ejemplo: {example[0]['snippet']!r} (score {example[0]['score']})")
+
+        problems = check_truncated(s, user_id, args.docs) + check_sync(s, user_id)
+    for p in problems:
+        print(f"FALLA {p}")
+    failed += len(problems)
+
+    engine.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
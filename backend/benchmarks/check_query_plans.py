@@ -0,0 +1,308 @@
+# backend/benchmarks/check_query_plans.py
+"""
+Chequeo de planes de consulta en SQLite, sobre el SQL que corre la app.
+
+Crea el esquema de los modelos en una base SQLite en memoria, carga filas
+sintéticas (transacciones, rollup, documentos indexados), corre ANALYZE y
+llama a las funciones reales de la app: upserts del rollup (rollup.apply y
+apply_many), lecturas del rollup (analytics, budget), páginas keyset del
+listado (ledger) y búsqueda FTS (search). Captura cada sentencia que
+ejecutan y verifica con EXPLAIN QUERY PLAN, con los mismos parámetros, que
+usan el índice esperado, sin recorrer tablas ni ordenar en memoria.
+También verifica la migración: una base creada sin los índices los recibe
+con init_db().
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.check_query_plans [--rows 20000]
+
+Sale con código 1 si algún plan no usa el índice esperado. Lo mismo se
+corre como test en backend/tests/test_query_plans.py.
+"""
+
+import argparse
+import datetime as dt
+import random
+import sys
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Callable, NamedTuple
+
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.app import db as app_db
+from backend.app.db import Base, Document, Transaction, Budget, StockSnapshot, create_db_engine
+from backend.app.periods import month_index
+from backend.app import analytics, budget, ledger, rollup, search
+
+
+USERS = 50
+RUBROS = ("Ventas", "Servicios", "Insumos")
+VENDORS = ("UTE energía", "ANTEL fibra", "Ferretería La Tuerca", "Supermercado El Dorado")
+
+# sentencias con plan (INSERT ... VALUES, SAVEPOINT, etc. no tienen)
+_PLANNED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+class Check(NamedTuple):
+    name: str
+    run: Callable[[Session], object]
+    index: str
+    # alias de subconsultas materializadas que se pueden recorrer
+    scan_ok: tuple = ()
+    # orden final en memoria sobre pocas filas (p. ej. los `limit` resultados)
+    sort_ok: bool = False
+
+
+def seed(engine, n_rows: int, n_users: int = USERS):
+    rnd = random.Random(0)
+    users = [f"user-{i}" for i in range(n_users)]
+    start = dt.date(2023, 1, 1)
+    with Session(engine) as s:
+        s.bulk_insert_mappings(
+            Transaction,
+            [
+                {
+                    "id": f"t{i}",
+                    "user_id": rnd.choice(users),
+                    "kind": rnd.choice(("income", "expense")),
+                    "occurred_on": start + dt.timedelta(days=rnd.randrange(1000)),
+                    "rubro": rnd.choice(RUBROS),
+                    "neto": 100,
+                    "iva": 22,
+                    "total": 122,
+                }
+                for i in range(n_rows)
+            ],
+        )
+        for model in (Budget, StockSnapshot):
+            rows = []
+            for u in users:
+                for y in range(2023, 2026):
+                    for m in range(1, 13):
+                        row = {"id": f"{u}-{y}-{m}", "user_id": u, "year": f"{y:04d}", "month": f"{m:02d}"}
+                        if model is Budget:
+                            row.update(rubro="Ventas", amount=0, kind="income")
+                        rows.append(row)
+            s.bulk_insert_mappings(model, rows)
+        s.bulk_insert_mappings(
+            Document,
+            [
+                {
+                    "id": f"doc-{i}",
+                    "user_id": rnd.choice(users),
+                    "storage_key": f"/tmp/doc-{i}",
+                    "original_filename": f"comprobante_{i}.jpg",
+                    "status": "ready",
+                    "ocr_text": f"{rnd.choice(VENDORS)} e-Factura A-{i:07d} TOTAL {rnd.randrange(100, 9000)},00",
+                    "created_at": dt.datetime(2025, 1, 1),
+                }
+                for i in range(n_rows // 4)
+            ],
+        )
+        s.commit()
+        rollup.rebuild(s)
+        search.rebuild(s)
+        s.commit()
+
+
+def build(n_rows: int):
+    """Base en memoria con el esquema, el índice de búsqueda, datos y estadísticas."""
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    search.init_index(engine)
+    seed(engine, n_rows)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+@contextmanager
+def capture(engine):
+    """(sentencia, parámetros) de todo lo que se ejecuta en `engine` dentro del bloque."""
+    found = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        found.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield found
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def _new_trx(**kw) -> Transaction:
+    values = {"user_id": "user-1", "kind": "expense", "occurred_on": dt.date(2024, 3, 10),
+              "rubro": "Insumos", "neto": Decimal("100"), "iva": Decimal("22"), "total": Decimal("122")}
+    values.update(kw)
+    return Transaction(**values)
+
+
+def _csv_rows() -> list[dict]:
+    return [
+        {"user_id": "user-1", "occurred_on": dt.date(2024, m, 5), "rubro": rubro, "kind": "expense",
+         "neto": Decimal("10"), "iva": Decimal("2.2"), "total": Decimal("12.2")}
+        for m in (3, 4) for rubro in ("Insumos", "Papelería")
+    ]
+
+
+def checks() -> list[Check]:
+    cursor = ledger.encode_cursor("desc", dt.date(2024, 6, 15), "t500")
+    first = month_index(2023, 9)
+    rollup_pk = "sqlite_autoindex_monthly_rollups_1"
+    return [
+        Check("rollup: alta sobre una clave existente", lambda s: rollup.apply(s, _new_trx()), rollup_pk),
+        Check("rollup: alta de una clave nueva", lambda s: rollup.apply(s, _new_trx(rubro="Nuevo")), rollup_pk),
+        Check("rollup: importación en lote", lambda s: rollup.apply_many(s, _csv_rows()), rollup_pk),
+        Check("rollup: período del estado de resultados", lambda s: rollup.period_rows(s, "user-1", "2024-03"), rollup_pk),
+        Check("rollup: ventana de presupuesto", lambda s: budget.load_matrix(s, "user-1", first, 6), rollup_pk),
+        Check(
+            "rollup: serie de analytics",
+            lambda s: analytics.build_series(s, "user-1", (2024, 1), (2024, 6), "month"),
+            rollup_pk,
+        ),
+        Check(
+            "listado: página profunda (keyset)",
+            lambda s: ledger.list_transactions(s, "user-1", cursor=cursor),
+            "ix_transactions_user_occurred_id",
+        ),
+        Check(
+            "listado: por rubro (keyset)",
+            lambda s: ledger.list_transactions(s, "user-1", rubro="Ventas", cursor=cursor),
+            "ix_transactions_user_rubro_occurred_id",
+        ),
+        Check(
+            "búsqueda: término común (con corte)",
+            lambda s: search.search_documents(s, "user-1", "factura"),
+            "sqlite_autoindex_documents_1",
+            scan_ok=("r",),
+            sort_ok=True,
+        ),
+        Check(
+            "búsqueda: término selectivo",
+            lambda s: search.search_documents(s, "user-1", "ferreteria tuerca"),
+            "sqlite_autoindex_documents_1",
+            scan_ok=("r",),
+            sort_ok=True,
+        ),
+        Check(
+            "stock del mes",
+            lambda s: s.execute(
+                select(StockSnapshot).where(
+                    StockSnapshot.user_id == "user-1", StockSnapshot.year == "2024", StockSnapshot.month == "03"
+                )
+            ).all(),
+            "ix_stock_snapshots_user_year_month",
+        ),
+        Check(
+            "presupuesto del mes",
+            lambda s: s.execute(
+                select(Budget).where(Budget.user_id == "user-1", Budget.year == "2024", Budget.month == "03")
+            ).all(),
+            "ix_budgets_user_year_month",
+        ),
+    ]
+
+
+def plan_problems(plan: list[str], check: Check) -> list[str]:
+    """Líneas del plan que recorren una tabla u ordenan en memoria."""
+    problems = []
+    for line in plan:
+        if line.startswith("SCAN "):
+            target = line.split()[1]
+            # FTS5: "INDEX n:...M..." es que usa el MATCH (no recorre todo el índice)
+            fts_match = " VIRTUAL TABLE INDEX " in line and "M" in line.rsplit(":", 1)[-1]
+            if not fts_match and target not in check.scan_ok:
+                problems.append(line)
+        elif "FOR ORDER BY" in line and not check.sort_ok:
+            problems.append(line)
+    return problems
+
+
+def run_check(engine, check: Check) -> tuple[bool, list[str]]:
+    """Corre la función de la app y explica cada sentencia con sus parámetros."""
+    with Session(engine) as s, capture(engine) as statements:
+        check.run(s)
+        s.rollback()
+
+    lines, problems = [], []
+    with engine.connect() as conn:
+        for statement, params in statements:
+            if not statement.lstrip().upper().startswith(_PLANNED):
+                continue
+            plan = [r[-1] for r in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).all()]
+            lines.append(" ".join(statement.split())[:100])
+            lines.extend(f"    {p}" for p in plan)
+            problems.extend(plan_problems(plan, check))
+            if check.index in " ".join(plan):
+                check = check._replace(index="")
+    if check.index:
+        problems.append(f"ninguna sentencia usa {check.index}")
+    if not statements:
+        problems.append("no ejecutó SQL")
+    return not problems, lines + [f"  -> {p}" for p in problems]
+
+
+def check_migration() -> bool:
+    """Base "vieja" sin índices compuestos -> init_db() los crea y borra los obsoletos."""
+    engine = create_engine("sqlite://")
+    names = {
+        "ix_transactions_user_occurred_id",
+        "ix_transactions_user_rubro_occurred_id",
+        "ix_budgets_user_year_month",
+        "ix_stock_snapshots_user_year_month",
+    }
+    obsolete = "ix_transactions_user_occurred_on"
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in names:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql(f"CREATE INDEX {obsolete} ON transactions (user_id, occurred_on)")
+
+    original = app_db.engine
+    app_db.engine = engine
+    try:
+        app_db.init_db()
+    finally:
+        app_db.engine = original
+
+    insp = inspect(engine)
+    found = {
+        ix["name"]
+        for table in ("transactions", "budgets", "stock_snapshots")
+        for ix in insp.get_indexes(table)
+    }
+    missing = names - found
+    problems = [f"falta {name}" for name in sorted(missing)]
+    if obsolete in found:
+        problems.append(f"sigue {obsolete}")
+    print(f"migración: {'ok' if not problems else ', '.join(problems)}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = build(args.rows)
+    failed = 0
+    for check in checks():
+        ok, lines = run_check(engine, check)
+        failed += not ok
+        print(f"[{'ok' if ok else 'FALLA'}] {check.name}")
+        for line in lines:
+            print(f"    {line}")
+
+    if not check_migration():
+        failed += 1
+
+    engine.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
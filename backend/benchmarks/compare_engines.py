@@ -0,0 +1,72 @@
+# backend/benchmarks/compare_engines.py
+"""
+Corre el mismo corpus por los motores OCR configurables y compara
+salida y latencia.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.compare_engines [--dir carpeta_con_imagenes] [--engines tesseract,tesserocr]
+
+Sin --dir usa tickets sintéticos. Requiere Tesseract instalado (y
+`tesserocr` para ese motor).
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from backend.app import ocr
+from backend.app.ocr_engines import build_engine
+from backend.benchmarks.bench_preprocess import make_receipt, SIZES
+
+
+def load_corpus(directory: str | None) -> list[tuple[str, Image.Image]]:
+    if not directory:
+        return [(f"sintetico-{w}x{h}-{i}", make_receipt((w, h), seed=i)) for i, (w, h) in enumerate(SIZES)]
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff")):
+            with Image.open(os.path.join(directory, name)) as img:
+                corpus.append((name, img.copy()))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--engines", default="tesseract,tesserocr")
+    args = parser.parse_args()
+
+    corpus = [(name, ocr.preprocess_image(img)) for name, img in load_corpus(args.dir)]
+    engines = [
+        build_engine(name, ocr.OCR_LANG, ocr.OCR_PSM, ocr.OCR_OEM, ocr.OCR_TESSERACT_VARS)
+        for name in args.engines.split(",")
+    ]
+
+    outputs: dict[str, list[str]] = {}
+    for engine in engines:
+        texts, times = [], []
+        for _, img in corpus:
+            t0 = time.perf_counter()
+            texts.append((engine.image_to_string(img) or "").strip())
+            times.append(time.perf_counter() - t0)
+        outputs[engine.name] = texts
+        print(
+            f"{engine.name:>10} ({engine.version()}): "
+            f"mediana {statistics.median(times) * 1000:.1f} ms/imagen, "
+            f"total {sum(times):.2f} s"
+        )
+
+    base_name, base = engines[0].name, outputs[engines[0].name]
+    for engine in engines[1:]:
+        other = outputs[engine.name]
+        diffs = [name for (name, _), a, b in zip(corpus, base, other) if a != b]
+        print(f"{engine.name} vs {base_name}: {len(corpus) - len(diffs)}/{len(corpus)} idénticos")
+        for name in diffs:
+            print(f"  difiere: {name}")
+
+
+if __name__ == "__main__":
+    main()
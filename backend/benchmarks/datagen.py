@@ -0,0 +1,197 @@
+# backend/benchmarks/datagen.py
+"""
+Generador determinístico de datos sintéticos sobre los modelos de db.py.
+
+Crea N usuarios x M transacciones x K documentos (más stock mensual) con
+ids y montos derivados de --seed: dos corridas con los mismos parámetros
+dan la misma base. Las transacciones se reparten en los `months` meses
+anteriores a END, se insertan con executemany de Core en bloques, y al
+final se reconstruyen el rollup mensual y el índice de búsqueda, como
+quedarían después de cargarlas por la app.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.datagen --db /tmp/bench.db [--scale 10k|1m|10m]
+        [--users N] [--transactions M] [--documents K] [--seed 0]
+"""
+
+import argparse
+import datetime as dt
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.app import rollup, search
+from backend.app.auth import get_password_hash
+from backend.app.db import Base, Document, StockSnapshot, Transaction, User, create_db_engine
+from backend.app.periods import month_start, shift_month
+
+
+# (usuarios, transacciones por usuario, documentos por usuario)
+SCALES = {
+    "10k": (10, 1_000, 100),
+    "1m": (100, 10_000, 1_000),
+    "10m": (1_000, 10_000, 1_000),
+}
+END = dt.date(2026, 1, 1)  # primer mes sin datos
+MONTHS = 36
+PASSWORD = "bench"
+INSERT_ROWS = 20_000
+
+INCOME_RUBROS = ("Ventas contado", "Ventas crédito", "Servicios")
+EXPENSE_RUBROS = ("Mercaderías", "Alquiler", "Sueldos", "Energía", "Telefonía", "Combustible", "Insumos")
+VENDORS = ("UTE", "OSE", "ANTEL", "ANCAP", "Movistar", "Ferretería La Tuerca", "Supermercado El Dorado")
+
+
+def user_id(i: int) -> str:
+    return f"bench-user-{i:05d}"
+
+
+def email(i: int) -> str:
+    return f"bench{i:05d}@example.com"
+
+
+def _uuid(rnd: random.Random) -> str:
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def _money(rnd: random.Random, low: int, high: int) -> Decimal:
+    return Decimal(rnd.randrange(low * 100, high * 100)) / 100
+
+
+def _transactions(rnd: random.Random, uid: str, n: int, months: int, doc_ids: list[str]):
+    first = month_start(END.year, END.month, -months)
+    days = (END - first).days
+    for j in range(n):
+        income = rnd.random() < 0.4
+        total = _money(rnd, 200, 60_000) if income else _money(rnd, 50, 20_000)
+        iva = (total * Decimal("0.22") / Decimal("1.22")).quantize(Decimal("0.01"))
+        document_id = doc_ids[j] if j < len(doc_ids) else "manual"
+        yield {
+            "id": _uuid(rnd),
+            "user_id": uid,
+            "kind": "income" if income else "expense",
+            "occurred_on": first + dt.timedelta(days=rnd.randrange(days)),
+            "rubro": rnd.choice(INCOME_RUBROS if income else EXPENSE_RUBROS),
+            "neto": total - iva,
+            "iva": iva,
+            "total": total,
+            "description": "Carga manual" if document_id == "manual" else rnd.choice(VENDORS),
+            "document_id": document_id,
+        }
+
+
+def _documents(rnd: random.Random, uid: str, doc_ids: list[str]):
+    created = dt.datetime.combine(END, dt.time()) - dt.timedelta(days=MONTHS * 30)
+    for j, doc_id in enumerate(doc_ids):
+        vendor = rnd.choice(VENDORS)
+        yield {
+            "id": doc_id,
+            "user_id": uid,
+            "storage_key": f"bench/{doc_id}.jpg",
+            "original_filename": f"comprobante_{j}.jpg",
+            "mime_type": "image/jpeg",
+            "checksum": f"{rnd.getrandbits(256):064x}",
+            "status": "ready",
+            "ocr_text": (
+                f"{vendor}\nRUT 21{rnd.randrange(10**10):010d}\ne-Factura A-{j:07d}\n"
+                f"IVA 22% TOTAL {_money(rnd, 50, 20_000)}"
+            ),
+            "created_at": created + dt.timedelta(minutes=j),
+        }
+
+
+def _stock(uid: str, months: int):
+    for back in range(months, 0, -1):
+        y, m = shift_month(END.year, END.month, -back)
+        yield {
+            "id": f"{uid}-{y:04d}-{m:02d}",
+            "user_id": uid,
+            "year": f"{y:04d}",
+            "month": f"{m:02d}",
+            "initial_stock": Decimal(10_000 + back * 100),
+            "final_stock": Decimal(10_000 + (back - 1) * 100),
+        }
+
+
+class _Inserter:
+    """Acumula filas por tabla y las inserta en bloques de INSERT_ROWS."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.pending: dict = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, table, rows) -> None:
+        buf = self.pending.setdefault(table, [])
+        for row in rows:
+            buf.append(row)
+            if len(buf) >= INSERT_ROWS:
+                self.flush(table)
+
+    def flush(self, table=None) -> None:
+        for t in [table] if table is not None else list(self.pending):
+            rows = self.pending.get(t)
+            if rows:
+                self.session.execute(insert(t), rows)
+                self.counts[t.name] = self.counts.get(t.name, 0) + len(rows)
+                rows.clear()
+        self.session.commit()
+
+
+def generate(engine, users: int, transactions: int, documents: int, seed: int = 0, months: int = MONTHS) -> dict:
+    """Puebla `engine` (esquema incluido). Devuelve filas creadas por tabla."""
+    Base.metadata.create_all(bind=engine)
+    search.init_index(engine)
+    password_hash = get_password_hash(PASSWORD)
+    rnd = random.Random(seed)
+
+    with Session(engine) as s:
+        ins = _Inserter(s)
+        for i in range(users):
+            uid = user_id(i)
+            ins.add(
+                User.__table__,
+                [{"id": uid, "email": email(i), "password_hash": password_hash, "is_active": True,
+                  "created_at": dt.datetime(2023, 1, 1)}],
+            )
+            doc_ids = [_uuid(rnd) for _ in range(min(documents, transactions))]
+            ins.add(Document.__table__, _documents(rnd, uid, doc_ids))
+            ins.add(Transaction.__table__, _transactions(rnd, uid, transactions, months, doc_ids))
+            ins.add(StockSnapshot.__table__, _stock(uid, months))
+        ins.flush()
+        rollup.rebuild(s)
+        if documents:
+            search.rebuild(s)
+    return ins.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base sintética para benchmarks")
+    parser.add_argument("--db", required=True, help="archivo SQLite a crear")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--transactions", type=int, default=None, help="por usuario")
+    parser.add_argument("--documents", type=int, default=None, help="por usuario")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users, transactions, documents = SCALES[args.scale]
+    engine = create_db_engine(f"sqlite:///{args.db}")
+    t0 = time.perf_counter()
+    counts = generate(
+        engine,
+        args.users if args.users is not None else users,
+        args.transactions if args.transactions is not None else transactions,
+        args.documents if args.documents is not None else documents,
+        seed=args.seed,
+    )
+    engine.dispose()
+    print(", ".join(f"{name}: {n}" for name, n in sorted(counts.items())), f"({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# backend/benchmarks/receipt_corpus.py
+"""
+Corpus sintético de tickets y facturas uruguayas con valores conocidos.
+
+Cada comprobante tiene fecha, rubro, tipo, neto, IVA (22% o 10%) y total
+conocidos, y se escribe como:
+
+- imagen (PNG o JPEG) dibujada con Pillow: ticket angosto o factura A4,
+  a varias resoluciones (dpi) y con degradación "clean" (sin cambios),
+  "scan" (rotación leve, blur, ruido) o "photo" (más rotación, blur,
+  ruido e iluminación despareja, JPEG);
+- PDF con PyMuPDF: con texto nativo o "escaneado" (la imagen embebida).
+
+manifest.json guarda, por archivo, los valores esperados, el texto
+exacto y los parámetros de generación. Misma --seed, mismo corpus.
+
+Uso (desde la raíz del repo):
+    python -m backend.benchmarks.receipt_corpus --out carpeta [--n 60] [--seed 0]
+"""
+
+import argparse
+import datetime as dt
+import io
+import json
+import os
+import random
+from decimal import Decimal
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+
+# (emisor, concepto, kind, rubro esperado de ocr.parse_rubro)
+TEMPLATES = [
+    ("UTE", "Energía eléctrica - consumo mensual", "expense", "Servicios"),
+    ("OSE", "Agua potable - cargo fijo", "expense", "Servicios"),
+    ("ANTEL", "Internet fibra óptica", "expense", "Servicios"),
+    ("Estación ANCAP Pocitos", "Nafta súper 95", "expense", "Movilidad"),
+    ("Inmobiliaria Centro", "Alquiler oficina - mes corriente", "expense", "Alquiler"),
+    ("Distribuidora del Sur SA", "Proveedor mayorista", "expense", "Mercaderías"),
+    ("Papelería Central", "Insumos de oficina", "expense", "Insumos"),
+    ("Mi Comercio SRL", "Venta mostrador", "income", "Ventas"),
+]
+ARTICLES = ("Artículo", "Producto", "Item", "Cod.")
+DPIS = (100, 150, 200, 300)
+QUALITIES = ("clean", "scan", "photo")
+# (rotación máx. en grados, radio de blur, sigma de ruido)
+DEGRADATION = {"clean": (0.0, 0.0, 0.0), "scan": (1.5, 0.6, 6.0), "photo": (4.0, 1.2, 14.0)}
+CENT = Decimal("0.01")
+
+
+def uy_amount(value: Decimal) -> str:
+    """1234.5 -> '1.234,50' (formato local)."""
+    entero, dec = f"{value:.2f}".split(".")
+    return f"{int(entero):,}".replace(",", ".") + "," + dec
+
+
+def make_receipt(rnd: random.Random, i: int) -> dict:
+    """Valores esperados y líneas de texto de un comprobante."""
+    vendor, concept, kind, rubro = rnd.choice(TEMPLATES)
+    date = dt.date(2023, 1, 1) + dt.timedelta(days=rnd.randrange(1000))
+    rate = Decimal("0.10") if rnd.random() < 0.2 else Decimal("0.22")
+    items = [
+        (rnd.randint(1, 5), f"{rnd.choice(ARTICLES)} {rnd.randint(100, 999)}", Decimal(rnd.randrange(500, 900_000)) / 100)
+        for _ in range(rnd.randint(1, 6))
+    ]
+    neto = sum((amount for _, _, amount in items), Decimal("0")).quantize(CENT)
+    iva = (neto * rate).quantize(CENT)
+    total = neto + iva
+    date_text = date.strftime("%d/%m/%Y") if rnd.random() < 0.8 else date.isoformat()
+
+    lines = [
+        vendor,
+        f"RUT 21{rnd.randrange(10**8):08d}0012",
+        "Av. 18 de Julio 1234 - Montevideo",
+        f"e-Factura Serie A Nro {i + 1:07d}",
+        f"Fecha: {date_text}",
+        concept,
+    ]
+    lines += [f"{qty} x {name}  {uy_amount(amount)}" for qty, name, amount in items]
+    lines += [
+        f"Subtotal  {uy_amount(neto)}",
+        f"IVA {int(rate * 100)}%  {uy_amount(iva)}",
+        f"TOTAL $  {uy_amount(total)}",
+    ]
+    return {
+        "truth": {
+            "date": date.isoformat(),
+            "kind": kind,
+            "rubro": rubro,
+            "neto": str(neto),
+            "iva": str(iva),
+            "total": str(total),
+            "rate": str(rate),
+        },
+        "lines": lines,
+    }
+
+
+def render(lines: list[str], layout: str, dpi: int) -> Image.Image:
+    """Texto negro sobre blanco: ticket de 3,2" de ancho o factura A4."""
+    font = ImageFont.load_default(size=max(8, round(dpi * 0.13)))
+    line_h = round(font.size * 1.5)
+    margin = round(dpi * 0.2)
+    width = round(dpi * (3.2 if layout == "ticket" else 8.27))
+    height = max(margin * 2 + line_h * len(lines), round(dpi * (0 if layout == "ticket" else 5.0)))
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    y = margin
+    for line in lines:
+        # factura: importes alineados a la derecha
+        head, sep, amount = line.rpartition("  ")
+        if layout == "invoice" and sep:
+            draw.text((margin, y), head, font=font, fill=0)
+            draw.text((width - margin, y), amount, font=font, fill=0, anchor="ra")
+        else:
+            draw.text((margin, y), line, font=font, fill=0)
+        y += line_h
+    return img
+
+
+def degrade(img: Image.Image, quality: str, rnd: random.Random) -> tuple[Image.Image, dict]:
+    max_rot, blur, noise = DEGRADATION[quality]
+    rotation = round(rnd.uniform(-max_rot, max_rot), 2) if max_rot else 0.0
+    if rotation:
+        img = img.rotate(rotation, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    if noise or quality == "photo":
+        nrng = np.random.default_rng(rnd.getrandbits(32))
+        a = np.asarray(img, dtype=np.float32)
+        if quality == "photo":
+            # iluminación despareja (foto de celular)
+            a = a + np.linspace(-45, 5, a.shape[1], dtype=np.float32)[None, :]
+        a = a + nrng.normal(0, noise, a.shape).astype(np.float32)
+        img = Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+    return img, {"rotation": rotation, "blur": blur, "noise": noise}
+
+
+def _image_bytes(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "jpg":
+        img.save(buf, "JPEG", quality=75)
+    else:
+        img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _pdf_native(lines: list[str]) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)  # A4 en puntos
+    y = 60
+    for line in lines:
+        page.insert_text((50, y), line, fontsize=11, fontname="helv")
+        y += 16
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _pdf_scan(img: Image.Image) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    w, h = img.size
+    scale = min(515 / w, 762 / h)
+    page.insert_image(fitz.Rect(40, 40, 40 + w * scale, 40 + h * scale), stream=_image_bytes(img, "png"))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def generate(out_dir: str, n: int, seed: int = 0) -> list[dict]:
+    """Escribe n comprobantes y manifest.json en out_dir. Devuelve el manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    rnd = random.Random(seed)
+    manifest = []
+    for i in range(n):
+        receipt = make_receipt(rnd, i)
+        # formato: 60% imagen, 20% PDF escaneado, 20% PDF con texto
+        roll = rnd.random()
+        kind = "image" if roll < 0.6 else ("pdf-scan" if roll < 0.8 else "pdf-native")
+        layout = rnd.choice(("ticket", "invoice"))
+        dpi = rnd.choice(DPIS)
+        quality = rnd.choice(QUALITIES)
+        entry = {"layout": layout, "dpi": dpi, "quality": quality, "source": kind}
+
+        if kind == "pdf-native":
+            entry.update(quality="clean", dpi=None, rotation=0.0, blur=0.0, noise=0.0)
+            data, ext = _pdf_native(receipt["lines"]), "pdf"
+        else:
+            img, params = degrade(render(receipt["lines"], layout, dpi), quality, rnd)
+            entry.update(params)
+            if kind == "pdf-scan":
+                data, ext = _pdf_scan(img), "pdf"
+            else:
+                ext = "jpg" if quality == "photo" else "png"
+                data = _image_bytes(img, ext)
+
+        name = f"{i:04d}-{kind}-{entry['quality']}.{ext}"
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(data)
+        entry.update(file=name, truth=receipt["truth"], text="\n".join(receipt["lines"]))
+        manifest.append(entry)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"seed": seed, "n": n, "items": manifest}, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera el corpus sintético de comprobantes")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--n", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate(args.out, args.n, args.seed)
+    by_source: dict[str, int] = {}
+    for entry in manifest:
+        by_source[entry["source"]] = by_source.get(entry["source"], 0) + 1
+    print(f"{len(manifest)} comprobantes en {args.out}: " + ", ".join(f"{k} {v}" for k, v in sorted(by_source.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# backend/tests/test_query_plans.py
+"""
+Regresión de planes de consulta y de cantidad de sentencias (SQLite).
+
+Reusa backend/benchmarks/check_query_plans.py: cada consulta caliente de
+la app (upserts y lecturas del rollup, listado keyset, búsqueda FTS) tiene
+que usar su índice sin recorrer tablas.
+
+Uso (desde la raíz del repo):
+    python -m pytest backend/tests
+"""
+
+import datetime as dt
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.app import ledger, rollup, search
+from backend.app.sql_profile import assert_max_queries
+from backend.benchmarks import check_query_plans as cqp
+
+
+@pytest.fixture(scope="module")
+def engine():
+    eng = cqp.build(5000)
+    yield eng
+    eng.dispose()
+
+
+@pytest.mark.parametrize("check", cqp.checks(), ids=lambda c: c.name)
+def test_plan_uses_index(engine, check):
+    ok, lines = cqp.run_check(engine, check)
+    assert ok, "\n".join(lines)
+
+
+def test_plan_problems_flags_scans_and_sorts():
+    check = cqp.Check("x", lambda s: None, "ix")
+    assert cqp.plan_problems(["SCAN transactions"], check)
+    assert cqp.plan_problems(["SEARCH t USING INDEX ix (user_id=?)", "USE TEMP B-TREE FOR ORDER BY"], check)
+    # FTS5 sin MATCH recorre todo el índice
+    assert cqp.plan_problems(["SCAN documents_fts VIRTUAL TABLE INDEX 0:"], check)
+    assert not cqp.plan_problems(["SCAN documents_fts VIRTUAL TABLE INDEX 32:rM4>"], check)
+
+
+def test_index_migration():
+    assert cqp.check_migration()
+
+
+def test_rollup_apply_is_one_update(engine):
+    with Session(engine) as s:
+        rollup.apply(s, cqp._new_trx())  # la clave puede no existir todavía
+        with assert_max_queries(1, "rollup.apply sobre clave existente"):
+            rollup.apply(s, cqp._new_trx())
+        s.rollback()
+
+
+def test_ledger_page_is_one_query(engine):
+    cursor = ledger.encode_cursor("desc", dt.date(2024, 6, 15), "t500")
+    with Session(engine) as s:
+        with assert_max_queries(1, "ledger.list_transactions"):
+            page = ledger.list_transactions(s, "user-1", limit=20, cursor=cursor)
+    assert len(page["items"]) == 20
+    assert all(item["date"] <= "2024-06-15" for item in page["items"])
+
+
+def test_search_is_two_queries(engine):
+    with Session(engine) as s:
+        with assert_max_queries(2, "search.search_documents"):
+            out = search.search_documents(s, "user-1", "factura")
+    assert out["results"]